@@ -16,22 +16,224 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import sys
+import math
+import time
+import threading
+import copy
+import fractions
 import mpmath
 import formatOutput
+# for convertStringToPObjectList() only; wireFormat imports this module
+import wireFormat
 
 ## Global value for digits in output
 DIGITS = 24 
 ## Global value for precision of arithmetic
 DECIMAL_PRECISION = 50
-mpmath.mp.dps = DECIMAL_PRECISION
+## Precisions that Expression.adaptive() tries in turn
+PRECISION_LADDER = (30, 50, 100, 200, 400)
+
+class Context:
+  "An mpmath context and the constants that evaluation uses at its precision"
+  def __init__(self,mp):
+    "Initialise Context from an mpmath.MPContext"
+    self.mp = mp
+    self.mpf = mp.mpf
+    self.dps = mp.dps
+    self.pi = +mp.pi
+    self.degree = self.pi/180
+    # trig functions set results below the rounding error of the
+    # precision to 0, and the float fast path leaves results near that
+    # to mpmath
+    self.tiny = mp.mpf(10)**(-self.dps)
+    self.floatTiny = max(FLOAT_TINY,10.0**(5-self.dps))
+    self.zero = mp.mpf(0)
+    self.one = mp.mpf(1)
+    self.third = self.one/3
+  def __repr__(self):
+    return 'Context('+str(self.dps)+')'
+  def convert(self,value):
+    "A value as a number of this context; ANS and RCL may come from another"
+    if type(value) is self.mpf:
+      return value
+    if hasattr(value,'_mpf_'):
+      return self.mp.make_mpf(value._mpf_)
+    return self.mp.convert(value)
+  def value(self,obj):
+    "The value of a Container from parse() as a number of this context"
+    value = obj.value
+    if type(value) is self.mpf:
+      return value
+    if isinstance(obj,Literal) and self.dps != DECIMAL_PRECISION:
+      return self.mp.mpmathify(obj.text)
+    if isinstance(obj,Pi):
+      return self.pi
+    return self.convert(value)
+  def rational(self,value):
+    "An int or Fraction correctly rounded to this context"
+    if type(value) is int:
+      return self.mp.make_mpf(mpmath.libmp.from_int(value,self.mp.prec,mpmath.libmp.round_nearest))
+    return self.mp.make_mpf(mpmath.libmp.from_rational(value.numerator,value.denominator,
+                                                       self.mp.prec,mpmath.libmp.round_nearest))
+
+## Contexts of each thread by precision, and by mpmath context and its
+# precision. mpmath functions raise the precision of their context while
+# they work and an mpf rounds at the current precision of its context, so
+# threads must not share contexts.
+contextCache = threading.local()
+
+##
+# The Context for a precision in this thread. Contexts are made once for
+# each thread and precision and kept, so evaluations at different
+# precisions or in different threads do not interfere and constants are
+# worked out once.
+# @param precision Decimal digits, an mpmath.MPContext (used at its
+# current precision) or a Context
+# @return A Context
+##
+def context(precision=DECIMAL_PRECISION):
+  if isinstance(precision,Context):
+    return precision
+  contexts = getattr(contextCache,'contexts',None)
+  if None == contexts:
+    contexts = contextCache.contexts = {}
+  if isinstance(precision,mpmath.ctx_mp.MPContext):
+    key = (precision,precision.prec)
+  else:
+    key = int(precision)
+  result = contexts.get(key)
+  if None == result:
+    if isinstance(precision,mpmath.ctx_mp.MPContext):
+      mp = precision
+    else:
+      mp = mpmath.MPContext()
+      mp.dps = key
+    result = Context(mp)
+    contexts[key] = result
+  return result
+
+## Significant digits of a result from the float fast path
+FLOAT_DIGITS = 15
+## Fewest significant digits the float fast path shows rather than
+# falling back to mpmath
+FLOAT_MIN_DIGITS = 12
+## Unit roundoff of a float
+FLOAT_EPSILON = 2.0**-53
+## Smallest normal float
+FLOAT_MINIMUM = sys.float_info.min
+## Smallest result the float fast path trusts at any precision (trig
+# functions snap anything below Context.tiny, 1e-50 at 50 digits, to 0)
+FLOAT_TINY = 1e-45
+## Largest n for which the float fast path computes nCr
+FLOAT_COMBINATORICS = 10000
+LN10 = math.log(10)
+## Values of scale for radians and degrees
+RADIAN_SCALE = 1.0
+DEGREE_SCALE = context().degree
+## Types of the values of exact arithmetic in execute()
+EXACT_TYPES = (int,fractions.Fraction)
+## Largest size in bits of an exact value; larger results are left to
+# mpmath
+EXACT_BITS = 1 << 14
+## Largest decimal exponent of a result of !, ^, E, tenX or exp. Past a
+# million digits a result is of no use on a 24-character display and
+# mpmath can spend seconds or minutes on it, so 1000000!, whose exponent
+# is 5565708, or 10^(10^7) fail at once with an overflowError.
+MAX_EXPONENT = 1e6
+LOG10_2 = math.log10(2)
+
+##
+# Estimate log10|x| from the exponent of an mpf, to within log10(2), for
+# numbers of any size
+# @return A float; -inf for 0 and 0 for infinities and NaN
+##
+def magnitude(x):
+  sign, man, exp, bc = x._mpf_
+  if 0 == man:
+    return -math.inf if 0 == exp else 0.0
+  return (exp+bc)*LOG10_2
+
+##
+# Whether a result would be too large or small to compute
+# @param log10Exponent An estimate of log10 of the absolute value of the
+# decimal exponent of the result
+##
+def explosive(log10Exponent):
+  return log10Exponent > math.log10(MAX_EXPONENT)
+
+##
+# Size of an exact value
+# @param x An int or Fraction
+# @return Bits in its numerator and denominator
+##
+def exactBits(x):
+  if type(x) is int:
+    return x.bit_length()
+  return x.numerator.bit_length()+x.denominator.bit_length()
+
+##
+# Check the result of an xfn()
+# @param x An int or Fraction
+# @return x, as an int if it is a whole number, or None if it is larger
+# than EXACT_BITS
+##
+def exactResult(x):
+  if type(x) is not int and 1 == x.denominator:
+    x = x.numerator
+  if exactBits(x) > EXACT_BITS:
+    return None
+  return x
+
+##
+# The exact value of a number written out in an expression
+# @param text The number, such as 1.5e-7
+# @return An int, a Fraction or None if it is too large
+##
+def exactLiteral(text):
+  if 'e' in text and abs(int(text.split('e')[1] or '0')) > EXACT_BITS//4:
+    return None
+  try:
+    return exactResult(fractions.Fraction(text))
+  except (ValueError,ZeroDivisionError):
+    return None
+
+##
+# The exact value of ANS or RCL if it is a whole number
+# @param value An mpf, int or None
+# @return An int or None
+##
+def exactValue(value):
+  if type(value) is int:
+    return value
+  if not hasattr(value,'_mpf_'):
+    return None
+  sign, man, exp, bc = value._mpf_
+  if 0 == man:
+    return 0 if 0 == exp else None
+  if exp < 0 or bc+exp > EXACT_BITS:
+    return None
+  return -(man << exp) if sign else man << exp
+
+##
+# A Container of a value from a vfn(), or a PError unchanged
+##
+def wrap(d):
+  if isinstance(d,PError):
+    return d
+  return Container(d)
 
 class PObject:
   "Abstract base class for parser objects"
+  __slots__ = ('name',)
   def __init__(self,error):
     self.name = None
+  def xfn(self,*arguments):
+    "Exact result of ints and Fractions; None where it is not exact"
+    return None
 
 class PError:
   "Abstract base class for parser error objects"
+  __slots__ = ('name',)
   def __init__(self,error):
     "Initialise PError"
     self.name = error
@@ -39,9 +241,39 @@ class PError:
 intError = PError('Error: not int')
 parError = PError('Parenthesis error')
 rangeError = PError('Out of range error')
+overflowError = PError('Overflow error')
+## Any other failure during an evaluation
+evaluationError = PError('Error')
+
+## Outputs of an evaluation that failed. An overflow is shown by name, as
+# the expression makes sense but its result is too large to work out;
+# anything else is Error.
+ERROR_OUTPUTS = ('Error',overflowError.name)
+
+##
+# The value and output of an evaluation that failed
+# @param d The PError it failed with, or None
+# @return 'Error' and the output to show
+##
+def failure(d=None):
+  if d is overflowError:
+    return 'Error',overflowError.name
+  return 'Error','Error'
+
+class TokenError(PError):
+  "PError for a token in the calculator title that is not recognised"
+  __slots__ = ('token','position')
+  def __init__(self,token,position):
+    "Initialise TokenError"
+    self.name = 'Token error'
+    self.token = token
+    self.position = position
+  def __repr__(self):
+    return 'TokenError('+repr(self.token)+','+str(self.position)+')'
 
 class Numeral(PObject):
   "PObject for numerals"
+  __slots__ = ()
   def __init__(self,numeral):
     "Initialise Numeral"
     self.name = numeral
@@ -62,6 +294,7 @@ minusNumeral = Numeral('-')
 
 class Sto(PObject):
   "PObject for STO"
+  __slots__ = ('value',)
   def __init__(self):
     "Initialise Sto"
     self.name = 'STO'
@@ -70,6 +303,7 @@ STOObject = Sto()
 
 class Mplus(PObject):
   "PObject for M+"
+  __slots__ = ('value',)
   def __init__(self):
     "Initialise Mplus"
     self.name = 'M+'
@@ -78,6 +312,7 @@ MplusObject = Mplus()
 
 class Mminus(PObject):
   "PObject for M-"
+  __slots__ = ('value',)
   def __init__(self):
     "Initialise Mminus"
     self.name = 'M-'
@@ -86,6 +321,7 @@ MminusObject = Mminus()
 
 class Mcl(PObject):
   "PObject for Mcl"
+  __slots__ = ('value',)
   def __init__(self):
     "Initialise Mclinus"
     self.name = 'Mcl'
@@ -94,20 +330,34 @@ MclObject = Mcl()
 
 class Container(PObject):
   "Abstract base class for containers (constant doubles)"
+  __slots__ = ('value',)
+  exact = None
   def __init__(self,value):
     self.name = 'dbl'
     self.value = value
   
+class Literal(Container):
+  "Container for a number written out in the expression"
+  __slots__ = ('text','exact')
+  def __init__(self,text):
+    "Initialise Literal with the value of the text at DECIMAL_PRECISION"
+    self.name = 'dbl'
+    self.text = text
+    self.value = context().mp.mpmathify(text)
+    self.exact = exactLiteral(text)
+
 class Pi(Container):
   "PObject for pi"
+  __slots__ = ()
   def __init__(self):
     "Initialise pi"
     self.name = 'pi'
-    self.value = mpmath.pi
+    self.value = context().pi
 piObject = Pi()
 
 class Ans(Container):
   "PObject for Ans"
+  __slots__ = ()
   def __init__(self,value):
     "Initialise Ans"
     self.name = 'ANS'
@@ -115,6 +365,7 @@ class Ans(Container):
 
 class Rcl(Container):
   "PObject for Rcl"
+  __slots__ = ()
   def __init__(self,value):
     "Initialise Rcl"
     self.name = 'RCL'
@@ -122,99 +373,182 @@ class Rcl(Container):
 
 class AFunction(PObject):
   "Abstract base class for +/-"
-  pass
+  __slots__ = ()
+  def fn(self,containerl,containerr,context):
+    "Apply vfn() to the values of two Containers"
+    return wrap(self.vfn(containerl.value,containerr.value,context))
   
 class Add(AFunction):
   "PObject for Add"
+  __slots__ = ()
   def __init__(self):
     "Initialise plus"
     self.name = '+'
-  def fn(self,containerl,containerr):
-    dl = containerl.value
-    dr = containerr.value
-    return Container(dl+dr)
+  def vfn(self,dl,dr,context):
+    return dl+dr
+  def ffn(self,l,el,r,er):
+    v = l+r
+    return v, el+er+abs(v)*FLOAT_EPSILON
+  def xfn(self,l,r):
+    return exactResult(l+r)
 addObject = Add()
   
 class Subtract(AFunction):
   "PObject for Subtract"
+  __slots__ = ()
   def __init__(self):
     "Initialise subtracts"
     self.name = '-'
-  def fn(self,containerl,containerr):
-    dl = containerl.value
-    dr = containerr.value
-    return Container(dl-dr)
+  def vfn(self,dl,dr,context):
+    return dl-dr
+  def ffn(self,l,el,r,er):
+    v = l-r
+    return v, el+er+abs(v)*FLOAT_EPSILON
+  def xfn(self,l,r):
+    return exactResult(l-r)
 subtractObject = Subtract()
 
 class DFunction(PObject):
   "Abstract base class for functions with left and right argument"
-  pass
+  __slots__ = ()
+  def fn(self,containerl,containerr,context):
+    "Apply vfn() to the values of two Containers"
+    return wrap(self.vfn(containerl.value,containerr.value,context))
   
 class E(DFunction):
   "PObject for E"
+  __slots__ = ()
   def __init__(self):
     "Initialise E"
     self.name = 'E'
-  def fn(self,containerl,containerr):
-    dl = containerl.value
-    dr = containerr.value
-    return Container(dl*mpmath.pow(10,dr))
+  def vfn(self,dl,dr,context):
+    if explosive(magnitude(dr)):
+      return overflowError
+    return dl*context.mp.power(10,dr)
+  def ffn(self,l,el,r,er):
+    return None
+  def xfn(self,l,r):
+    d = tenXObject.xfn(r)
+    if d is None:
+      return None
+    return exactResult(l*d)
 eObject = E()
   
 class Power(DFunction):
   "PObject for Power"
+  __slots__ = ()
   def __init__(self):
     "Initialise Power"
     self.name = '^'
-  def fn(self,containerl,containerr):
-    dl = containerl.value
-    dr = containerr.value
-    if dl < 0 and dr != mpmath.nint(dr):
+  def vfn(self,dl,dr,context):
+    if dl < 0 and dr != context.mp.nint(dr):
       return rangeError
-    return Container(mpmath.power(dl,dr))
+    # log10|dl^dr| is dr log10|dl|
+    m = 0.0
+    if 0 != dl:
+      m = magnitude(dl)
+      if abs(m) < 300:
+        m = math.log10(abs(float(dl)))
+    if 0 != m and explosive(magnitude(dr)+math.log10(abs(m))):
+      return overflowError
+    return context.mp.power(dl,dr)
+  def ffn(self,l,el,r,er):
+    if abs(l) <= el:
+      if 0 == l and 0 == el and r-er > 0:
+        return 0.0, 0.0
+      return None
+    if l < 0:
+      if 0 != er:
+        return None
+      if r != round(r):
+        return rangeError
+    v = l**r
+    return v, abs(v)*(abs(r/l)*el+abs(math.log(abs(l)))*er+2*FLOAT_EPSILON)
+  def xfn(self,l,r):
+    if type(r) is not int or (0 == l and r < 0) or abs(r)*exactBits(l) > EXACT_BITS:
+      return None
+    return exactResult(fractions.Fraction(l)**r)
 powerObject = Power()
 
 class Root(DFunction):
   "PObject for Root"
+  __slots__ = ()
   def __init__(self):
     "Initialise Root"
     self.name = 'root'
-  def fn(self,containerl,containerr):
-    dl = mpmath.mpf(1)/containerl.value
-    dr = containerr.value
-    if dr < 0 and dl != mpmath.nint(dr):
+  def vfn(self,l,dr,context):
+    dl = context.one/l
+    if dr < 0 and dl != context.mp.nint(dr):
       return rangeError
-    return Container(mpmath.power(dr,dl))
+    return context.mp.power(dr,dl)
+  def ffn(self,l,el,r,er):
+    if r < 0 or abs(l) <= el:
+      return None
+    dl = 1/l
+    return powerObject.ffn(r,er,dl,el/(l*l)+abs(dl)*FLOAT_EPSILON)
 rootObject = Root()
   
 class Combination(DFunction):
   "PObject for Combination"
+  __slots__ = ()
   def __init__(self):
     "Initialise Combination"
     self.name = 'C'
-  def fn(self,containerl,containerr):
-    dl = containerl.value
-    dr = containerr.value
+  def vfn(self,dl,dr,context):
     if dl != int(dl) or dr != int(dr):
       return intError;
-    return Container(mpmath.binomial(int(dl),int(dr)))
+    return context.mp.binomial(int(dl),int(dr))
+  def ffn(self,l,el,r,er):
+    if abs(l-round(l)) > 2*el or abs(r-round(r)) > 2*er:
+      return intError
+    if 0 != el or 0 != er:
+      return None
+    n = int(l)
+    k = int(r)
+    if n < 0 or k < 0 or n > FLOAT_COMBINATORICS:
+      return None
+    v = float(math.comb(n,k))
+    return v, abs(v)*FLOAT_EPSILON
+  def xfn(self,l,r):
+    if type(l) is not int or type(r) is not int:
+      return intError
+    if l < 0 or r < 0 or l > EXACT_BITS:
+      return None
+    return math.comb(l,r)
 combinationObject = Combination()
 
 class Permutation(DFunction):
   "PObject for Permutation"
+  __slots__ = ()
   def __init__(self):
     "Initialise Permutation"
     self.name = 'P'
-  def fn(self,containerl,containerr):
-    dl = containerl.value
-    dr = containerr.value
+  def vfn(self,dl,dr,context):
     if dl != int(dl) or dr != int(dr):
       return intError;
-    return Container(mpmath.binomial(int(dl),int(dl)-int(dr)))
+    return context.mp.binomial(int(dl),int(dl)-int(dr))
+  def ffn(self,l,el,r,er):
+    if abs(l-round(l)) > 2*el or abs(r-round(r)) > 2*er:
+      return intError
+    if 0 != el or 0 != er:
+      return None
+    n = int(l)
+    k = n-int(r)
+    if n < 0 or k < 0 or n > FLOAT_COMBINATORICS:
+      return None
+    v = float(math.comb(n,k))
+    return v, abs(v)*FLOAT_EPSILON
+  def xfn(self,l,r):
+    if type(l) is not int or type(r) is not int:
+      return intError
+    if l < 0 or l < r or l > EXACT_BITS:
+      return None
+    return math.comb(l,l-r)
 permutationObject = Permutation()
 
 class LParen(PObject):
   "PObject for ("
+  __slots__ = ()
   def __init__(self):
     "Initialise LParen"
     self.name = '('
@@ -222,6 +556,7 @@ lparenObject = LParen()
 
 class RParen(PObject):
   "PObject for )"
+  __slots__ = ()
   def __init__(self):
     "Initialise RParen"
     self.name = ')'
@@ -229,261 +564,422 @@ rparenObject = RParen()
 
 class RFunction(PObject):
   "Abstract base class for functions with right argument"
-  pass
+  __slots__ = ()
+  def fn(self,container,context):
+    "Apply vfn() to the value of a Container"
+    return wrap(self.vfn(container.value,context))
   
 class Uplus(RFunction):
   "PObject for +"
+  __slots__ = ()
   def __init__(self):
     "Initialise Uplus"
     self.name = 'u+'
-  def fn(self,container):
-    return container
+  def vfn(self,d,context):
+    return d
+  def ffn(self,x,ex):
+    return x, ex
+  def xfn(self,x):
+    return x
 uplusObject = Uplus()
 
 class Uminus(RFunction):
   "PObject for -"
+  __slots__ = ()
   def __init__(self):
     "Initialise Uminus"
     self.name = 'u-'
-  def fn(self,container):
-    d = container.value
-    return Container(-d)
+  def vfn(self,d,context):
+    return -d
+  def ffn(self,x,ex):
+    return -x, ex
+  def xfn(self,x):
+    return -x
 uminusObject = Uminus()
 
 class SquareRoot(RFunction):
   "PObject for square root"
+  __slots__ = ()
   def __init__(self):
     "Initialise SquareRoot"
     self.name = 'sqrt'
-  def fn(self,container):
-    d = container.value
+  def vfn(self,d,context):
     if d < 0:
       return rangeError
-    return Container(mpmath.sqrt(d))
+    return context.mp.sqrt(d)
+  def ffn(self,x,ex):
+    if x+ex < 0:
+      return rangeError
+    if x-ex < 0:
+      return None
+    v = math.sqrt(x)
+    if 0 == v:
+      return (v,0.0) if 0 == ex else None
+    return v, ex/(2*v)+v*FLOAT_EPSILON
+  def xfn(self,x):
+    if x < 0:
+      return None
+    x = fractions.Fraction(x)
+    n = math.isqrt(x.numerator)
+    d = math.isqrt(x.denominator)
+    if n*n != x.numerator or d*d != x.denominator:
+      return None
+    return exactResult(fractions.Fraction(n,d))
 squareRootObject = SquareRoot()
 
 class CubeRoot(RFunction):
   "PObject for cube root"
+  __slots__ = ()
   def __init__(self):
     "Initialise CubeRoot"
     self.name = 'cbrt'
-  def fn(self,container):
-    d = container.value
-    return Container(mpmath.power(d,mpmath.mpf(1)/mpmath.mpf(3)))
+  def vfn(self,d,context):
+    return context.mp.power(d,context.third)
+  def ffn(self,x,ex):
+    if x-ex <= 0:
+      return (0.0,0.0) if 0 == x and 0 == ex else None
+    v = x**(1.0/3.0)
+    return v, ex/(3*v*v)+2*v*FLOAT_EPSILON
 cubeRootObject = CubeRoot()
 
 class Log(RFunction):
   "PObject for log"
+  __slots__ = ()
   def __init__(self):
     "Initialise Log"
     self.name = 'log'
-  def fn(self,container):
-    d = container.value
+  def vfn(self,d,context):
     if d <= 0:
       return rangeError
-    return Container(mpmath.log10(d))
+    return context.mp.log10(d)
+  def ffn(self,x,ex):
+    if x+ex <= 0:
+      return rangeError
+    if x-ex <= 0:
+      return None
+    v = math.log10(x)
+    return v, ex/(x*LN10)+2*abs(v)*FLOAT_EPSILON
 logObject = Log()
 
 class Ln(RFunction):
   "PObject for ln"
+  __slots__ = ()
   def __init__(self):
     "Initialise Ln"
     self.name = 'ln'
-  def fn(self,container):
-    d = container.value
+  def vfn(self,d,context):
     if d <= 0:
       return rangeError
-    return Container(mpmath.log(d))
+    return context.mp.log(d)
+  def ffn(self,x,ex):
+    if x+ex <= 0:
+      return rangeError
+    if x-ex <= 0:
+      return None
+    v = math.log(x)
+    return v, ex/x+2*abs(v)*FLOAT_EPSILON
 lnObject = Ln()
 
 class TenX(RFunction):
   "PObject for 10^x"
+  __slots__ = ()
   def __init__(self):
     "Initialise TenX"
     self.name = 'tenX'
-  def fn(self,container):
-    d = container.value
-    return Container(mpmath.power(10,d))
+  def vfn(self,d,context):
+    if explosive(magnitude(d)):
+      return overflowError
+    return context.mp.power(10,d)
+  def ffn(self,x,ex):
+    v = 10.0**x
+    return v, v*(LN10*ex+2*FLOAT_EPSILON)
+  def xfn(self,x):
+    if type(x) is not int or 4*abs(x) > EXACT_BITS:
+      return None
+    return 10**x if x >= 0 else fractions.Fraction(1,10**-x)
 tenXObject = TenX()
 
 class Exp(RFunction):
   "PObject for exp"
+  __slots__ = ()
   def __init__(self):
     "Initialise Exp"
     self.name = 'exp'
-  def fn(self,container):
-    d = container.value
-    return Container(mpmath.exp(d))
+  def vfn(self,d,context):
+    if explosive(magnitude(d)+math.log10(math.log10(math.e))):
+      return overflowError
+    return context.mp.exp(d)
+  def ffn(self,x,ex):
+    v = math.exp(x)
+    return v, v*(ex+2*FLOAT_EPSILON)
 expObject = Exp()
 
 class TrigFunction(RFunction):
   "Abstract base class for trig functions"
-  pass
+  __slots__ = ()
+  def fn(self,container,scale,context):
+    "Apply vfn() to the value of a Container"
+    return wrap(self.vfn(container.value,scale,context))
 
 class Sin(TrigFunction):
   "PObject for sin"
+  __slots__ = ()
   def __init__(self):
     "Initialise Sin"
     self.name = 'sin'
-  def fn(self,container,scale):
+  def vfn(self,x,scale,context):
     if 1 == scale:
-      d = mpmath.sin(container.value)
+      d = context.mp.sin(x)
     else:
-      d = mpmath.sin(mpmath.radians(container.value))
-    if mpmath.fabs(d) < mpmath.mpf(1e-50):
-      d = mpmath.mpf(0)
-    return Container(d)
+      d = context.mp.sin(context.mp.radians(x))
+    if context.mp.fabs(d) < context.tiny:
+      d = context.zero
+    return d
+  def ffn(self,x,ex,scale):
+    t, et = floatRadians(x,ex,scale)
+    v = math.sin(t)
+    return v, abs(math.cos(t))*et+2*abs(v)*FLOAT_EPSILON
 sinObject = Sin()
 
 class Cos(TrigFunction):
   "PObject for cos"
+  __slots__ = ()
   def __init__(self):
     "Initialise Cos"
     self.name = 'cos'
-  def fn(self,container,scale):
+  def vfn(self,x,scale,context):
     if 1 == scale:
-      d = mpmath.cos(container.value)
+      d = context.mp.cos(x)
     else:
-      d = mpmath.cos(mpmath.radians(container.value))
-    if mpmath.fabs(d) < mpmath.mpf(1e-50):
-      d = mpmath.mpf(0)
-    return Container(d)
+      d = context.mp.cos(context.mp.radians(x))
+    if context.mp.fabs(d) < context.tiny:
+      d = context.zero
+    return d
+  def ffn(self,x,ex,scale):
+    t, et = floatRadians(x,ex,scale)
+    v = math.cos(t)
+    return v, abs(math.sin(t))*et+2*abs(v)*FLOAT_EPSILON
 cosObject = Cos()
 
 class Tan(TrigFunction):
   "PObject for tan"
+  __slots__ = ()
   def __init__(self):
     "Initialise tan"
     self.name = 'Tan'
-  def fn(self,container,scale):
+  def vfn(self,x,scale,context):
     if 1 == scale:
-      d = mpmath.tan(container.value)
+      d = context.mp.tan(x)
     else:
-      d = mpmath.tan(mpmath.radians(container.value))
-    if mpmath.fabs(d) < mpmath.mpf(1e-50):
-      d = mpmath.mpf(0)
-    return Container(d)
+      d = context.mp.tan(context.mp.radians(x))
+    if context.mp.fabs(d) < context.tiny:
+      d = context.zero
+    return d
+  def ffn(self,x,ex,scale):
+    t, et = floatRadians(x,ex,scale)
+    v = math.tan(t)
+    return v, (1+v*v)*et+2*abs(v)*FLOAT_EPSILON
 tanObject = Tan()
 
 class Arcsin(TrigFunction):
   "PObject for sin"
+  __slots__ = ()
   def __init__(self):
     "Initialise Arcsin"
     self.name = 'ascosin'
-  def fn(self,container,scale):
-    if container.value > mpmath.mpf(1) or container.value < mpmath.mpf(-1):
+  def vfn(self,x,scale,context):
+    if x > context.one or x < -context.one:
       return rangeError
     if 1 == scale:
-      d = mpmath.asin(container.value)
+      d = context.mp.asin(x)
     else:
-      d = mpmath.degrees(mpmath.asin(container.value))
-    if mpmath.fabs(d) < mpmath.mpf(1e-50):
-      d = mpmath.mpf(0)
-    return Container(d)
+      d = context.mp.degrees(context.mp.asin(x))
+    if context.mp.fabs(d) < context.tiny:
+      d = context.zero
+    return d
+  def ffn(self,x,ex,scale):
+    if x-ex > 1 or x+ex < -1:
+      return rangeError
+    if x+ex > 1 or x-ex < -1:
+      return None
+    v = math.asin(x)
+    e = 2*abs(v)*FLOAT_EPSILON
+    if 0 != ex:
+      e += ex/math.sqrt(1-x*x)
+    return floatDegrees(v,e,scale)
 arcsinObject = Arcsin()
 
 class Arccos(TrigFunction):
   "PObject for cos"
+  __slots__ = ()
   def __init__(self):
     "Initialise Arccos"
     self.name = 'acos'
-  def fn(self,container,scale):
-    if container.value > mpmath.mpf(1) or container.value < mpmath.mpf(-1):
+  def vfn(self,x,scale,context):
+    if x > context.one or x < -context.one:
       return rangeError
     if 1 == scale:
-      d = mpmath.acos(container.value)
+      d = context.mp.acos(x)
     else:
-      d = mpmath.degrees(mpmath.acos(container.value))
-    if mpmath.fabs(d) < mpmath.mpf(1e-50):
-      d = mpmath.mpf(0)
-    return Container(d)
+      d = context.mp.degrees(context.mp.acos(x))
+    if context.mp.fabs(d) < context.tiny:
+      d = context.zero
+    return d
+  def ffn(self,x,ex,scale):
+    if x-ex > 1 or x+ex < -1:
+      return rangeError
+    if x+ex > 1 or x-ex < -1:
+      return None
+    v = math.acos(x)
+    e = 2*abs(v)*FLOAT_EPSILON
+    if 0 != ex:
+      e += ex/math.sqrt(1-x*x)
+    return floatDegrees(v,e,scale)
 arccosObject = Arccos()
 
 class Arctan(TrigFunction):
   "PObject for arctan"
+  __slots__ = ()
   def __init__(self):
     "Initialise Arctan"
     self.name = 'atan'
-  def fn(self,container,scale):
-    if container.value > mpmath.mpf(1) or container.value < mpmath.mpf(-1):
+  def vfn(self,x,scale,context):
+    if x > context.one or x < -context.one:
       return rangeError
     if 1 == scale:
-      d = mpmath.atan(container.value)
+      d = context.mp.atan(x)
     else:
-      d = mpmath.degrees(mpmath.atan(container.value))
-    if mpmath.fabs(d) < mpmath.mpf(1e-50):
-      d = mpmath.mpf(0)
-    return Container(d)
+      d = context.mp.degrees(context.mp.atan(x))
+    if context.mp.fabs(d) < context.tiny:
+      d = context.zero
+    return d
+  def ffn(self,x,ex,scale):
+    if x-ex > 1 or x+ex < -1:
+      return rangeError
+    if x+ex > 1 or x-ex < -1:
+      return None
+    v = math.atan(x)
+    return floatDegrees(v,ex/(1+x*x)+2*abs(v)*FLOAT_EPSILON,scale)
 arctanObject = Arctan()
 
 class LFunction(PObject):
   "Abstract base class for functions with left argument"
-  pass
+  __slots__ = ()
+  def fn(self,container,context):
+    "Apply vfn() to the value of a Container"
+    return wrap(self.vfn(container.value,context))
 
 class Square(LFunction):
   "PObject for square"
+  __slots__ = ()
   def __init__(self):
     "Initialise Square"
     self.name = 'square'
-  def fn(self,container):
-    d = container.value
-    return Container(d*d)
+  def vfn(self,d,context):
+    return d*d
+  def ffn(self,x,ex):
+    v = x*x
+    return v, (2*abs(x)+ex)*ex+v*FLOAT_EPSILON
+  def xfn(self,x):
+    return exactResult(x*x)
 squareObject = Square()
 
 class Cube(LFunction):
   "PObject for cube"
+  __slots__ = ()
   def __init__(self):
     "Initialise Cube"
     self.name = 'cube'
-  def fn(self,container):
-    d = container.value
-    return Container(d*d*d)
+  def vfn(self,d,context):
+    return d*d*d
+  def ffn(self,x,ex):
+    v = x*x*x
+    return v, ((3*abs(x)+ex)*abs(x)+ex*ex)*ex+2*abs(v)*FLOAT_EPSILON
+  def xfn(self,x):
+    return exactResult(x*x*x)
 cubeObject = Cube()
 
 class Factorial(LFunction):
   "PObject for factorial"
+  __slots__ = ()
   def __init__(self):
     "Initialise Factorial"
     self.name = '!'
-  def fn(self,container):
-    d = container.value
-    return Container(mpmath.factorial(d))
+  def vfn(self,d,context):
+    # log10|d!| is about d log10(d)
+    m = magnitude(d)
+    if m > 1 and explosive(m+math.log10(m)):
+      return overflowError
+    return context.mp.factorial(d)
+  def ffn(self,x,ex):
+    if 0 != ex or x != int(x) or x < 0 or x > 170:
+      return None
+    v = float(math.factorial(int(x)))
+    return v, v*FLOAT_EPSILON
+  def xfn(self,x):
+    if type(x) is not int or x < 0 or x*x.bit_length() > EXACT_BITS:
+      return None
+    return math.factorial(x)
 factorialObject = Factorial()
 
 class Inverse(LFunction):
   "PObject for inverse"
+  __slots__ = ()
   def __init__(self):
     "Initialise Inverse"
     self.name = 'inv'
-  def fn(self,container):
-    d = container.value
-    return Container(1/d)
+  def vfn(self,d,context):
+    return 1/d
+  def ffn(self,x,ex):
+    if abs(x) <= ex:
+      return rangeError if 0 == x else None
+    v = 1/x
+    return v, ex/(abs(x)*(abs(x)-ex))+abs(v)*FLOAT_EPSILON
+  def xfn(self,x):
+    if 0 == x:
+      return None
+    return exactResult(1/fractions.Fraction(x))
 inverseObject = Inverse()
 
 class MFunction(PObject):
   "Abstract base class for functions multiplicaion/division"
-  pass
+  __slots__ = ()
+  def fn(self,containerl,containerr,context):
+    "Apply vfn() to the values of two Containers"
+    return wrap(self.vfn(containerl.value,containerr.value,context))
 
 class Multiply(MFunction):
   "PObject for *"
+  __slots__ = ()
   def __init__(self):
     "Initialise Multiply"
     self.name = '*'
-  def fn(self,containerl,containerr):
-    dl = containerl.value
-    dr = containerr.value
-    return Container(dl*dr)
+  def vfn(self,dl,dr,context):
+    return dl*dr
+  def ffn(self,l,el,r,er):
+    v = l*r
+    return v, abs(l)*er+abs(r)*el+el*er+abs(v)*FLOAT_EPSILON
+  def xfn(self,l,r):
+    return exactResult(l*r)
 multiplyObject = Multiply()
 
 class Divide(MFunction):
   "PObject for /"
+  __slots__ = ()
   def __init__(self):
     "Initialise Divide"
     self.name = '/'
-  def fn(self,containerl,containerr):
-    dl = containerl.value
-    dr = containerr.value
-    return Container(dl/dr)
+  def vfn(self,dl,dr,context):
+    return dl/dr
+  def ffn(self,l,el,r,er):
+    if abs(r) <= er:
+      return rangeError if 0 == r else None
+    v = l/r
+    return v, (abs(l)*er+abs(r)*el)/(abs(r)*(abs(r)-er))+abs(v)*FLOAT_EPSILON
+  def xfn(self,l,r):
+    if 0 == r:
+      return None
+    return exactResult(fractions.Fraction(l)/r)
 divideObject = Divide()
 
 ##
@@ -497,117 +993,115 @@ def splice(myList,index,elements,newElement=None):
   else:
     return part1+[newElement]+part2
     
+## Tokens in the string from the calculator title and their PObjects.
+# ANS and RCL are not here because they carry a value.
+TOKENS = {
+  '#0': zeroNumeral, '#1': oneNumeral, '#2': twoNumeral, '#3': threeNumeral,
+  '#4': fourNumeral, '#5': fiveNumeral, '#6': sixNumeral, '#7': sevenNumeral,
+  '#8': eightNumeral, '#9': nineNumeral, '#.': decimalNumeral,
+  '#e': eNumeral, '#-': minusNumeral,
+  'pi': piObject,
+  '+': addObject, '-': subtractObject,
+  'E': eObject, '^': powerObject, 'C': combinationObject,
+  'P': permutationObject, 'root': rootObject,
+  '(': lparenObject, ')': rparenObject,
+  'u+': uplusObject, 'u-': uminusObject,
+  'sqrt': squareRootObject, 'cbrt': cubeRootObject,
+  'log': logObject, 'ln': lnObject, 'tenX': tenXObject, 'exp': expObject,
+  'sin': sinObject, 'cos': cosObject, 'tan': tanObject,
+  'asin': arcsinObject, 'acos': arccosObject, 'atan': arctanObject,
+  '2': squareObject, '3': cubeObject, '!': factorialObject,
+  'inv': inverseObject,
+  '*': multiplyObject, '/': divideObject,
+  'STO': STOObject, 'M+': MplusObject, 'M-': MminusObject, 'MCL': MclObject,
+}
+## Tokens of the calculator title by PObject, for tokenString()
+TOKEN_STRINGS = {obj: token for token, obj in TOKENS.items()}
+## Tokens that only say where the result is stored
+STORE_TOKENS = frozenset(('STO','M+','M-','MCL'))
+
 ##
-# Convert a string from calnulator title to list o PObjects
+# Convert a string from calnulator title to list o PObjects. A token that
+# is not recognised becomes a TokenError in the list.
 ##
 def convertStringToPObjectList(objectString,memory,answer):
-  tokens = objectString.split(';')
+  if objectString.startswith(wireFormat.WIRE_PREFIX):
+    return wireFormat.decodeCompact(objectString,memory,answer)
   pobjects = []
-  for token in tokens:
-    if '' == token:
-      pass
-    elif '#0' == token:
-      pobjects += [zeroNumeral]
-    elif '#1' == token:
-      pobjects += [oneNumeral]
-    elif '#2' == token:
-      pobjects += [twoNumeral]
-    elif '#3' == token:
-      pobjects += [threeNumeral]
-    elif '#4' == token:
-      pobjects += [fourNumeral]
-    elif '#5' == token:
-      pobjects += [fiveNumeral]
-    elif '#6' == token:
-      pobjects += [sixNumeral]
-    elif '#7' == token:
-      pobjects += [sevenNumeral]
-    elif '#8' == token:
-      pobjects += [eightNumeral]
-    elif '#9' == token:
-      pobjects += [nineNumeral]
-    elif '#.' == token:
-      pobjects += [decimalNumeral]
-    elif '#e' == token:
-      pobjects += [eNumeral]
-    elif '#-' == token:
-      pobjects += [minusNumeral]
-    elif 'pi' == token:
-      pobjects += [piObject]
+  append = pobjects.append
+  get = TOKENS.get
+  position = 0
+  for token in objectString.split(';'):
+    obj = get(token)
+    if None != obj:
+      append(obj)
     elif 'ANS' == token:
-      pobjects += [Ans(answer)]
+      append(Ans(answer if answer is None else context().convert(answer)))
     elif 'RCL' == token:
-      pobjects += [Rcl(memory)]
-    elif '+' == token:
-      pobjects += [addObject]
-    elif '-' == token:
-      pobjects += [subtractObject]
-    elif 'E' == token:
-      pobjects += [eObject]
-    elif '^' == token:
-      pobjects += [powerObject]
-    elif 'C' == token:
-      pobjects += [combinationObject]
-    elif 'P' == token:
-      pobjects += [permutationObject]
-    elif 'root' == token:
-      pobjects += [rootObject]
-    elif '(' == token:
-      pobjects += [lparenObject]
-    elif ')' == token:
-      pobjects += [rparenObject]
-    elif 'u+' == token:
-      pobjects += [uplusObject]
-    elif 'u-' == token:
-      pobjects += [uminusObject]
-    elif 'sqrt' == token:
-      pobjects += [squareRootObject]
-    elif 'cbrt' == token:
-      pobjects += [cubeRootObject]
-    elif 'log' == token:
-      pobjects += [logObject]
-    elif 'ln' == token:
-      pobjects += [lnObject]
-    elif 'tenX' == token:
-      pobjects += [tenXObject]
-    elif 'exp' == token:
-      pobjects += [expObject]
-    elif 'sin' == token:
-      pobjects += [sinObject]
-    elif 'cos' == token:
-      pobjects += [cosObject]
-    elif 'tan' == token:
-      pobjects += [tanObject]
-    elif 'asin' == token:
-      pobjects += [arcsinObject]
-    elif 'acos' == token:
-      pobjects += [arccosObject]
-    elif 'atan' == token:
-      pobjects += [arctanObject]
-    elif '2' == token:
-      pobjects += [squareObject]
-    elif '3' == token:
-      pobjects += [cubeObject]
-    elif '!' == token:
-      pobjects += [factorialObject]
-    elif 'inv' == token:
-      pobjects += [inverseObject]
-    elif '*' == token:
-      pobjects += [multiplyObject]
-    elif '/' == token:
-      pobjects += [divideObject]
-    elif 'STO' == token:
-      pobjects += [STOObject]
-    elif 'M+' == token:
-      pobjects += [MplusObject]
-    elif 'M-' == token:
-      pobjects += [MminusObject]
-    elif 'MCL' == token:
-      pobjects += [MclObject]
-    else:
-      print('convertStringToPObjectList: \''+token+'\' is not recognised.')
+      append(Rcl(memory if memory is None else context().convert(memory)))
+    elif '' != token:
+      append(TokenError(token,position))
+    position += 1
   return pobjects
 
+##
+# Convert many strings from calculator titles to lists of PObjects.
+# @param objectStrings An iterable of strings
+# @return A generator of lists of PObjects
+##
+def tokenize_many(objectStrings,memory=None,answer=None):
+  for objectString in objectStrings:
+    yield convertStringToPObjectList(objectString,memory,answer)
+
+## Words and symbols in plain infix expressions and their tokens. Words
+# are matched ignoring case.
+INFIX_WORDS = {
+  'pi': 'pi', 'ans': 'ANS', 'rcl': 'RCL',
+  'sqrt': 'sqrt', 'cbrt': 'cbrt', 'log': 'log', 'ln': 'ln',
+  'exp': 'exp', 'tenx': 'tenX',
+  'sin': 'sin', 'cos': 'cos', 'tan': 'tan',
+  'asin': 'asin', 'acos': 'acos', 'atan': 'atan',
+  'inv': 'inv', 'root': 'root', 'c': 'C', 'p': 'P', 'e': 'E',
+}
+INFIX_SYMBOLS = {
+  '+': '+', '-': '-', '\u2212': '-', '*': '*', '\u00d7': '*',
+  '/': '/', '\u00f7': '/', '^': '^', '(': '(', ')': ')', '!': '!',
+  '\u00b2': '2', '\u00b3': '3', '\u03c0': 'pi', '\u221a': 'sqrt',
+}
+
+##
+# Convert a plain infix expression such as 2*sin(30)+1e-3 to the string
+# that the calculator puts in its title. Anything not recognised is
+# passed through so that convertStringToPObjectList() reports it.
+# @param expression The infix expression
+# @return A string of tokens separated by ;
+##
+def convertInfixToString(expression):
+  tokens = []
+  i = 0
+  L = len(expression)
+  while i < L:
+    c = expression[i]
+    if c.isspace():
+      i += 1
+    elif c in '0123456789.':
+      tokens.append('#'+c)
+      i += 1
+    elif c.isalpha() and c.isascii():
+      j = i + 1
+      while j < L and expression[j].isalpha() and expression[j].isascii():
+        j += 1
+      word = expression[i:j]
+      tokens.append(INFIX_WORDS.get(word.lower(),word))
+      i = j
+    elif '*' == c and i+1 < L and '*' == expression[i+1]:
+      tokens.append('^')
+      i += 2
+    else:
+      tokens.append(INFIX_SYMBOLS.get(c,c))
+      i += 1
+  return ''.join(token+';' for token in tokens)
+
 ##
 # Convert exponents into a form that can be read directly. Exponents get
 # converted early in the process of evaluating an expression.
@@ -657,7 +1151,7 @@ def convertNumerals(list):
       numberString = ''
       for k in range(i,j):
         numberString += list[k].name
-      list = splice(list,i,j-i,Container(mpmath.mpmathify(numberString)))
+      list = splice(list,i,j-i,Literal(numberString))
     ## next iteration
     i += 1
   return list
@@ -702,7 +1196,7 @@ def convertLFunctions(list):
   while i < len(list):
     obj = list[i];
     if isinstance(obj,LFunction):
-      d = obj.fn(list[i-1])
+      d = obj.fn(list[i-1],context())
       list = splice(list,i-1,2,d)
       i -= 1
     i += 1
@@ -723,16 +1217,16 @@ def convertDFunctions(list,scale):
       if isinstance(list[i+1],RFunction):
         j = i+1;
         while isinstance(list[j+1],RFunction):
-          ++j;
+          j += 1
         # j is index of last RFunction
         while j > i:
           if isinstance(list[j],TrigFunction):
-            list[j] = list[j].fn(list[j+1],scale)
+            list[j] = list[j].fn(list[j+1],scale,context())
           else:
-            list[j] = list[j].fn(list[j+1])
+            list[j] = list[j].fn(list[j+1],context())
           list = splice(list,j+1,1);
-          --j # next RFunction
-      list[i-1] = list[i].fn(list[i-1],list[i+1]);
+          j -= 1 # next RFunction
+      list[i-1] = list[i].fn(list[i-1],list[i+1],context());
       list = splice(list,i,2);
     else:
       i += 1
@@ -755,9 +1249,9 @@ def convertRFunctions(list,scale):
     o = list[i]
     if isinstance(o,RFunction):
       if isinstance(o,TrigFunction):
-        list = splice(list,i,2,o.fn(list[i+1],scale))
+        list = splice(list,i,2,o.fn(list[i+1],scale,context()))
       else:
-        list = splice(list,i,2,o.fn(list[i+1]))
+        list = splice(list,i,2,o.fn(list[i+1],context()))
     i -= 1
   return list
 
@@ -776,7 +1270,7 @@ def convertMFunctions(list,scale):
   while i+1 < len(list): # skip first and last
     o = list[i]
     if isinstance(o,MFunction):
-      list[i-1] = o.fn(list[i-1],list[i+1]);
+      list[i-1] = o.fn(list[i-1],list[i+1],context());
       list = splice(list,i,2)
       i -= 1
     i += 1
@@ -797,7 +1291,7 @@ def convertAFunctions(list,scale):
   while i < len(list):
     o = list[i]
     if isinstance(o,AFunction):
-      list[i-1] = list[i].fn(list[i-1],list[i+1])
+      list[i-1] = list[i].fn(list[i-1],list[i+1],context())
       list = splice(list,i,2)
       i -= 1
     i += 1
@@ -850,11 +1344,13 @@ def stripParentheses(list,scale):
   return list, True
 
 ##
-# This is the main evaluation function. It works by a finding suitable
+# This was the main evaluation function. It works by a finding suitable
 # subexpressions and calling a cascade of methods to evaluate the expression
 # in the correct sequence. Thus the parser works largely by recursion on
 # what can be thought of as a tree of PObjects defined by the sequence of
-# Parser methods and the PObject hierarchy.
+# Parser methods and the PObject hierarchy. Every stage rebuilds the list,
+# so it is quadratic in the number of tokens. It is kept as the reference
+# that evaluate() is checked against.
 #
 # There may be some inconsistency here&mdash;either Parser should store AngleType
 # or it doesn&rsquo;t need to store Base.
@@ -864,7 +1360,7 @@ def stripParentheses(list,scale):
 # @param scale Whether to use radians or degrees
 # @return A double or an error if the expression was nonsensical.
 #/
-def evaluate(list,scale):
+def evaluateCascade(list,scale):
   try:
     while True:
       list, rpt = stripParentheses(list,scale)
@@ -872,7 +1368,834 @@ def evaluate(list,scale):
         break
     list = convertToProduct(list,scale)
     d = list[0]
+    if isinstance(d,PError):
+      return failure(d)
     return d.value,formatOutput.format(d.value,DIGITS)
     #return d.value,formatOutput.format(d.value,DIGITS)
   except:
     return 'Error','Error'
+
+class Product(PObject):
+  "PObject for the implicit multiplication of adjacent values"
+  __slots__ = ()
+  def __init__(self):
+    "Initialise Product"
+    self.name = 'product'
+  def fn(self,containerl,containerr,context):
+    "Apply vfn() to the values of two Containers"
+    return wrap(self.vfn(containerl.value,containerr.value,context))
+  def vfn(self,l,r,context):
+    return l*r
+  def ffn(self,l,el,r,er):
+    v = l*r
+    return v, abs(l)*er+abs(r)*el+el*er+abs(v)*FLOAT_EPSILON
+  def xfn(self,l,r):
+    return exactResult(l*r)
+productObject = Product()
+
+## Precedence of each kind of operator in parse(). The order is the order
+# of the cascade: LFunctions bind tightest and are applied at once,
+# then DFunctions, RFunctions, MFunctions, AFunctions and finally the
+# juxtaposition that convertToProduct multiplies out. An RFunction that
+# follows a DFunction belongs to the right argument of the DFunction and
+# so binds more tightly than the DFunction.
+TIGHT_R_PRECEDENCE = 5
+D_PRECEDENCE = 4
+R_PRECEDENCE = 3
+M_PRECEDENCE = 2
+A_PRECEDENCE = 1
+PRODUCT_PRECEDENCE = 0
+
+## Instruction codes in a program returned by parse()
+PUSH = 0
+UNARY = 1
+TRIG = 2
+BINARY = 3
+ANSWER = 4
+MEMORY = 5
+## A float and its error bound, only in programs from floatProgram()
+FLOAT = 6
+
+##
+# Find the parentheses of groups that contain nothing but other empty
+# groups. stripParentheses() removes these without trace, so parse()
+# must skip them too.
+# @param list A list of tokens to be evaluated.
+# @return A set of indices of tokens to skip or None if parentheses
+# do not match.
+##
+def findEmptyGroups(list):
+  skip = set()
+  stack = []
+  for i in range(len(list)):
+    obj = list[i]
+    if isinstance(obj,LParen):
+      stack.append([i,False])
+    elif isinstance(obj,RParen):
+      if 0 == len(stack):
+        return None
+      lparen, full = stack.pop()
+      if full:
+        if 0 != len(stack):
+          stack[-1][1] = True
+      else:
+        skip.add(lparen)
+        skip.add(i)
+    elif 0 != len(stack):
+      stack[-1][1] = True
+  if 0 != len(stack):
+    return None
+  return skip
+
+##
+# Convert a list of PObjects to a program in reverse Polish notation. This
+# is a single pass, shunting-yard, version of the cascade from
+# stripParentheses() to convertNumerals() and gives the same values.
+# Each instruction is a pair: PUSH with a Container, ANSWER with an Ans,
+# MEMORY with an Rcl or UNARY, TRIG or BINARY with the PObject whose fn()
+# is applied to the top of the stack.
+# @param list A list of tokens to be evaluated.
+# @return A list of instructions or parError if the expression was
+# nonsensical.
+##
+def parse(list):
+  skip = findEmptyGroups(list)
+  if None == skip:
+    return parError
+  program = []
+  operators = [] # pairs of precedence and PObject; LParen marks a group
+  numeral = ''   # Numerals waiting to be converted
+  exponent = False # just seen E so + and - are part of the exponent
+  negative = False
+  expectValue = True # next token must start a value
+  tight = False # next RFunction is the right argument of a DFunction
+  for i in range(len(list)):
+    if i in skip:
+      continue
+    obj = list[i]
+    if exponent:
+      if isinstance(obj,Add) or isinstance(obj,Subtract):
+        if isinstance(obj,Subtract):
+          negative = not negative
+        continue
+      exponent = False
+      if negative:
+        numeral += minusNumeral.name
+    if isinstance(obj,Numeral):
+      numeral += obj.name
+      continue
+    if isinstance(obj,E):
+      numeral += eNumeral.name
+      exponent = True
+      negative = False
+      continue
+    if '' != numeral:
+      # the numerals form one value
+      if not expectValue:
+        pushOperator(program,operators,PRODUCT_PRECEDENCE,productObject)
+      program.append((PUSH,Literal(numeral)))
+      numeral = ''
+      expectValue = False
+      tight = False
+    if isinstance(obj,AFunction) and expectValue:
+      # unary ±
+      if isinstance(obj,Add):
+        obj = uplusObject
+      else:
+        obj = uminusObject
+    if isinstance(obj,Container) or isinstance(obj,LParen) or isinstance(obj,RFunction):
+      if not expectValue:
+        pushOperator(program,operators,PRODUCT_PRECEDENCE,productObject)
+        tight = False
+      if isinstance(obj,Ans):
+        program.append((ANSWER,obj))
+        expectValue = False
+        tight = False
+      elif isinstance(obj,Rcl):
+        program.append((MEMORY,obj))
+        expectValue = False
+        tight = False
+      elif isinstance(obj,Container):
+        program.append((PUSH,obj))
+        expectValue = False
+        tight = False
+      elif isinstance(obj,LParen):
+        operators.append((None,obj))
+        expectValue = True
+        tight = False
+      elif tight:
+        operators.append((TIGHT_R_PRECEDENCE,obj))
+        expectValue = True
+      else:
+        operators.append((R_PRECEDENCE,obj))
+        expectValue = True
+      continue
+    if isinstance(obj,PError):
+      return obj
+    if expectValue:
+      return parError
+    tight = False
+    if isinstance(obj,LFunction):
+      program.append((UNARY,obj))
+    elif isinstance(obj,RParen):
+      while not isinstance(operators[-1][1],LParen):
+        appendOperator(program,operators.pop()[1])
+      operators.pop()
+    elif isinstance(obj,DFunction):
+      pushOperator(program,operators,D_PRECEDENCE,obj)
+      expectValue = True
+      tight = True
+    elif isinstance(obj,MFunction):
+      pushOperator(program,operators,M_PRECEDENCE,obj)
+      expectValue = True
+    elif isinstance(obj,AFunction):
+      pushOperator(program,operators,A_PRECEDENCE,obj)
+      expectValue = True
+    else:
+      return parError
+  if exponent:
+    return parError
+  if '' != numeral:
+    if not expectValue:
+      pushOperator(program,operators,PRODUCT_PRECEDENCE,productObject)
+    program.append((PUSH,Literal(numeral)))
+    expectValue = False
+  if expectValue:
+    return parError
+  while 0 != len(operators):
+    appendOperator(program,operators.pop()[1])
+  return planExact(program)
+
+##
+# Push as mpmath numbers the literals of a program that execute() would
+# only convert from exact values at once, because the operator that takes
+# them or the other argument of it is not exact, as in sin;#3;#0; or
+# #2;*;pi;.
+# @param program A program from parse()
+# @return The program
+##
+def planExact(program):
+  stack = [] # index of the instruction and whether the value may be exact
+  for index, (code, obj) in enumerate(program):
+    if PUSH == code:
+      stack.append((index,None != obj.exact))
+      continue
+    elif ANSWER == code or MEMORY == code:
+      stack.append((None,True))
+      continue
+    arguments = (stack[-1],) if BINARY != code else (stack.pop(),stack[-1])
+    exact = TRIG != code and type(obj).xfn is not PObject.xfn
+    for argument in arguments:
+      exact = exact and argument[1]
+    if not exact:
+      for argument in arguments:
+        if None != argument[0] and None != program[argument[0]][1].exact:
+          literal = copy.copy(program[argument[0]][1])
+          literal.exact = None
+          program[argument[0]] = (PUSH,literal)
+    stack[-1] = (None,exact)
+  return program
+
+##
+# Append the instruction for an operator to a program.
+# @param program The program.
+# @param obj An RFunction, DFunction, MFunction, AFunction or Product.
+##
+def appendOperator(program,obj):
+  if isinstance(obj,TrigFunction):
+    program.append((TRIG,obj))
+  elif isinstance(obj,RFunction):
+    program.append((UNARY,obj))
+  else:
+    program.append((BINARY,obj))
+
+##
+# Push a left-associative binary operator, first moving any operators of
+# the same or higher precedence in the current group to the program.
+# @param program The program.
+# @param operators The operator stack.
+# @param precedence The precedence of obj.
+# @param obj The operator.
+##
+def pushOperator(program,operators,precedence,obj):
+  while 0 != len(operators):
+    p = operators[-1][0]
+    if None == p or p < precedence:
+      break
+    appendOperator(program,operators.pop()[1])
+  operators.append((precedence,obj))
+
+##
+# The Metrics that evaluations report to, or None for none. With None, as
+# by default, evaluation only tests this once per stage.
+metrics = None
+
+class TimedOperator:
+  "Stand-in for an operator in a program that reports the time of each call to a Metrics"
+  __slots__ = ('obj','metrics')
+  def __init__(self,obj,metrics):
+    "Initialise TimedOperator for a PObject"
+    self.obj = obj
+    self.metrics = metrics
+  def xfn(self,*args):
+    "Call xfn() of the operator; a call that gives None is counted with the vfn() that follows"
+    start = time.perf_counter()
+    d = self.obj.xfn(*args)
+    self.metrics.operator(self.obj.name,start,None != d)
+    return d
+  def vfn(self,*args):
+    "Call vfn() of the operator"
+    start = time.perf_counter()
+    d = self.obj.vfn(*args)
+    self.metrics.operator(self.obj.name,start)
+    return d
+
+class Metrics:
+  "Times of the stages of evaluation, calls and times of each operator and counts of tokens"
+  def __init__(self,spans=False):
+    """Initialise Metrics with nothing recorded, optionally keeping the start
+    and end of every stage as well as the totals"""
+    self.lock = threading.Lock()
+    self.operators = {} # operator name to stand-in
+    self.recordSpans = spans
+    self.reset()
+  def reset(self):
+    "Forget everything recorded"
+    with self.lock:
+      self.stages = {}   # name to [count, seconds]
+      self.calls = {}    # operator name to [calls, seconds]
+      self.pending = {}  # operator name to seconds of xfn() calls that gave None
+      self.evaluations = 0
+      self.tokens = 0
+      self.maxTokens = 0
+      self.lastTokens = 0
+      self.spans = []    # name, start and end of each stage
+  def stage(self,name,start):
+    "Record a stage of evaluation begun at time.perf_counter() start; return the time now"
+    now = time.perf_counter()
+    with self.lock:
+      if self.recordSpans:
+        self.spans.append((name,start,now))
+      entry = self.stages.get(name)
+      if None == entry:
+        self.stages[name] = [1,now-start]
+      else:
+        entry[0] += 1
+        entry[1] += now-start
+    return now
+  def operator(self,name,start,finished=True):
+    "Record a call of an operator begun at time.perf_counter() start"
+    seconds = time.perf_counter()-start
+    with self.lock:
+      if not finished:
+        self.pending[name] = self.pending.get(name,0.0)+seconds
+        return
+      seconds += self.pending.pop(name,0.0)
+      entry = self.calls.get(name)
+      if None == entry:
+        self.calls[name] = [1,seconds]
+      else:
+        entry[0] += 1
+        entry[1] += seconds
+  def evaluation(self,tokens):
+    "Record an evaluation of a list of tokens of a given length"
+    with self.lock:
+      self.evaluations += 1
+      self.tokens += tokens
+      self.maxTokens = max(self.maxTokens,tokens)
+      self.lastTokens = tokens
+  def timed(self,obj):
+    "The stand-in of an operator that reports to this Metrics"
+    stand = self.operators.get(id(obj))
+    if None == stand or stand.obj is not obj:
+      stand = TimedOperator(obj,self)
+      self.operators[id(obj)] = stand
+    return stand
+  def instrument(self,program):
+    "A program from parse() whose operators report to this Metrics"
+    timed = []
+    for code, obj in program:
+      if UNARY == code or TRIG == code or BINARY == code:
+        obj = self.timed(obj)
+      timed.append((code,obj))
+    return timed
+  def snapshot(self):
+    """Everything recorded as a dictionary of plain values: stages and
+    operators map names to dictionaries of count and seconds, tokens
+    gives the number of evaluations and their total, largest and latest
+    numbers of tokens and, if kept, spans lists the name, start and end of
+    each stage in time.perf_counter() seconds"""
+    with self.lock:
+      snapshot = {'stages': {name: {'count': c, 'seconds': t} for name, (c, t) in self.stages.items()},
+                  'operators': {name: {'count': c, 'seconds': t} for name, (c, t) in self.calls.items()},
+                  'tokens': {'evaluations': self.evaluations, 'total': self.tokens,
+                             'max': self.maxTokens, 'last': self.lastTokens}}
+      if self.recordSpans:
+        snapshot['spans'] = [list(span) for span in self.spans]
+      return snapshot
+
+##
+# Start recording metrics of every evaluation in this process
+# @param recorder A Metrics or None for a new one
+# @return The Metrics
+##
+def enableMetrics(recorder=None):
+  global metrics
+  if None == recorder:
+    recorder = Metrics()
+  metrics = recorder
+  return recorder
+
+##
+# Stop recording metrics
+# @return The Metrics that was recording or None
+##
+def disableMetrics():
+  global metrics
+  recorder = metrics
+  metrics = None
+  return recorder
+
+##
+# Run a program from parse().
+# @param program The program.
+# @param scale Whether to use radians or degrees
+# @param answer Value for ANS or None to use the value in the Ans
+# @param memory Value for RCL or None to use the value in the Rcl
+# @param precision Decimal digits of the arithmetic, an mpmath.MPContext or
+# a Context; see context()
+# @param exact Whether to keep whole numbers and fractions exact, as ints
+# and Fractions, until an operator needs mpmath (or the value grows past
+# EXACT_BITS); the result is then rounded once to the precision
+# @return A Container or a PError.
+##
+def execute(program,scale,answer=None,memory=None,precision=DECIMAL_PRECISION,exact=True):
+  current = context(precision)
+  if None != metrics:
+    program = metrics.instrument(program)
+  # values, not Containers, and no larger than the program
+  stack = [None]*len(program)
+  top = -1
+  for code, obj in program:
+    if PUSH == code:
+      # the program may be shared with other threads and precisions
+      x = obj.exact if exact else None
+      top += 1
+      stack[top] = current.value(obj) if x is None else x
+      continue
+    elif ANSWER == code or MEMORY == code:
+      if ANSWER == code:
+        value = obj.value if answer is None else answer
+      else:
+        value = obj.value if memory is None else memory
+      x = exactValue(value) if exact else None
+      top += 1
+      stack[top] = value if value is None else current.convert(value) if x is None else x
+      continue
+    elif UNARY == code:
+      x = stack[top]
+      if type(x) in EXACT_TYPES:
+        d = obj.xfn(x)
+        if d is None:
+          d = obj.vfn(current.rational(x),current)
+      else:
+        d = obj.vfn(x,current)
+    elif TRIG == code:
+      x = stack[top]
+      if type(x) in EXACT_TYPES:
+        x = current.rational(x)
+      d = obj.vfn(x,scale,current)
+    else:
+      r = stack[top]
+      top -= 1
+      l = stack[top]
+      if type(l) in EXACT_TYPES:
+        if type(r) in EXACT_TYPES:
+          d = obj.xfn(l,r)
+          if d is None:
+            d = obj.vfn(current.rational(l),current.rational(r),current)
+        else:
+          d = obj.vfn(current.rational(l),r,current)
+      elif type(r) in EXACT_TYPES:
+        d = obj.vfn(l,current.rational(r),current)
+      else:
+        d = obj.vfn(l,r,current)
+    if isinstance(d,PError):
+      return d
+    stack[top] = d
+  d = stack[0]
+  if type(d) in EXACT_TYPES:
+    d = current.rational(d)
+  return Container(d)
+
+##
+# The object that evaluations are reported to so that slow ones can be
+# kept, such as a flight.FlightRecorder, or None for none. Its
+# observe(call,describe) runs call() and returns its result; describe()
+# gives the case as a dictionary if it wants one.
+flightRecorder = None
+
+##
+# Convert a list of PObjects back to a string in the format of the
+# calculator title. ANS and RCL lose their values.
+# @param list A list from convertStringToPObjectList()
+# @return The string
+##
+def tokenString(list):
+  tokens = []
+  for obj in list:
+    if isinstance(obj,Ans):
+      tokens.append('ANS')
+    elif isinstance(obj,Rcl):
+      tokens.append('RCL')
+    elif isinstance(obj,TokenError):
+      tokens.append(obj.token)
+    elif isinstance(obj,Literal):
+      # a number from the compact format
+      tokens += ['#'+c for c in obj.text]
+    else:
+      tokens.append(TOKEN_STRINGS[obj])
+  return ''.join(token+';' for token in tokens)
+
+##
+# Describe an evaluation for flightRecorder
+# @param tokens The string in the format of the calculator title
+# @param scale Whether to use radians or degrees
+# @param answer The value of ANS or None
+# @param memory The value of RCL or None
+# @param precision Decimal digits of the arithmetic or a context; see
+# context()
+# @return A dictionary of plain values
+##
+def describeEvaluation(tokens,scale,answer,memory,precision):
+  return {'tokens': tokens, 'radians': RADIAN_SCALE == scale,
+          'answer': None if answer is None else str(answer),
+          'memory': None if memory is None else str(memory),
+          'precision': context(precision).dps}
+
+##
+# This is the main evaluation function. The list is converted in a single
+# pass to a program by parse() and the program is run by execute(), so
+# the time taken is linear in the number of tokens.
+#
+# @param scale Whether to use radians or degrees
+# @param precision Decimal digits of the arithmetic or an mpmath.MPContext;
+# see context()
+# @return A double or an error if the expression was nonsensical.
+##
+def evaluate(list,scale,precision=DECIMAL_PRECISION):
+  flight = flightRecorder
+  if None == flight:
+    return evaluateList(list,scale,precision)
+  def describe():
+    answer = memory = None
+    for obj in list:
+      if isinstance(obj,Ans):
+        answer = obj.value
+      elif isinstance(obj,Rcl):
+        memory = obj.value
+    return describeEvaluation(tokenString(list),scale,answer,memory,precision)
+  return flight.observe(lambda: evaluateList(list,scale,precision),describe)
+
+##
+# evaluate() without the flight recorder
+##
+def evaluateList(list,scale,precision=DECIMAL_PRECISION):
+  recorder = metrics
+  try:
+    if None != recorder:
+      recorder.evaluation(len(list))
+      start = time.perf_counter()
+    program = parse(list)
+    if None != recorder:
+      start = recorder.stage('parse',start)
+    if isinstance(program,PError):
+      return 'Error','Error'
+    d = execute(program,scale,None,None,precision)
+    if None != recorder:
+      start = recorder.stage('execute',start)
+    if isinstance(d,PError):
+      return failure(d)
+    output = formatOutput.format(d.value,DIGITS)
+    if None != recorder:
+      recorder.stage('format',start)
+    return d.value,output
+  except:
+    return 'Error','Error'
+
+##
+# Convert an angle to radians for a float ffn().
+# @return The angle and a bound on its absolute error
+##
+def floatRadians(x,ex,scale):
+  if 1 == scale:
+    return x, ex
+  t = math.radians(x)
+  return t, math.radians(ex)+2*abs(t)*FLOAT_EPSILON
+
+##
+# Convert an angle from radians for a float ffn().
+# @return The angle and a bound on its absolute error
+##
+def floatDegrees(v,e,scale):
+  if 1 == scale:
+    return v, e
+  d = math.degrees(v)
+  return d, math.degrees(e)+2*abs(d)*FLOAT_EPSILON
+
+##
+# Convert a value to a float for executeFloat().
+# @return The float and a bound on its absolute error
+##
+def floatValue(x):
+  v = float(x)
+  if abs(v) < FLOAT_MINIMUM:
+    if 0 != x:
+      raise FloatingPointError('underflow')
+    return 0.0, 0.0
+  if math.isinf(v):
+    raise OverflowError('overflow')
+  # an mpf keeps its mantissa odd, in bc bits, so it is a double exactly if
+  # they fit in 53; ints and Fractions compare with floats exactly
+  if x._mpf_[3] <= 53 if hasattr(x,'_mpf_') else v == x:
+    return v, 0.0
+  return v, abs(v)*FLOAT_EPSILON
+
+##
+# Run a program from parse() in float arithmetic, keeping a bound on the
+# absolute error of every value. Each operator's ffn() returns None when
+# the float result cannot be trusted (a domain check too close to call,
+# a non-integer that might be an integer and so on).
+# @return A pair of float and error bound, a PError or None.
+##
+def executeFloat(program,scale,answer=None,memory=None):
+  values = []
+  for code, obj in program:
+    if FLOAT == code:
+      values.append(obj)
+      continue
+    elif PUSH == code:
+      values.append(floatValue(obj.value))
+      continue
+    elif ANSWER == code:
+      values.append(floatValue(obj.value if answer is None else answer))
+      continue
+    elif MEMORY == code:
+      values.append(floatValue(obj.value if memory is None else memory))
+      continue
+    elif UNARY == code:
+      x, ex = values[-1]
+      d = obj.ffn(x,ex)
+    elif TRIG == code:
+      x, ex = values[-1]
+      d = obj.ffn(x,ex,scale)
+    else:
+      r, er = values.pop()
+      x, ex = values[-1]
+      d = obj.ffn(x,ex,r,er)
+    if d is None or isinstance(d,PError):
+      return d
+    if abs(d[0]) < FLOAT_MINIMUM:
+      # a zero from nonzero arguments is underflow unless it comes
+      # from cancellation or a logarithm of 1
+      if 0 != d[0] or (0 != x and not isinstance(obj,AFunction)
+                       and not isinstance(obj,Log) and not isinstance(obj,Ln)):
+        return None
+    values[-1] = d
+  return values[0]
+
+##
+# Convert the numbers pushed by a program to floats once so that
+# executeFloat() can run it repeatedly without converting them again.
+# @return A program for executeFloat() or None if a number is out of the
+# range of floats
+##
+def floatProgram(program):
+  result = []
+  for code, obj in program:
+    if PUSH == code:
+      try:
+        result.append((FLOAT,floatValue(obj.value)))
+      except ArithmeticError:
+        return None
+    else:
+      result.append((code,obj))
+  return tuple(result)
+
+##
+# Round a result of executeFloat() to the digits that can be trusted.
+# @param tiny The smallest result trusted; see Context.floatTiny
+# @return A literal with between FLOAT_MIN_DIGITS and FLOAT_DIGITS
+# significant digits such as '1.23450000000000e-5', '0' or None if not
+# enough digits can be guaranteed.
+##
+def roundFloat(v,e,tiny=FLOAT_TINY):
+  if not math.isfinite(v) or not math.isfinite(e):
+    return None
+  if 0 == v and 0 == e:
+    return '0'
+  if abs(v) < tiny or abs(v) >= 10.0**FLOAT_DIGITS:
+    return None
+  if 0 == e:
+    return '%.*e' % (FLOAT_DIGITS-1,v)
+  for digits in range(FLOAT_DIGITS,FLOAT_MIN_DIGITS-1,-1):
+    low = '%.*e' % (digits-1,v-2*e)
+    if low == '%.*e' % (digits-1,v+2*e):
+      return low
+  return None
+
+##
+# Evaluate a program with floats, falling back to execute() when the
+# float result cannot be trusted to FLOAT_MIN_DIGITS significant digits.
+# @param floats The program from floatProgram(), or None to use only
+# execute()
+# @param precision Decimal digits of execute() or a context; see context()
+# @return A double, its formatted string and 'float' or 'mpmath' for the
+# arithmetic that produced it
+##
+def executeFast(program,scale,answer=None,memory=None,floats=None,precision=DECIMAL_PRECISION):
+  d = None
+  if None != floats:
+    try:
+      d = executeFloat(floats,scale,answer,memory)
+    except (ArithmeticError,ValueError,TypeError):
+      pass
+  if isinstance(d,PError):
+    return 'Error','Error','float'
+  if None != d:
+    literal = roundFloat(d[0],d[1],context(precision).floatTiny)
+    if '0' == literal:
+      return 0.0,'0.0','float'
+    if None != literal:
+      output = formatOutput.format_decimal(literal,DIGITS)
+      if None != output:
+        return float(literal),output,'float'
+  try:
+    d = execute(program,scale,answer,memory,precision)
+    if isinstance(d,PError):
+      return failure(d)+('mpmath',)
+    return d.value,formatOutput.format(d.value,DIGITS),'mpmath'
+  except:
+    return 'Error','Error','mpmath'
+
+##
+# Like evaluate() but tries float arithmetic first. Results from floats
+# have at most FLOAT_DIGITS significant digits, all of them correct.
+# @param scale Whether to use radians or degrees
+# @return A double, its formatted string and 'float' or 'mpmath' for the
+# arithmetic that produced it
+##
+def evaluateFast(list,scale):
+  try:
+    program = parse(list)
+  except:
+    return 'Error','Error','float'
+  if isinstance(program,PError):
+    return 'Error','Error','float'
+  return executeFast(program,scale,None,None,floatProgram(program))
+
+class Expression:
+  "Compiled expression: parsed once, evaluated with any ANS, RCL and scale"
+  __slots__ = ('tokens','store','program','floats')
+  def __init__(self,objectString):
+    "Initialise Expression"
+    recorder = metrics
+    if None != recorder:
+      start = time.perf_counter()
+    plist = convertStringToPObjectList(objectString,None,None)
+    if None != recorder:
+      start = recorder.stage('tokenize',start)
+      recorder.evaluation(len(plist))
+    store = None
+    if 0 != len(plist) and (isinstance(plist[0],Sto) or isinstance(plist[0],Mplus)
+                            or isinstance(plist[0],Mminus) or isinstance(plist[0],Mcl)):
+      store = plist[0]
+      plist = plist[1:]
+    try:
+      program = parse(plist)
+      if not isinstance(program,PError):
+        program = tuple(program)
+    except:
+      program = parError
+    if None != recorder:
+      recorder.stage('parse',start)
+    object.__setattr__(self,'tokens',objectString)
+    object.__setattr__(self,'store',store)
+    object.__setattr__(self,'program',program)
+    object.__setattr__(self,'floats',None if isinstance(program,PError) else floatProgram(program))
+  def __setattr__(self,name,value):
+    raise AttributeError('Expression is immutable')
+  def __repr__(self):
+    return 'Expression('+repr(self.tokens)+')'
+  def value(self,answer,memory,scale,precision=DECIMAL_PRECISION):
+    "Evaluate to a double or 'Error' without formatting, at a precision as for context()"
+    d = self.outcome(answer,memory,scale,precision)
+    return 'Error' if isinstance(d,PError) else d
+  def outcome(self,answer,memory,scale,precision=DECIMAL_PRECISION):
+    "Evaluate like value() but give the PError that stopped the evaluation rather than 'Error'"
+    if isinstance(self.program,PError):
+      return self.program
+    recorder = metrics
+    if None != recorder:
+      start = time.perf_counter()
+    try:
+      d = execute(self.program,scale,answer,memory,precision)
+      return d if isinstance(d,PError) else d.value
+    except:
+      return evaluationError
+    finally:
+      if None != recorder:
+        recorder.stage('execute',start)
+  def fast(self,answer,memory,scale,precision=DECIMAL_PRECISION):
+    "Evaluate like evaluateFast(), falling back to mpmath at a precision as for context()"
+    if isinstance(self.program,PError):
+      return 'Error','Error','float'
+    return executeFast(self.program,scale,answer,memory,self.floats,precision)
+  def __call__(self,answer,memory,scale,precision=DECIMAL_PRECISION):
+    "Evaluate to a double and its formatted string like evaluate()"
+    flight = flightRecorder
+    if None == flight:
+      return self.result(answer,memory,scale,precision)
+    return flight.observe(lambda: self.result(answer,memory,scale,precision),
+                          lambda: describeEvaluation(self.tokens,scale,answer,memory,precision))
+  def result(self,answer,memory,scale,precision=DECIMAL_PRECISION):
+    "Evaluate like __call__() without the flight recorder"
+    value = self.outcome(answer,memory,scale,precision)
+    if isinstance(value,PError):
+      return failure(value)
+    recorder = metrics
+    if None != recorder:
+      start = time.perf_counter()
+    try:
+      return value,formatOutput.format(value,DIGITS)
+    except:
+      return 'Error','Error'
+    finally:
+      if None != recorder:
+        recorder.stage('format',start)
+  def adaptive(self,answer,memory,scale,ladder=PRECISION_LADDER):
+    """Evaluate like __call__() at each precision of ladder in turn until two
+    agree on the output. Return the value, the output and the precision."""
+    top = len(ladder) - 1
+    previous = None
+    index = 0
+    while True:
+      precision = ladder[index]
+      value, output = self(answer,memory,scale,precision)
+      if output == previous or index == top:
+        return value, output, precision
+      if hasattr(value,'_mpf_') and not value and index < top - 1:
+        # a zero is what total cancellation leaves at every low precision
+        index = top
+        continue
+      previous = output
+      index += 1
+
+##
+# Compile a string from the calculator title. A leading STO, M+, M- or MCL
+# is kept in the store attribute of the result rather than in the program.
+# @param objectString The string
+# @return An Expression
+##
+def compile(objectString):
+  return Expression(objectString)
@@ -0,0 +1,359 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Evaluate expressions in a worker process so that the window stays
+# responsive. mpmath cannot be interrupted inside a thread, so a
+# computation that is cancelled, superseded by a newer request or over its
+# time budget is stopped by ending the process; a new one is started for
+# the next request.
+#
+#   evaluator = background.Evaluator(wx.CallAfter,timeout=60)
+#   number = evaluator.submit('#9;!;!;',scale,answer,memory,done)
+#
+# done(number,value,output) is called through deliver, which the frontend
+# gives so that it runs on the thread of the window. An Evaluator given a
+# report function records PObject.Metrics in the worker and passes report
+# the snapshot of each request that the worker computed, just before its
+# result, and one given a tracing.Tracer records the round trip of each
+# request and the stages of its evaluation in the worker. The worker keeps
+# the latest expression in a incrementalExpression.IncrementalExpression, with metrics on
+# or off, so these show only the work that the change from the last
+# expression needed, as parse, execute and format. An Evaluator given a directory to record
+# in keeps slow evaluations of the worker there with flight.install().
+#
+# A Speculator works out the expression being typed with an Evaluator of
+# its own once typing pauses, so that = can show the result at once:
+#
+#   speculator = background.Speculator(background.Evaluator(wx.CallAfter,60),wx.CallLater,session.snapshot)
+#   speculator.typed(objectString)
+#   if not speculator.claim(objectString,session.snapshot(),done): ...
+
+import time
+import threading
+import multiprocessing
+import PObject
+import incrementalExpression
+import resultCache
+
+## Output when a computation runs out of time
+TIMEOUT = 'Timeout'
+## Output when a computation is cancelled
+CANCELLED = 'Cancelled'
+## Output to show while a computation runs
+COMPUTING = 'computing&hellip;'
+## Milliseconds without a key press before a Speculator starts work
+SPECULATION_DELAY = 150
+
+##
+# A value to send through a pipe. An mpf is sent as its raw tuple, since
+# unpickling an mpf rounds it to the precision of the global context.
+##
+def pack(value):
+  if hasattr(value,'_mpf_'):
+    return value._mpf_
+  return value
+
+##
+# A value received through a pipe as a number of the default context
+##
+def unpack(value):
+  if isinstance(value,tuple):
+    return PObject.context().mp.make_mpf(value)
+  return value
+
+##
+# Evaluate requests from a connection until it closes. This runs in the
+# worker process.
+# @param connection The end of a pipe
+# @param precision Decimal digits of the arithmetic
+# @param instrument Whether to send a snapshot of PObject.Metrics for each
+# request with its result
+# @param spans Whether the snapshot lists the start and end of each stage
+# @param record A directory in which to keep slow evaluations or None
+##
+def serve(connection,precision,instrument=False,spans=False,record=None):
+  recorder = PObject.enableMetrics(PObject.Metrics(spans)) if instrument else None
+  if None != record:
+    import flight
+    flight.install(record)
+  # each string usually extends or shortens the last one
+  incremental = incrementalExpression.IncrementalExpression()
+  while True:
+    try:
+      number, objectString, scale, answer, memory = connection.recv()
+    except (EOFError,OSError):
+      return
+    if None != recorder:
+      recorder.reset()
+    incremental.update(objectString)
+    value, output = incremental(unpack(answer),unpack(memory),unpack(scale),precision)
+    if None != recorder:
+      connection.send((number,pack(value),output,recorder.snapshot()))
+    else:
+      connection.send((number,pack(value),output))
+
+## Operators listed in the debug overlay, slowest first
+OVERLAY_OPERATORS = 6
+
+##
+# HTML for the debug overlay of a frontend from a snapshot of
+# PObject.Metrics: the number of tokens, the time of each stage and the
+# calls and time of the slowest operators
+##
+def overlay(snapshot):
+  lines = ['%d tokens' % snapshot['tokens']['last']]
+  for name in ('tokenize','parse','execute','format'):
+    stage = snapshot['stages'].get(name)
+    if None != stage:
+      lines.append('%s %.3f&nbsp;ms' % (name,1e3*stage['seconds']))
+  operators = sorted(snapshot['operators'].items(),key=lambda item: -item[1]['seconds'])
+  for name, operator in operators[:OVERLAY_OPERATORS]:
+    lines.append('%s &times;%d %.3f&nbsp;ms' % (name,operator['count'],1e3*operator['seconds']))
+  return '<br>'.join(lines)
+
+class Evaluator:
+  "Evaluate strings from the calculator title in a worker process"
+  def __init__(self,deliver,timeout=None,cache=None,report=None,tracer=None,record=None):
+    """Initialise Evaluator with a function that calls its arguments on the
+    thread of the window, a time budget in seconds (None for no limit), an
+    optional resultCache.ResultCache, an optional function to call through
+    deliver with the metrics snapshot of each computed result, an optional
+    tracing.Tracer and an optional directory in which to keep slow
+    evaluations"""
+    self.deliver = deliver
+    self.timeout = timeout
+    self.cache = cache
+    self.report = report
+    self.tracer = tracer
+    self.record = record
+    self.lock = threading.Lock()
+    self.number = 0
+    self.finished = 0
+    self.process = None
+    self.connection = None
+    self.busy = False
+  def start(self):
+    "Start a worker process; the lock must be held"
+    connection, child = multiprocessing.Pipe()
+    instrument = None != self.report or None != self.tracer
+    self.process = multiprocessing.Process(target=serve,daemon=True,
+                                           args=(child,PObject.DECIMAL_PRECISION,instrument,None != self.tracer,
+                                                 self.record))
+    self.process.start()
+    # only the worker holds its end, so ending it closes the pipe
+    child.close()
+    self.connection = connection
+  def kill(self):
+    "End the worker process; the lock must be held"
+    if None != self.process:
+      self.process.terminate()
+      self.process = None
+      self.connection = None
+    self.busy = False
+  def submit(self,objectString,scale,answer,memory,done):
+    """Evaluate a string in the background, superseding any earlier request.
+    Return the number of the request."""
+    with self.lock:
+      self.number += 1
+      number = self.number
+    if None != self.tracer:
+      self.tracer.begin('request',number,title=objectString)
+      done = self.traced(number,done)
+    key = None
+    if None != self.cache:
+      key = self.cache.key(objectString,scale,answer,memory)
+      result = self.cache.lookup(key)
+      if None != result:
+        with self.lock:
+          self.finished = max(self.finished,number)
+        self.deliver(done,number,result[0],result[1])
+        return number
+    request = (number,objectString,pack(scale),pack(answer),pack(memory))
+    threading.Thread(target=self.run,args=(request,key,done),daemon=True).start()
+    return number
+  def traced(self,number,done):
+    "done, recording the end of the request in the tracer after it"
+    def finish(number,value,output):
+      try:
+        done(number,value,output)
+      finally:
+        self.tracer.end('request',number,output=output)
+    return finish
+  def superseded(self,number):
+    "Record in the tracer that a request ended without a result"
+    if None != self.tracer:
+      self.tracer.end('request',number,output=CANCELLED)
+  def run(self,request,key,done):
+    "Send a request to the worker and deliver its result if it is still wanted"
+    number = request[0]
+    with self.lock:
+      if number != self.number:
+        self.superseded(number)
+        return
+      if self.busy:
+        # the worker is still on a stale request
+        self.kill()
+      if None == self.process or not self.process.is_alive():
+        self.start()
+      connection = self.connection
+      pid = self.process.pid
+      self.busy = True
+      sent = time.perf_counter()
+      connection.send(request)
+    ended = False
+    try:
+      ready = connection.poll(self.timeout)
+      result = connection.recv() if ready else None
+    except (EOFError,OSError):
+      # the worker was ended for a newer request or a cancel, or failed
+      ready = False
+      ended = True
+    if None != self.tracer:
+      self.tracer.complete('worker',sent,time.perf_counter(),'request')
+      if ready and len(result) > 3:
+        self.tracer.worker(pid,result[3].get('spans',()))
+    with self.lock:
+      if ready and connection is self.connection:
+        self.busy = False
+      else:
+        if connection is self.connection:
+          self.kill()
+        connection.close()
+      if number != self.number:
+        self.superseded(number)
+        return
+      self.finished = number
+    if ended:
+      self.deliver(done,number,None,'Error')
+    elif not ready:
+      self.deliver(done,number,None,TIMEOUT)
+    else:
+      value = unpack(result[1])
+      if None != self.cache:
+        self.cache.store(key,value,result[2])
+      # the frontend shows the metrics with the result
+      if None != self.report and len(result) > 3:
+        self.deliver(self.report,result[3])
+      self.deliver(done,number,value,result[2])
+  def pending(self,number):
+    "Whether a request is the latest and has no result yet"
+    with self.lock:
+      return number == self.number and number != self.finished
+  def cancel(self):
+    "Stop the current request; its result is never delivered"
+    with self.lock:
+      self.number += 1
+      self.finished = self.number
+      if self.busy:
+        self.kill()
+  def close(self):
+    "Stop any request and the worker process"
+    with self.lock:
+      self.number += 1
+      self.finished = self.number
+      self.kill()
+
+class Speculator:
+  "Work out the expression being typed in the background, ready for ="
+  def __init__(self,evaluator,later,snapshot,preview=None,delay=SPECULATION_DELAY):
+    """Initialise Speculator with an Evaluator for it alone, a function that
+    calls a function after a number of milliseconds on the thread of the
+    window, a function that gives the scale, answer and memory now, an
+    optional function to call with the output of each expression worked out
+    and the pause in typing before work starts, in milliseconds. All calls
+    are on the thread of the window."""
+    self.evaluator = evaluator
+    self.later = later
+    self.snapshot = snapshot
+    self.preview = preview
+    self.delay = delay
+    self.parser = incrementalExpression.IncrementalExpression()
+    self.generation = 0
+    self.number = None  # the request to the evaluator
+    self.key = None     # the resultCache.resultKey() of the expression
+    self.result = None  # its value and output once known
+    self.waiting = None # the function that = gave to claim() it
+    self.hits = 0
+    self.misses = 0
+  def typed(self,objectString):
+    """The string that = would send is now objectString: forget the last
+    one and work this one out after a pause if it can have a value"""
+    self.parser.update(objectString)
+    if None != self.waiting:
+      # = is waiting for the expression being worked out
+      return
+    self.cancel()
+    if not self.parser.complete():
+      return
+    generation = self.generation
+    self.later(self.delay,lambda: self.start(generation,objectString))
+  def start(self,generation,objectString):
+    "Work out objectString unless something was typed since"
+    if generation != self.generation:
+      return
+    snapshot = self.snapshot()
+    self.key = resultCache.resultKey(objectString,*snapshot)
+    self.number = self.evaluator.submit(objectString,*snapshot,
+                                        lambda number,value,output: self.finish(generation,value,output))
+  def finish(self,generation,value,output):
+    "Keep a result, pass it to = if it is waiting and show it as a preview"
+    if generation != self.generation:
+      return
+    self.number = None
+    if None != self.waiting:
+      done = self.waiting
+      self.waiting = None
+      self.key = None
+      done(value,output)
+      return
+    if None == value:
+      # out of time; = tries again
+      self.key = None
+      return
+    self.result = (value,output)
+    if None != self.preview and output not in PObject.ERROR_OUTPUTS:
+      self.preview(output)
+  def claim(self,objectString,snapshot,done):
+    """= was pressed for objectString with the scale, answer and memory of
+    snapshot. If this is the expression worked out or being worked out,
+    pass its value and output to done(value,output), now or when known,
+    and return True; otherwise stop any work and return False."""
+    key = resultCache.resultKey(objectString,*snapshot)
+    if None != self.key and key == self.key:
+      self.hits += 1
+      if None != self.result:
+        result = self.result
+        self.cancel()
+        done(*result)
+      else:
+        self.waiting = done
+      return True
+    self.misses += 1
+    self.cancel()
+    return False
+  def pending(self):
+    "Whether = is waiting for a result"
+    return None != self.waiting
+  def cancel(self):
+    "Forget the expression and stop any work on it"
+    self.generation += 1
+    if None != self.number and self.evaluator.pending(self.number):
+      self.evaluator.cancel()
+    self.number = None
+    self.key = None
+    self.result = None
+    self.waiting = None
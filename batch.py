@@ -0,0 +1,320 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Evaluate expressions without a window. Each line of the input is one
+# expression, either in the format of the calculator title (#1;+;#2;) or
+# plain infix (1+2). Results are written as CSV or JSON lines.
+#
+#   ./batch.py expressions.txt > results.csv
+#   ./batch.py --chain --radians --format jsonl < expressions.txt
+#   ./batch.py --workers 8 --chunk-size 500 --report big.txt > results.csv
+
+import sys
+import os
+import csv
+import json
+import time
+import argparse
+import collections
+import multiprocessing
+import PObject
+import resultCache
+import wireFormat
+import flight
+
+##
+# Read expressions one line at a time
+# @param files Names of files; - is standard input
+# @return A generator of pairs of line number and expression
+##
+def readExpressions(files):
+  number = 0
+  for name in files:
+    if '-' == name:
+      stream = sys.stdin
+    else:
+      stream = open(name,'r')
+    try:
+      for line in stream:
+        number += 1
+        line = line.strip()
+        if '' != line:
+          yield number, line
+    finally:
+      if stream is not sys.stdin:
+        stream.close()
+
+##
+# Convert an expression to the format of the calculator title
+# @param expression The expression
+# @param syntax 'tokens', 'infix' or 'auto' to guess from whether there
+# is a ; or the expression is in the compact format
+##
+def toTokens(expression,syntax='auto'):
+  if 'tokens' == syntax or ('auto' == syntax and (';' in expression
+                                                  or expression.startswith(wireFormat.WIRE_PREFIX))):
+    return expression
+  return PObject.convertInfixToString(expression)
+
+##
+# Evaluate expressions as the calculator would. A leading STO, M+ or M-
+# changes the memory that RCL uses.
+# @param expressions Pairs of line number and expression
+# @param scale Whether to use radians or degrees
+# @param chain Whether ANS is the previous answer (otherwise it is 0)
+# @param syntax See toTokens()
+# @param fast Whether to try float arithmetic first as in
+# PObject.evaluateFast()
+# @param cache A resultCache.ResultCache for repeated expressions or None
+# @param precision Decimal digits of the arithmetic (not of the float path)
+# @param adaptive Whether to raise the precision until the result is
+# settled as in PObject.Expression.adaptive() (not with fast or cache)
+# @return A generator of tuples of line number, expression, value and
+# formatted result, followed by 'float' or 'mpmath' if fast is set or by the
+# precision used if adaptive is set
+##
+def evaluateExpressions(expressions,scale=PObject.DEGREE_SCALE,chain=False,syntax='auto',fast=False,
+                        cache=None,precision=PObject.DECIMAL_PRECISION,adaptive=False):
+  context = PObject.context(precision)
+  memory = context.zero
+  answer = context.zero
+  for number, expression in expressions:
+    tokens = toTokens(expression,syntax)
+    if None != cache and not fast:
+      value, output = cache.evaluate(tokens,scale,answer,memory,context)
+      store = wireFormat.storeToken(tokens)
+    else:
+      compiled = PObject.compile(tokens)
+      store = compiled.store
+      if fast:
+        value, output, path = compiled.fast(answer,memory,scale,precision)
+      elif adaptive:
+        value, output, path = compiled.adaptive(answer,memory,scale)
+      else:
+        value, output = compiled(answer,memory,scale,context)
+    if output not in PObject.ERROR_OUTPUTS:
+      if chain:
+        answer = value
+      if isinstance(store,PObject.Sto):
+        memory = value
+      elif isinstance(store,PObject.Mplus):
+        memory = context.convert(memory) + context.convert(value)
+      elif isinstance(store,PObject.Mminus):
+        memory = context.convert(memory) - context.convert(value)
+      value = str(value)
+      output = output.replace('&minus;','-')
+    if fast or adaptive:
+      yield number, expression, value, output, path
+    else:
+      yield number, expression, value, output
+
+##
+# Split expressions into lists
+# @param expressions An iterable
+# @param size The length of each list (the last may be shorter)
+##
+def chunked(expressions,size):
+  chunk = []
+  for expression in expressions:
+    chunk.append(expression)
+    if len(chunk) >= size:
+      yield chunk
+      chunk = []
+  if 0 != len(chunk):
+    yield chunk
+
+## The cache of a worker process
+workerCache = None
+## The precision of a worker process
+workerPrecision = PObject.DECIMAL_PRECISION
+## Whether a worker process uses adaptive precision
+workerAdaptive = False
+
+##
+# Set up a worker process
+# @param precision Decimal digits of the arithmetic
+# @param cacheSize Entries in the cache of the worker; 0 for none
+# @param adaptive See evaluateExpressions()
+##
+def initWorker(precision,cacheSize=0,adaptive=False):
+  global workerCache
+  global workerPrecision
+  global workerAdaptive
+  workerPrecision = precision
+  workerAdaptive = adaptive
+  if cacheSize > 0:
+    workerCache = resultCache.ResultCache(cacheSize)
+
+##
+# Evaluate a chunk of expressions in a worker process
+# @return The results and the time taken in seconds
+##
+def evaluateChunk(chunk,scale,syntax,fast):
+  start = time.perf_counter()
+  results = list(evaluateExpressions(chunk,scale,False,syntax,fast,workerCache,workerPrecision,
+                                     workerAdaptive))
+  return results, time.perf_counter() - start
+
+##
+# Evaluate expressions in a pool of processes. Results come back in the
+# order of the input. Only a few chunks per worker are in flight at once,
+# so memory stays bounded. ANS is always 0 and a STO, M+ or M- only
+# affects RCL later in the same chunk.
+# @param expressions Pairs of line number and expression
+# @param scale Whether to use radians or degrees
+# @param syntax See toTokens()
+# @param fast See evaluateExpressions()
+# @param workers Number of processes
+# @param chunkSize Number of expressions sent to a process at once
+# @param report Function called with chunk index, number of expressions
+# and seconds taken as each chunk finishes
+# @param cacheSize Entries in the result cache of each process; 0 for none
+# @param precision Decimal digits of the arithmetic
+# @param adaptive See evaluateExpressions()
+# @return A generator like evaluateExpressions()
+##
+def evaluateParallel(expressions,scale=PObject.DEGREE_SCALE,syntax='auto',fast=False,
+                     workers=None,chunkSize=1000,report=None,cacheSize=0,
+                     precision=PObject.DECIMAL_PRECISION,adaptive=False):
+  if None == workers:
+    workers = os.cpu_count()
+  with multiprocessing.Pool(workers,initWorker,(precision,cacheSize,adaptive)) as pool:
+    pending = collections.deque()
+    index = 0
+    for chunk in chunked(expressions,chunkSize):
+      pending.append(pool.apply_async(evaluateChunk,(chunk,scale,syntax,fast)))
+      if len(pending) >= 2*workers:
+        results, seconds = pending.popleft().get()
+        if None != report:
+          report(index,len(results),seconds)
+        index += 1
+        yield from results
+    while 0 != len(pending):
+      results, seconds = pending.popleft().get()
+      if None != report:
+        report(index,len(results),seconds)
+      index += 1
+      yield from results
+
+##
+# Write the throughput of a chunk to standard error
+##
+def reportChunk(index,count,seconds):
+  rate = count/seconds if seconds > 0 else float('inf')
+  sys.stderr.write('chunk %d: %d expressions in %.3f s (%.0f/s)\n' % (index,count,seconds,rate))
+
+FIELDS = ('line','expression','value','result')
+FAST_FIELDS = FIELDS + ('path',)
+ADAPTIVE_FIELDS = FIELDS + ('precision',)
+
+##
+# Write results as CSV
+##
+def writeCSV(results,stream,fields=FIELDS):
+  writer = csv.writer(stream)
+  writer.writerow(fields)
+  for result in results:
+    writer.writerow(result)
+
+##
+# Write results as JSON, one object per line
+##
+def writeJSONL(results,stream,fields=FIELDS):
+  for result in results:
+    stream.write(json.dumps(dict(zip(fields,result)))+'\n')
+
+WRITERS = {'csv': writeCSV, 'jsonl': writeJSONL}
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Evaluate calculator expressions, one per line.')
+  parser.add_argument('files',nargs='*',default=['-'],help='input files (default: standard input)')
+  parser.add_argument('-o','--output',help='output file (default: standard output)')
+  parser.add_argument('-f','--format',choices=sorted(WRITERS),default='csv')
+  parser.add_argument('-s','--syntax',choices=('auto','tokens','infix'),default='auto',
+                      help='input syntax (default: tokens if the line has a ; or starts with ~)')
+  parser.add_argument('-r','--radians',action='store_true',help='angles in radians (default: degrees)')
+  parser.add_argument('-a','--chain',action='store_true',help='ANS is the previous answer')
+  parser.add_argument('--fast',action='store_true',
+                      help='try float arithmetic first and add a path column saying which arithmetic was used')
+  parser.add_argument('-w','--workers',type=int,default=1,
+                      help='number of processes; 0 for one per core (default: 1)')
+  parser.add_argument('-c','--chunk-size',type=int,default=1000,
+                      help='expressions per chunk sent to a process (default: 1000)')
+  parser.add_argument('--cache',type=int,default=0,metavar='SIZE',
+                      help='remember the results of up to SIZE distinct expressions (default: 0, none)')
+  parser.add_argument('-p','--precision',type=int,metavar='DIGITS',
+                      help='decimal digits of the arithmetic (default: %d)' % PObject.DECIMAL_PRECISION)
+  parser.add_argument('--adaptive',action='store_true',
+                      help='raise the precision from %d digits until the result is settled and add a precision column'
+                      % PObject.PRECISION_LADDER[0])
+  parser.add_argument('--report',action='store_true',help='write throughput of each chunk to standard error')
+  parser.add_argument('--record',metavar='DIRECTORY',
+                      help='keep expressions slower than --record-threshold in DIRECTORY with a profile of each; '
+                      'see ./flight.py --help')
+  parser.add_argument('--record-threshold',type=float,default=flight.THRESHOLD,metavar='SECONDS',
+                      help='seconds an expression may take before --record keeps it (default: %g)' % flight.THRESHOLD)
+  args = parser.parse_args(argv)
+  if args.radians:
+    scale = PObject.RADIAN_SCALE
+  else:
+    scale = PObject.DEGREE_SCALE
+  if args.cache < 0:
+    parser.error('--cache must not be negative')
+  if args.cache > 0 and args.fast:
+    parser.error('--cache cannot be used with --fast')
+  if args.adaptive and (args.fast or args.cache > 0 or None != args.precision):
+    parser.error('--adaptive cannot be used with --fast, --cache or --precision')
+  if None == args.precision:
+    args.precision = PObject.DECIMAL_PRECISION
+  elif args.precision < 1:
+    parser.error('--precision must be at least 1')
+  if None != args.record:
+    if 1 != args.workers:
+      parser.error('--record keeps the cases of one process and cannot be used with --workers')
+    flight.install(args.record,args.record_threshold)
+  cache = None
+  if 1 == args.workers:
+    if args.cache > 0:
+      cache = resultCache.ResultCache(args.cache)
+    results = evaluateExpressions(readExpressions(args.files),scale,args.chain,args.syntax,args.fast,cache,
+                                  args.precision,args.adaptive)
+  else:
+    if args.chain:
+      parser.error('--chain needs expressions in order and cannot be used with --workers')
+    if args.chunk_size < 1:
+      parser.error('--chunk-size must be at least 1')
+    report = reportChunk if args.report else None
+    results = evaluateParallel(readExpressions(args.files),scale,args.syntax,args.fast,
+                               args.workers if args.workers > 0 else None,args.chunk_size,report,args.cache,
+                               args.precision,args.adaptive)
+  if args.fast:
+    fields = FAST_FIELDS
+  elif args.adaptive:
+    fields = ADAPTIVE_FIELDS
+  else:
+    fields = FIELDS
+  if None == args.output:
+    WRITERS[args.format](results,sys.stdout,fields)
+  else:
+    with open(args.output,'w',newline='') as stream:
+      WRITERS[args.format](results,stream,fields)
+  if args.report and None != cache:
+    sys.stderr.write('cache: %(hits)d hits, %(misses)d misses, %(evictions)d evictions\n' % cache.stats())
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
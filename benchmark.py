@@ -0,0 +1,1179 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sys
+import math
+import time
+import random
+import collections
+import mpmath
+import PObject
+import calculatorSession
+import incrementalExpression
+import resultCache
+import wireFormat
+import formatOutput
+
+# numbers made here for tests are at the precision of the calculator
+mpmath.mp.dps = PObject.DECIMAL_PRECISION
+
+RADIAN_SCALE = PObject.RADIAN_SCALE
+DEGREE_SCALE = PObject.DEGREE_SCALE
+
+NUMERALS = ['#0','#1','#2','#3','#4','#5','#6','#7','#8','#9']
+CONSTANTS = ['pi','ANS','RCL']
+AFUNCTIONS = ['+','-']
+MFUNCTIONS = ['*','/']
+DFUNCTIONS = ['^','C','P','root']
+## tenX, exp and ! are left out of random expressions: nested, they
+# produce numbers so large that a single expression takes minutes.
+RFUNCTIONS = ['u+','u-','sqrt','cbrt','log','ln','sin','cos','tan','asin','acos','atan']
+LFUNCTIONS = ['2','3','inv']
+EXPRESSIONS = [
+  'tenX;#2;+;exp;#1;#.;#5;', '#6;!;/;#4;!;', 'exp;-;#3;*;tenX;#1;#.;#2;',
+  '#2;^;-;tenX;#2;', '#5;!;C;#3;', 'sin;#3;#0;!;', '(;#1;#0;);!;-;#2;^;#2;#0;',
+  '#1;E;-;#5;', '#1;#.;#5;E;+;-;#3;', '#2;(;);#3;', '#2;E;(;);-;#5;',
+  '#2;!;#3;', '#2;^;sin;cos;#3;#0;^;#2;', '#1;/;#0;', 'sqrt;-;#1;',
+  '#2;#.;#5;C;#2;', '(;#2;', '#2;);', '#2;+;', '',
+]
+
+##
+# Generate a random number as a list of tokens
+##
+def randomNumber(rng):
+  tokens = [rng.choice(NUMERALS) for i in range(rng.randint(1,2))]
+  if rng.random() < 0.2:
+    tokens += ['#.',rng.choice(NUMERALS)]
+  if rng.random() < 0.05:
+    tokens += ['E',rng.choice(['+','-','-']),rng.choice(NUMERALS)]
+  return tokens
+
+##
+# Generate a random, well-formed expression as a list of tokens
+# @param rng A random.Random
+# @param depth How deeply parentheses may still nest
+##
+def randomExpression(rng,depth=3):
+  tokens = []
+  for k in range(rng.randint(1,4)):
+    if 0 != k:
+      r = rng.random()
+      if r < 0.4:
+        tokens.append(rng.choice(AFUNCTIONS))
+      elif r < 0.8:
+        tokens.append(rng.choice(MFUNCTIONS))
+      elif r < 0.9:
+        tokens.append(rng.choice(DFUNCTIONS))
+      # otherwise juxtaposition
+    while rng.random() < 0.2:
+      tokens.append(rng.choice(RFUNCTIONS + AFUNCTIONS))
+    r = rng.random()
+    if depth > 0 and r < 0.25:
+      tokens += ['('] + randomExpression(rng,depth-1) + [')']
+    elif r < 0.4:
+      tokens.append(rng.choice(CONSTANTS))
+    else:
+      tokens += randomNumber(rng)
+    if rng.random() < 0.1:
+      tokens.append(rng.choice(LFUNCTIONS))
+  return tokens
+
+##
+# Generate a random list of tokens that need not make sense. Tokens that
+# make evaluateCascade() loop forever (an LFunction or DFunction at the
+# start of a group) are avoided. So are two kinds of nonsense to which
+# evaluateCascade() gave a value but evaluate() does not: a group of one
+# token and u+ followed by an operator.
+##
+def randomTokens(rng):
+  values = NUMERALS + CONSTANTS + AFUNCTIONS + RFUNCTIONS + ['(','E','#.']
+  everything = values + MFUNCTIONS + DFUNCTIONS + LFUNCTIONS + [')']
+  tokens = []
+  for i in range(rng.randint(1,12)):
+    t = rng.choice(everything)
+    if (t in LFUNCTIONS or t in DFUNCTIONS) and (0 == len(tokens) or '(' == tokens[-1]):
+      continue
+    if ')' == t and '(' in tokens[-2:]:
+      continue
+    if 0 != len(tokens) and 'u+' == tokens[-1] and t not in values:
+      continue
+    tokens.append(t)
+  return tokens
+
+##
+# Generate a long expression with about n tokens. Only cheap operators
+# are used so that the time is dominated by parsing.
+##
+def longExpression(rng,n):
+  tokens = []
+  depth = 0
+  while len(tokens) < n:
+    if 0 != len(tokens):
+      tokens.append(rng.choice(AFUNCTIONS + MFUNCTIONS))
+    r = rng.random()
+    if r < 0.15:
+      tokens.append('(')
+      depth += 1
+    elif r < 0.25:
+      tokens.append(rng.choice(['sqrt','sin','u-']))
+    tokens += [rng.choice(NUMERALS[1:]),'#.',rng.choice(NUMERALS)]
+    if depth > 0 and rng.random() < 0.15:
+      tokens.append(')')
+      depth -= 1
+  tokens += [')']*depth
+  return ';'.join(tokens)+';'
+
+##
+# Time a function
+# @return The best time in seconds of several runs
+##
+def timeit(fn,repeat=3):
+  best = None
+  for r in range(repeat):
+    start = time.perf_counter()
+    fn()
+    t = time.perf_counter() - start
+    if None == best or t < best:
+      best = t
+  return best
+
+##
+# Show how evaluation time grows with the number of tokens
+##
+def scaling(sizes=(100,400,1600,6400,25600),cascade=True):
+  rng = random.Random(2)
+  print('%8s %14s %14s %14s' % ('tokens','evaluate/s','per token/us','cascade/s'))
+  for n in sizes:
+    st = longExpression(rng,n)
+    plist = PObject.convertStringToPObjectList(st,mpmath.mpf(0),mpmath.mpf(0))
+    t = timeit(lambda: PObject.evaluate(plist,RADIAN_SCALE))
+    if cascade:
+      c = '%14.6f' % timeit(lambda: PObject.evaluateCascade(plist,RADIAN_SCALE),1)
+    else:
+      c = '%14s' % '-'
+    print('%8d %14.6f %14.3f %s' % (len(plist),t,1e6*t/len(plist),c))
+
+##
+# Compare repeated evaluation of an expression that uses ANS and RCL with
+# and without compiling it first
+##
+def compiled(iterations=2000):
+  st = 'ANS;*;#1;#.;#0;#5;+;RCL;'
+  memory = mpmath.mpf(10)
+  def reparse():
+    answer = mpmath.mpf(100)
+    for i in range(iterations):
+      plist = PObject.convertStringToPObjectList(st,memory,answer)
+      answer, output = PObject.evaluate(plist,RADIAN_SCALE)
+  def reuse():
+    answer = mpmath.mpf(100)
+    expression = PObject.compile(st)
+    for i in range(iterations):
+      answer, output = expression(answer,memory,RADIAN_SCALE)
+  def reuseValue():
+    answer = mpmath.mpf(100)
+    expression = PObject.compile(st)
+    for i in range(iterations):
+      answer = expression.value(answer,memory,RADIAN_SCALE)
+  print('%-24s %12s' % ('',str(iterations)+' x/s'))
+  print('%-24s %12.6f' % ('parse every time',timeit(reparse)))
+  print('%-24s %12.6f' % ('compiled',timeit(reuse)))
+  print('%-24s %12.6f' % ('compiled, no format',timeit(reuseValue)))
+
+##
+# The if/elif chain that convertStringToPObjectList() used before it was
+# driven by PObject.TOKENS, kept for comparison in tokenizer()
+##
+def chainConvertStringToPObjectList(objectString,memory,answer):
+  tokens = objectString.split(';')
+  pobjects = []
+  for token in tokens:
+    if '' == token:
+      pass
+    elif '#0' == token:
+      pobjects += [PObject.zeroNumeral]
+    elif '#1' == token:
+      pobjects += [PObject.oneNumeral]
+    elif '#2' == token:
+      pobjects += [PObject.twoNumeral]
+    elif '#3' == token:
+      pobjects += [PObject.threeNumeral]
+    elif '#4' == token:
+      pobjects += [PObject.fourNumeral]
+    elif '#5' == token:
+      pobjects += [PObject.fiveNumeral]
+    elif '#6' == token:
+      pobjects += [PObject.sixNumeral]
+    elif '#7' == token:
+      pobjects += [PObject.sevenNumeral]
+    elif '#8' == token:
+      pobjects += [PObject.eightNumeral]
+    elif '#9' == token:
+      pobjects += [PObject.nineNumeral]
+    elif '#.' == token:
+      pobjects += [PObject.decimalNumeral]
+    elif '#e' == token:
+      pobjects += [PObject.eNumeral]
+    elif '#-' == token:
+      pobjects += [PObject.minusNumeral]
+    elif 'pi' == token:
+      pobjects += [PObject.piObject]
+    elif 'ANS' == token:
+      pobjects += [PObject.Ans(answer)]
+    elif 'RCL' == token:
+      pobjects += [PObject.Rcl(memory)]
+    elif '+' == token:
+      pobjects += [PObject.addObject]
+    elif '-' == token:
+      pobjects += [PObject.subtractObject]
+    elif 'E' == token:
+      pobjects += [PObject.eObject]
+    elif '^' == token:
+      pobjects += [PObject.powerObject]
+    elif 'C' == token:
+      pobjects += [PObject.combinationObject]
+    elif 'P' == token:
+      pobjects += [PObject.permutationObject]
+    elif 'root' == token:
+      pobjects += [PObject.rootObject]
+    elif '(' == token:
+      pobjects += [PObject.lparenObject]
+    elif ')' == token:
+      pobjects += [PObject.rparenObject]
+    elif 'u+' == token:
+      pobjects += [PObject.uplusObject]
+    elif 'u-' == token:
+      pobjects += [PObject.uminusObject]
+    elif 'sqrt' == token:
+      pobjects += [PObject.squareRootObject]
+    elif 'cbrt' == token:
+      pobjects += [PObject.cubeRootObject]
+    elif 'log' == token:
+      pobjects += [PObject.logObject]
+    elif 'ln' == token:
+      pobjects += [PObject.lnObject]
+    elif 'tenX' == token:
+      pobjects += [PObject.tenXObject]
+    elif 'exp' == token:
+      pobjects += [PObject.expObject]
+    elif 'sin' == token:
+      pobjects += [PObject.sinObject]
+    elif 'cos' == token:
+      pobjects += [PObject.cosObject]
+    elif 'tan' == token:
+      pobjects += [PObject.tanObject]
+    elif 'asin' == token:
+      pobjects += [PObject.arcsinObject]
+    elif 'acos' == token:
+      pobjects += [PObject.arccosObject]
+    elif 'atan' == token:
+      pobjects += [PObject.arctanObject]
+    elif '2' == token:
+      pobjects += [PObject.squareObject]
+    elif '3' == token:
+      pobjects += [PObject.cubeObject]
+    elif '!' == token:
+      pobjects += [PObject.factorialObject]
+    elif 'inv' == token:
+      pobjects += [PObject.inverseObject]
+    elif '*' == token:
+      pobjects += [PObject.multiplyObject]
+    elif '/' == token:
+      pobjects += [PObject.divideObject]
+    elif 'STO' == token:
+      pobjects += [PObject.STOObject]
+    elif 'M+' == token:
+      pobjects += [PObject.MplusObject]
+    elif 'M-' == token:
+      pobjects += [PObject.MminusObject]
+    elif 'MCL' == token:
+      pobjects += [PObject.MclObject]
+    else:
+      print('convertStringToPObjectList: \''+token+'\' is not recognised.')
+  return pobjects
+
+##
+# Compare convertStringToPObjectList() with the old if/elif chain
+##
+def tokenizer(iterations=2000):
+  rng = random.Random(3)
+  strings = [';'.join(randomExpression(rng))+';' for i in range(iterations)]
+  strings.append('MCL;/;/;/;/;/;/;/;/;/;/;/;/;/;/;/;/;/;/;/;')
+  memory = mpmath.mpf(0)
+  answer = mpmath.mpf(0)
+  count = sum(len(PObject.convertStringToPObjectList(st,memory,answer)) for st in strings)
+  def chain():
+    for st in strings:
+      chainConvertStringToPObjectList(st,memory,answer)
+  def table():
+    for st in strings:
+      PObject.convertStringToPObjectList(st,memory,answer)
+  def many():
+    for plist in PObject.tokenize_many(strings,memory,answer):
+      pass
+  print('%-24s %12s %14s' % ('',str(count)+' tokens/s','per token/us'))
+  for name, fn in (('if/elif chain',chain),('table',table),('tokenize_many',many)):
+    t = timeit(fn)
+    print('%-24s %12.6f %14.3f' % (name,t,1e6*t/count))
+
+##
+# Show how batch throughput grows with the number of processes, for
+# sizing batch nodes. The corpus is fixed by the seed.
+##
+def cores(count=20000,maxWorkers=None,chunkSize=500):
+  import os
+  import batch
+  if None == maxWorkers:
+    maxWorkers = os.cpu_count()
+  rng = random.Random(4)
+  corpus = [(i,longExpression(rng,20)) for i in range(count)]
+  print('%8s %12s %12s %10s' % ('workers','seconds','per second','speed-up'))
+  base = None
+  for workers in range(1,maxWorkers+1):
+    def run():
+      for result in batch.evaluateParallel(corpus,workers=workers,chunkSize=chunkSize):
+        pass
+    t = timeit(run,1)
+    if None == base:
+      base = t
+    print('%8d %12.3f %12.0f %10.2f' % (workers,t,count/t,base/t))
+
+##
+# Compare the mpmath arithmetic of evaluate() with the float fast path of
+# evaluateFast() on typical expressions. Times are for compiled
+# expressions, first for the arithmetic alone and then with formatting.
+# tests/test_fast.py checks the digits of the fast path.
+##
+def fast(count=2000):
+  rng = random.Random(6)
+  answer = mpmath.mpf(2)
+  memory = mpmath.mpf('0.5')
+  expressions = [PObject.compile(';'.join(randomExpression(rng,1))+';') for i in range(count)]
+  paths = {}
+  for expression in expressions:
+    path = expression.fast(answer,memory,DEGREE_SCALE)[2]
+    paths[path] = paths.get(path,0) + 1
+  floats = [e for e in expressions if None != e.floats and 'float' == e.fast(answer,memory,DEGREE_SCALE)[2]]
+  def arithmetic():
+    for e in floats:
+      d = PObject.executeFloat(e.floats,DEGREE_SCALE,answer,memory)
+      if not isinstance(d,PObject.PError):
+        PObject.roundFloat(d[0],d[1])
+  print('%-24s %12s %12s %8s' % ('','mpmath/s','fast/s','ratio'))
+  t = timeit(lambda: [e.value(answer,memory,DEGREE_SCALE) for e in floats])
+  f = timeit(arithmetic)
+  print('%-24s %12.6f %12.6f %8.2f' % ('arithmetic (float path)',t,f,t/f))
+  t = timeit(lambda: [e(answer,memory,DEGREE_SCALE) for e in expressions])
+  f = timeit(lambda: [e.fast(answer,memory,DEGREE_SCALE) for e in expressions])
+  print('%-24s %12.6f %12.6f %8.2f' % ('formatted (all)',t,f,t/f))
+  print('paths %s' % paths)
+
+##
+# Compare evaluating an expression once per value of ANS with
+# vectorized.evaluateArray() over all the values at once;
+# tests/test_vectorized.py checks that they agree
+##
+def vector(size=10000):
+  import numpy
+  import vectorized
+  st = 'sin;ANS;*;sqrt;(;ANS;+;#1;);-;ln;(;ANS;2;+;#1;);/;#3;'
+  answers = numpy.linspace(-10,10,size)
+  memory = mpmath.mpf(0)
+  expression = PObject.compile(st)
+  def scalar():
+    return [expression.value(mpmath.mpf(a),memory,DEGREE_SCALE) for a in answers]
+  values, errors = vectorized.evaluateArray(expression,answers,DEGREE_SCALE)
+  t = timeit(scalar,1)
+  v = timeit(lambda: vectorized.evaluateArray(expression,answers,DEGREE_SCALE))
+  print('%-24s %12s' % ('',str(size)+' x/s'))
+  print('%-24s %12.6f' % ('one at a time',t))
+  print('%-24s %12.6f' % ('evaluateArray',v))
+  print('speed-up %.0f, errors %s' % (t/v,dict((k,len(e)) for k, e in errors.items())))
+
+##
+# Time a stream of expressions that repeat, as from pressing = again or a
+# batch log, with and without a resultCache.ResultCache
+##
+def cache(distinct=200,repeats=20):
+  rng = random.Random(8)
+  corpus = [';'.join(randomExpression(rng,1))+';' for i in range(distinct)]
+  stream = corpus*repeats
+  rng.shuffle(stream)
+  answer = mpmath.mpf(2)
+  memory = mpmath.mpf('0.5')
+  def uncached():
+    for st in stream:
+      PObject.compile(st)(answer,memory,DEGREE_SCALE)
+  def cached():
+    results = resultCache.ResultCache(distinct)
+    for st in stream:
+      results.evaluate(st,DEGREE_SCALE,answer,memory)
+    return results
+  t = timeit(uncached,1)
+  c = timeit(cached,1)
+  print('%-24s %12s' % ('',str(len(stream))+' x/s'))
+  print('%-24s %12.6f' % ('uncached',t))
+  print('%-24s %12.6f' % ('ResultCache',c))
+  print('speed-up %.1f, %s' % (t/c,cached().stats()))
+
+##
+# Generate a random number for testing formatOutput: results of
+# arithmetic, short decimals, numbers near a rounding tie, integers and
+# numbers of extreme size
+##
+def randomValue(rng):
+  kind = rng.randrange(7)
+  if 0 == kind:
+    d = mpmath.mpf(rng.randint(1,10**6))/rng.randint(1,10**6)
+  elif 1 == kind:
+    d = mpmath.sqrt(rng.randint(1,10**4))*mpmath.mpf(10)**rng.randint(-30,30)
+  elif 2 == kind:
+    digits = str(rng.randint(1,10**rng.randint(1,25)))
+    d = mpmath.mpf(digits[:-1]+'5')*mpmath.mpf(10)**rng.randint(-40,30)
+  elif 3 == kind:
+    d = mpmath.mpf(rng.randint(0,10**rng.randint(1,30)))
+  elif 4 == kind:
+    d = mpmath.mpf(rng.choice(['0.15','0.125','2.5','9.9999999999999999999999','0.99999999999999999999999995',
+                              '1e-5','0.0001','123456789012345678901234.5','1e24','1e-24']))
+  elif 5 == kind:
+    d = mpmath.exp(rng.uniform(-2000,2000))
+  else:
+    d = mpmath.mpf(rng.uniform(0,1))**rng.randint(1,40)
+  if rng.random() < 0.3:
+    d = -d
+  return d
+
+##
+# Time formatOutput.format() and formatOutput.format_nstr() on random
+# numbers; tests/test_format.py checks that they agree
+##
+def formatter(count=5000):
+  rng = random.Random(9)
+  sample = [randomValue(rng) for i in range(count)]
+  t = timeit(lambda: [formatOutput.format_nstr(d,24) for d in sample])
+  f = timeit(lambda: [formatOutput.format(d,24) for d in sample])
+  print('%-24s %12s' % ('',str(len(sample))+' x/s'))
+  print('%-24s %12.6f' % ('format_nstr',t))
+  print('%-24s %12.6f' % ('format',f))
+  print('speed-up %.1f' % (t/f))
+
+##
+# Run a loop of 60 frames a second, as the window does, while a slow
+# expression is evaluated, first on the same thread and then with
+# background.Evaluator, and report the longest time a frame spends on work. The background run
+# also supersedes, cancels and times out requests, as tests/test_background.py
+# checks in more detail.
+##
+def responsive(frames=180):
+  import queue
+  import background
+  slow = 'sin;#1;E;#9;#9;#9;#9;#9;'
+  answer = mpmath.mpf(0)
+  memory = mpmath.mpf(0)
+  def frameLoop(actions,calls=None):
+    # the time each frame spends on work, which delays drawing
+    period = 1/60
+    longest = 0
+    for frame in range(frames):
+      start = time.perf_counter()
+      if frame in actions:
+        actions[frame]()
+      while None != calls and not calls.empty():
+        function, args = calls.get()
+        function(*args)
+      work = time.perf_counter() - start
+      longest = max(longest,work)
+      time.sleep(max(0,period-work))
+    return longest
+  start = time.perf_counter()
+  PObject.compile(slow)(answer,memory,DEGREE_SCALE)
+  print('%-32s %10.3f s' % ('slow expression',time.perf_counter()-start))
+  blocking = frameLoop({10: lambda: PObject.compile(slow)(answer,memory,DEGREE_SCALE)})
+  calls = queue.Queue()
+  delivered = {}
+  evaluator = background.Evaluator(lambda function,*args: calls.put((function,args)),timeout=1)
+  def done(number,value,output):
+    delivered[number] = output
+  def submit(st):
+    return lambda: evaluator.submit(st,DEGREE_SCALE,answer,memory,done)
+  actions = {5: submit('#1;+;#1;'),        # 1: delivered
+             10: submit(slow),             # 2: superseded by 3
+             20: submit('#2;+;#2;'),       # 3: delivered
+             30: submit(slow),             # 4: cancelled
+             40: evaluator.cancel,
+             50: submit('sin;#1;E;#9;#9;#9;#9;#9;#9;')}  # 6: times out
+  longest = frameLoop(actions,calls)
+  evaluator.close()
+  print('%-32s %10.1f ms' % ('longest frame, same thread',1000*blocking))
+  print('%-32s %10.1f ms' % ('longest frame, background',1000*longest))
+  print('delivered %s' % delivered)
+
+##
+# Evaluate several calculator sessions, each a stream of expressions that
+# use ANS and RCL and store with STO, M+ and M-, first one after another
+# and then concurrently from a pool of threads. Both ways are timed with
+# sessions without a cache and again with sessions sharing a ResultCache,
+# a fresh one for each way. tests/test_sessions.py checks that both ways
+# give the same answers, memories and histories.
+##
+def sessions(count=16,length=200,threads=8):
+  import concurrent.futures
+  rng = random.Random(11)
+  streams = []
+  for n in range(count):
+    stream = []
+    for k in range(length):
+      store = rng.choice(['','','','STO;','M+;','M-;'])
+      stream.append(store+';'.join(randomExpression(rng,1))+';')
+    streams.append(stream)
+  def run(session,stream):
+    for st in stream:
+      session.evaluate(st)
+  pool = concurrent.futures.ThreadPoolExecutor(threads)
+  for caching in (False,True):
+    shared = resultCache.ResultCache() if caching else None
+    start = time.perf_counter()
+    for stream in streams:
+      run(calculatorSession.CalculatorSession(shared),stream)
+    sequential = time.perf_counter() - start
+    # each task is a slice of one session's stream; a session's slices run in order
+    shared = resultCache.ResultCache() if caching else None
+    start = time.perf_counter()
+    calculators = [calculatorSession.CalculatorSession(shared) for stream in streams]
+    pending = [None]*count
+    for offset in range(0,length,20):
+      for n in range(count):
+        if None != pending[n]:
+          pending[n].result()
+        pending[n] = pool.submit(run,calculators[n],streams[n][offset:offset+20])
+    for future in pending:
+      future.result()
+    threaded = time.perf_counter() - start
+    label = 'shared cache' if caching else 'no cache'
+    print('%-44s %10.3f s' % ('%d sessions one after another, %s' % (count,label),sequential))
+    print('%-44s %10.3f s' % ('%d sessions on %d threads, %s' % (count,threads,label),threaded))
+  pool.shutdown()
+
+##
+# Evaluate expressions at several precisions, first one after another and
+# then mixed together on a pool of threads; tests/test_sessions.py checks
+# that every result is exactly the same both ways.
+##
+def precisions(count=400,threads=8,digits=(15,30,50,100)):
+  import concurrent.futures
+  rng = random.Random(12)
+  corpus = [PObject.compile(';'.join(randomExpression(rng,1))+';') for i in range(count)]
+  answer = mpmath.mpf(2)
+  memory = mpmath.mpf('0.5')
+  tasks = [(expression,precision) for expression in corpus for precision in digits]
+  rng.shuffle(tasks)
+  def run(task):
+    return task[0].value(answer,memory,DEGREE_SCALE,task[1])
+  start = time.perf_counter()
+  for task in tasks:
+    run(task)
+  sequential = time.perf_counter() - start
+  start = time.perf_counter()
+  with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+    list(pool.map(run,tasks,chunksize=16))
+  threaded = time.perf_counter() - start
+  third = PObject.compile('#1;/;#3;')
+  for d in digits[:2]:
+    print('1/3 at %d digits: %s' % (d,mpmath.nstr(third.value(None,None,1,d),d+5)))
+  print('%-32s %10.3f s' % ('%d evaluations one after another' % len(tasks),sequential))
+  print('%-32s %10.3f s' % ('mixed on %d threads' % threads,threaded))
+##
+# Expressions whose cost grows with the precision, and expressions that
+# lose digits to cancellation, in plain infix
+##
+HEAVY = ['99999!','exp(12345)','exp(1E6)','10^123456.7','1.00001^1000000','2^100000+1','sin(123456789)',
+         '(2000!)/(1999!)','ln(12345!)','sqrt(2)+cbrt(3)']
+CANCELLING = ['(1+1E-35)-1','(1+1E-60)-1','(1E30+1)-1E30','sqrt(1E40+1)-1E20','(pi+1E-40)-pi',
+              '1/(1-cos(1E-12))','exp(1E-45)-1','1E50-(1E50-7)','ln(1+1E-55)','1-1']
+
+##
+# Compare Expression.adaptive() with evaluation at the usual precision:
+# timing, the precisions the ladder stops at and how many outputs differ
+# from those at 1000 digits. tests/test_ladder.py checks that adaptive()
+# gives those outputs.
+##
+def ladder(count=300):
+  rng = random.Random(13)
+  corpus = [';'.join(randomExpression(rng,2))+';' for i in range(count)]
+  corpus += [PObject.convertInfixToString(x) for x in HEAVY+CANCELLING]
+  corpus = [PObject.compile(tokens) for tokens in corpus]
+  answer = mpmath.mpf(2)
+  memory = mpmath.mpf('0.5')
+  reference = [expression(answer,memory,DEGREE_SCALE,1000)[1] for expression in corpus]
+  def run(expressions,adaptive):
+    results = []
+    start = time.perf_counter()
+    for expression in expressions:
+      if adaptive:
+        results.append(expression.adaptive(answer,memory,DEGREE_SCALE))
+      else:
+        results.append(expression(answer,memory,DEGREE_SCALE)+(PObject.DECIMAL_PRECISION,))
+    return results, time.perf_counter() - start
+  fixed = []
+  adaptive = []
+  total = [0.0,0.0]
+  print('%-20s %10s %13s %11s %14s' % ('','time at 50','time adaptive','wrong at 50','wrong adaptive'))
+  for name, lines in (('random',slice(0,count)),('heavy',slice(count,count+len(HEAVY))),
+                      ('cancelling',slice(count+len(HEAVY),len(corpus)))):
+    results, fixedTime = run(corpus[lines],False)
+    fixed += results
+    results, adaptiveTime = run(corpus[lines],True)
+    adaptive += results
+    total[0] += fixedTime
+    total[1] += adaptiveTime
+    print('%-20s %8.2fms %11.2fms %11d %14d' % ('%s (%d)' % (name,len(corpus[lines])),fixedTime*1000,adaptiveTime*1000,
+          sum(1 for result, output in zip(fixed[lines],reference[lines]) if result[1] != output),
+          sum(1 for result, output in zip(adaptive[lines],reference[lines]) if result[1] != output)))
+  used = collections.Counter(result[2] for result in adaptive)
+  print('%-20s %8.2fms %11.2fms %11d %14d' % ('all (%d)' % len(corpus),total[0]*1000,total[1]*1000,
+        sum(1 for result, output in zip(fixed,reference) if result[1] != output),
+        sum(1 for result, output in zip(adaptive,reference) if result[1] != output)))
+  print('precisions used: '+', '.join('%d: %d' % (d,used[d]) for d in sorted(used)))
+## Integer and rational expressions for the exact arithmetic of execute(),
+# in plain infix
+EXACT = ['1234*5678', '52C5', '100C50', '1000C500', '20P7', '30!', '170!/168!', '2^64*3^40-1',
+         '1/3+1/6', '(10^60+1)-10^60', '(1+1E-35)-1', '7E-3*4E2', '(2/7)^9', '123456789^3-1',
+         '(52C5)/(47C2)', '1000!/999!', '12!/(5!*7!)', 'sqrt(144/25)+1']
+
+##
+# Time exact arithmetic in execute() against mpmath throughout, both on
+# the EXACT expressions and on random ones that soon need mpmath.
+# tests/test_exact.py checks the outputs of the EXACT expressions.
+##
+def exact(iterations=200,count=300):
+  rng = random.Random(14)
+  groups = (('integer/rational (%d)' % len(EXACT),[PObject.convertInfixToString(x) for x in EXACT]),
+            ('random (%d)' % count,[';'.join(randomExpression(rng,2))+';' for i in range(count)]))
+  answer = mpmath.mpf(2)
+  memory = mpmath.mpf('0.5')
+  print('%-26s %12s %12s %8s' % ('','mpmath/s','exact/s','ratio'))
+  for name, corpus in groups:
+    programs = [PObject.compile(st).program for st in corpus]
+    programs = [program for program in programs if not isinstance(program,PObject.PError)]
+    def run(flag):
+      def fn():
+        for i in range(iterations):
+          for program in programs:
+            try:
+              PObject.execute(program,DEGREE_SCALE,answer,memory,PObject.DECIMAL_PRECISION,flag)
+            except (ArithmeticError,ValueError):
+              pass
+      return fn
+    old = timeit(run(False))/iterations
+    new = timeit(run(True))/iterations
+    print('%-26s %12.6f %12.6f %8.2f' % (name,old,new,old/new))
+## Expressions with results too large to compute, and large ones that
+# should still be computed, in plain infix
+EXPLOSIVE = ['(1E6)!!', '(100000!)!', 'exp(1E6!)', '10^(1E6!)', '2^(1E6!)', 'exp(exp(1E6))', '(1E30)!',
+             '1E6!', 'exp(1E15)', '10^(1E17)']
+LARGE = ['1E5!', 'exp(1E5)', '10^99999', '(1E4!)^2', '1^(1E5!)', '0^(1E5!)', '1.0000001^(1E9)']
+
+##
+# Time expressions whose results are past PObject.MAX_EXPONENT, with the
+# guard and, in a worker process with a time limit, without it, and large
+# results below the limit; tests/test_guard.py checks the results.
+# @param timeout Seconds allowed for each unguarded expression
+##
+def guard(timeout=2):
+  import threading
+  import background
+  answer = mpmath.mpf(0)
+  memory = mpmath.mpf(0)
+  def unguarded(st):
+    # a forked worker keeps the MAX_EXPONENT of this process
+    limit = PObject.MAX_EXPONENT
+    PObject.MAX_EXPONENT = math.inf
+    finished = threading.Event()
+    results = []
+    evaluator = background.Evaluator(lambda function,*args: function(*args),timeout)
+    def done(number,value,output):
+      results.append(output)
+      finished.set()
+    start = time.perf_counter()
+    evaluator.submit(st,DEGREE_SCALE,answer,memory,done)
+    finished.wait()
+    seconds = time.perf_counter() - start
+    evaluator.close()
+    PObject.MAX_EXPONENT = limit
+    return results[0], seconds
+  print('%-16s %24s %10s %24s %10s' % ('','unguarded','','guarded',''))
+  for x in EXPLOSIVE+LARGE:
+    st = PObject.convertInfixToString(x)
+    old, oldTime = unguarded(st)
+    start = time.perf_counter()
+    new = PObject.compile(st)(answer,memory,DEGREE_SCALE)[1]
+    newTime = time.perf_counter() - start
+    print('%-16s %24s %8.3f s %24s %8.3f s' % (x,old,oldTime,new,newTime))
+##
+# Measure the memory that evaluation uses: the size of a Container, the
+# PObjects made and the peak memory traced by tracemalloc per evaluation,
+# the garbage collections during a run and the time taken.
+##
+def allocations(count=300,iterations=20):
+  import gc
+  import tracemalloc
+  rng = random.Random(16)
+  corpus = [PObject.compile(';'.join(randomExpression(rng,2))+';') for i in range(count)]
+  programs = [expression.program for expression in corpus if not isinstance(expression.program,PObject.PError)]
+  answer = mpmath.mpf(2)
+  memory = mpmath.mpf('0.5')
+  def run():
+    for program in programs:
+      try:
+        PObject.execute(program,DEGREE_SCALE,answer,memory)
+      except (ArithmeticError,ValueError):
+        pass
+  container = PObject.Container(answer)
+  size = sys.getsizeof(container) + (sys.getsizeof(container.__dict__) if hasattr(container,'__dict__') else 0)
+  made = [0]
+  classes = (PObject.Container,PObject.Ans,PObject.Rcl)
+  inits = [cls.__dict__['__init__'] for cls in classes]
+  def counting(init):
+    def fn(self,*args):
+      made[0] += 1
+      init(self,*args)
+    return fn
+  for cls, init in zip(classes,inits):
+    cls.__init__ = counting(init)
+  run()
+  for cls, init in zip(classes,inits):
+    cls.__init__ = init
+  tracemalloc.start()
+  peak = 0
+  for program in programs:
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    try:
+      PObject.execute(program,DEGREE_SCALE,answer,memory)
+    except (ArithmeticError,ValueError):
+      pass
+    peak += tracemalloc.get_traced_memory()[1] - base
+  tracemalloc.stop()
+  collections = gc.get_stats()[0]['collections']
+  seconds = timeit(lambda: [run() for i in range(iterations)])/iterations
+  collections = (gc.get_stats()[0]['collections'] - collections)/(3*iterations)
+  n = len(programs)
+  print('%-40s %10d bytes' % ('Container',size))
+  print('%-40s %10.1f' % ('PObjects made per evaluation',made[0]/n))
+  print('%-40s %10.0f bytes' % ('peak traced memory per evaluation',peak/n))
+  print('%-40s %10.1f' % ('garbage collections per %d evaluations' % n,collections))
+  print('%-40s %10.1f us' % ('time per evaluation',1e6*seconds/n))
+
+##
+# Measure the cost of PObject.Metrics: the time of compiling and evaluating
+# the keypad, trig and combinatorics expressions of the suite with metrics
+# disabled and enabled, and the snapshot that results.
+##
+def instrumentation(rounds=20,repeat=5):
+  import json
+  corpus = suiteCorpus()
+  strings = (corpus['keypad']+corpus['trig']+corpus['combinatorics'])*rounds
+  count = len(strings)
+  def run():
+    for st in strings:
+      PObject.compile(st)(None,None,DEGREE_SCALE)
+  run()
+  disabled = timeit(run,repeat)
+  recorder = PObject.enableMetrics()
+  try:
+    enabled = timeit(run,repeat)
+    recorder.reset()
+    run()
+    snapshot = recorder.snapshot()
+  finally:
+    PObject.disableMetrics()
+  print('%-32s %10.1f us' % ('disabled, per expression',1e6*disabled/count))
+  print('%-32s %10.1f us' % ('enabled, per expression',1e6*enabled/count))
+  for name, stage in snapshot['stages'].items():
+    print('%-32s %10.1f us' % ('stage '+name,1e6*stage['seconds']/stage['count']))
+  slowest = sorted(snapshot['operators'].items(),key=lambda item: -item[1]['seconds'])
+  for name, operator in slowest[:8]:
+    print('%-32s %10d calls %10.1f us' % ('operator '+name,operator['count'],1e6*operator['seconds']))
+  print(json.dumps(snapshot['tokens']))
+
+##
+# Compare the textual and compact formats of the strings that the page
+# sends: their length, the time to decode them into PObjects and the time
+# to decode and parse them, over random keypad expressions and long
+# expressions. Numbers arrive assembled in the compact format, so part of
+# the work of parse() moves into decoding it; the compact format is timed
+# with the Literals of its numbers made afresh and, as warm, reused.
+# tests/test_wire.py checks that both formats give the same results.
+##
+def wire(count=2000,sizes=(100,1000)):
+  rng = random.Random(4)
+  groups = [('keypad (%d)' % count,[';'.join(randomExpression(rng))+';' for i in range(count)])]
+  for size in sizes:
+    groups.append(('long %d tokens (%d)' % (size,count//size or 1),
+                   [longExpression(rng,size) for i in range(max(count//size,1))]))
+  memory = mpmath.mpf(3)
+  answer = mpmath.mpf(7)
+  print('%-26s %-8s %10s %14s %14s' % ('','format','chars','decode/us','+parse/us'))
+  for name, strings in groups:
+    compact = [wireFormat.encodeCompact(st) for st in strings]
+    for label, items, cold in (('textual',strings,True),('compact',compact,True),('warm',compact,False)):
+      def decode():
+        if cold:
+          wireFormat.wireLiterals.clear()
+        for st in items:
+          PObject.convertStringToPObjectList(st,memory,answer)
+      def parse():
+        if cold:
+          wireFormat.wireLiterals.clear()
+        for st in items:
+          try:
+            PObject.parse(PObject.convertStringToPObjectList(st,memory,answer))
+          except Exception:
+            # a number such as 1.2.3, which the calculator shows as Error
+            pass
+      chars = sum(len(st) for st in items)
+      print('%-26s %-8s %10.1f %14.2f %14.2f' % (name,label,chars/len(items),1e6*timeit(decode,5)/len(items),
+                                                 1e6*timeit(parse,5)/len(items)))
+
+##
+# Time typing long expressions a token at a time, evaluating after each
+# key as a live display would, and deleting them again with DEL: compiling
+# every string afresh against incrementalExpression.IncrementalExpression, which only
+# parses and runs what changed at the end. tests/test_incremental.py
+# checks that both give the same outputs.
+##
+def incremental(sizes=(50,200,800)):
+  rng = random.Random(6)
+  memory = mpmath.mpf(3)
+  answer = mpmath.mpf(7)
+  print('%8s %-7s %14s %14s %8s' % ('tokens','keys','compile/us','incremental/us','speedup'))
+  for size in sizes:
+    tokens = longExpression(rng,size).split(';')[:-1]
+    typing = [''.join(token+';' for token in tokens[:k]) for k in range(1,len(tokens)+1)]
+    deleting = typing[::-1][1:]
+    for label, strings in (('type',typing),('DEL',deleting)):
+      def full():
+        for st in strings:
+          PObject.compile(st)(answer,memory,DEGREE_SCALE)
+      def reuse():
+        expression = incrementalExpression.IncrementalExpression()
+        expression.update(strings[0])
+        expression(answer,memory,DEGREE_SCALE)
+        for st in strings:
+          expression.update(st)
+          expression(answer,memory,DEGREE_SCALE)
+      before = timeit(full)
+      after = timeit(reuse)
+      print('%8d %-7s %14.1f %14.1f %8.1f' % (len(tokens),label,1e6*before/len(strings),1e6*after/len(strings),
+                                               before/after))
+
+##
+# Time = from the press to its answer, as the frontends handle it, with
+# background.Speculator working out the expression while it is typed and
+# without. The keys of each expression are typed interval milliseconds
+# apart; = comes pause milliseconds after the last key, or interval
+# milliseconds after it when hurried, before the speculation starts.
+# tests/test_background.py checks the answers.
+##
+def speculation(interval=20,pause=300):
+  import queue
+  import threading
+  import statistics
+  import background
+  strings = [PObject.convertInfixToString(x) for x in SUITE_KEYPAD+SUITE_TRIG+SUITE_COMBINATORICS]
+  snapshot = (DEGREE_SCALE,mpmath.mpf(7),mpmath.mpf(3))
+  calls = queue.Queue()
+  deliver = lambda function,*args: calls.put((function,args))
+  def later(milliseconds,function):
+    timer = threading.Timer(milliseconds/1000,calls.put,((function,()),))
+    timer.daemon = True
+    timer.start()
+  def pump(seconds,until=lambda: False):
+    # the event loop of the window
+    end = time.perf_counter()+seconds
+    while not until():
+      left = end-time.perf_counter()
+      if left <= 0:
+        return
+      try:
+        function, args = calls.get(timeout=left)
+      except queue.Empty:
+        return
+      function(*args)
+  evaluator = background.Evaluator(deliver,60)
+  speculator = background.Speculator(background.Evaluator(deliver,60),later,lambda: snapshot)
+  def press(st):
+    answers = []
+    start = time.perf_counter()
+    done = lambda value,output: answers.append((time.perf_counter()-start,output))
+    if not speculator.claim(st,snapshot,done):
+      evaluator.submit(st,*snapshot,lambda number,value,output: done(value,output))
+    pump(60,lambda: 0 != len(answers))
+    return answers[0]
+  def typeKeys(st,wait):
+    tokens = [token+';' for token in st.split(';')[:-1]]
+    for k in range(1,len(tokens)+1):
+      speculator.typed(wireFormat.encodeCompact(''.join(tokens[:k])))
+      pump(interval/1000)
+    pump(wait/1000)
+  # start the worker processes
+  for st in ('#1;','#2;'):
+    typeKeys(st,pause)
+    press(wireFormat.encodeCompact(st))
+  print('%-10s %12s %12s %8s' % ('=','median/ms','max/ms','claimed'))
+  for label, wait in (('computed',None),('hurried',interval),('paused',pause)):
+    times = []
+    hits = speculator.hits
+    for st in strings:
+      wireString = wireFormat.encodeCompact(st)
+      if None == wait:
+        speculator.cancel()
+      else:
+        typeKeys(st,wait)
+      times.append(press(wireString)[0])
+    print('%-10s %12.3f %12.3f %8d' % (label,1e3*statistics.median(times),1e3*max(times),speculator.hits-hits))
+  evaluator.close()
+  speculator.evaluator.close()
+
+## The fixed corpus of the benchmark suite: short expressions as typed on
+# the keypad, trig functions, combinatorics and numbers near the ends of
+# the range, in plain infix. Long and deeply nested expressions are made
+# by suiteCorpus() from fixed seeds.
+SUITE_KEYPAD = ['1+2', '12*34', '7/8', '3.5-1.25', '2^10', '1/3+1/6', '99-100', '4*(5+6)', '0.1+0.2',
+                '123456789*987654321', '2.5E3+1', 'sqrt(2)', '-7*-8', '1.5^2', '10/4-2']
+SUITE_TRIG = ['sin(30)', 'cos(60)', 'tan(45)', 'asin(0.5)', 'acos(0.25)', 'atan(0.75)', 'sin(1)+cos(1)',
+              'tan(89.9)', 'sin(180)', 'cos(pi/3)', 'sin(123456)', 'asin(1)']
+SUITE_COMBINATORICS = ['52C5', '10P3', '30!', '100C50', '20!/(10!*10!)', '1000C3', '170!', '6.5!',
+                       '49C6*6C3', '(2*25)!']
+SUITE_MAGNITUDES = ['1E-300*1E-300', '1E300*1E300', 'exp(1000)', 'exp(-1000)', '10^(1E6)', '2^-10000',
+                    '1E-99/7', 'ln(1E-300)', 'sqrt(1E-200)', '(1E6)!', '1/(1E200)', '9.99E299+1']
+## Precisions of the precision scaling in the suite
+SUITE_PRECISIONS = (15,30,50,100,200)
+## Format of the JSON written by suite()
+SUITE_FORMAT = 1
+## Slow-down of a result over its baseline that compare() calls a
+# regression
+REGRESSION = 0.25
+
+##
+# Make the corpus of the benchmark suite
+# @return A dictionary of categories to lists of strings in the format of
+# the calculator title
+##
+def suiteCorpus():
+  rng = random.Random(17)
+  infix = lambda expressions: [PObject.convertInfixToString(x) for x in expressions]
+  deep = []
+  for depth in (10,40,160):
+    deep.append('(;'*depth+'#2;'+');*;#1;#.;#5;'*depth)
+    deep.append('sqrt;(;'*depth+'#2;'+');'*depth)
+  return {'keypad': infix(SUITE_KEYPAD),
+          'long': [longExpression(rng,n) for n in (100,400,1600)],
+          'deep': deep,
+          'trig': infix(SUITE_TRIG),
+          'combinatorics': infix(SUITE_COMBINATORICS),
+          'magnitudes': infix(SUITE_MAGNITUDES)}
+
+##
+# Time a function run over a list
+# @param fn A function of one item
+# @param items The list
+# @param least Seconds that each run should take at least
+# @return The best time in seconds per item
+##
+def timePerItem(fn,items,repeat=5,least=0.05):
+  def run():
+    for item in items:
+      fn(item)
+  rounds = 1
+  start = time.perf_counter()
+  run()
+  once = time.perf_counter() - start
+  if once < least:
+    rounds = int(least/max(once,1e-9))+1
+  best = timeit(lambda: [run() for r in range(rounds)],repeat)
+  return best/(rounds*len(items))
+
+##
+# Evaluate a program from parse() and ignore errors
+##
+def safeExecute(program,scale,precision=PObject.DECIMAL_PRECISION):
+  try:
+    return PObject.execute(program,scale,None,None,precision)
+  except (ArithmeticError,ValueError,TypeError):
+    return None
+
+##
+# Run the benchmark suite: the time per expression of each stage
+# (tokenizer, parse, execute, formatter), of PObject.evaluate() and of a
+# CalculatorSession for each category of the corpus, of execute() at each
+# of SUITE_PRECISIONS and of a round trip through the background worker
+# for the keypad expressions. The whole suite runs several times and the
+# best time of each is kept, so that a slow spell of the machine does not
+# spoil one part of it.
+# @param output Name of a file for the results as JSON, or None
+# @param rounds Number of times to run the suite
+# @return The results as written
+##
+def suite(output=None,rounds=3):
+  import json
+  import platform
+  import threading
+  import background
+  corpus = suiteCorpus()
+  # pairs of name and function that returns seconds per expression
+  cases = []
+  categories = [(name,strings,DEGREE_SCALE) for name, strings in corpus.items()]
+  categories.insert(4,('trig-radians',corpus['trig'],RADIAN_SCALE))
+  for name, strings, scale in categories:
+    if 'trig' == name:
+      name = 'trig-degrees'
+    plists = [PObject.convertStringToPObjectList(st,None,None) for st in strings]
+    programs = [PObject.parse(plist) for plist in plists]
+    programs = [program for program in programs if not isinstance(program,PObject.PError)]
+    values = [d.value for d in (safeExecute(program,scale) for program in programs)
+              if None != d and not isinstance(d,PObject.PError)]
+    session = calculatorSession.CalculatorSession()
+    session.setScale(scale)
+    cases += [
+      (name+'/tokenize',lambda strings=strings: timePerItem(lambda st: PObject.convertStringToPObjectList(st,None,None),
+                                                            strings)),
+      (name+'/parse',lambda plists=plists: timePerItem(PObject.parse,plists)),
+      (name+'/execute',lambda programs=programs, scale=scale: timePerItem(lambda program: safeExecute(program,scale),
+                                                                          programs)),
+      (name+'/format',lambda values=values: timePerItem(lambda value: formatOutput.format(value,PObject.DIGITS),values)),
+      (name+'/evaluate',lambda plists=plists, scale=scale: timePerItem(lambda plist: PObject.evaluate(plist,scale),
+                                                                       plists)),
+      (name+'/session',lambda strings=strings, session=session: timePerItem(session.evaluate,strings))]
+  mixed = corpus['keypad']+corpus['trig']+corpus['combinatorics']+corpus['magnitudes']
+  programs = [PObject.compile(st).program for st in mixed]
+  programs = [program for program in programs if not isinstance(program,PObject.PError)]
+  for precision in SUITE_PRECISIONS:
+    cases.append(('precision/%d' % precision,
+                  lambda precision=precision: timePerItem(lambda program: safeExecute(program,DEGREE_SCALE,precision),
+                                                          programs)))
+  finished = threading.Event()
+  evaluator = background.Evaluator(lambda function,*args: function(*args))
+  def update(st):
+    finished.clear()
+    evaluator.submit(st,DEGREE_SCALE,None,None,lambda number,value,output: finished.set())
+    finished.wait()
+  update(corpus['keypad'][0])
+  cases.append(('update/background',lambda: timePerItem(update,corpus['keypad'],3,0.2)))
+  results = {}
+  for r in range(rounds):
+    for name, case in cases:
+      seconds = case()
+      if name not in results or seconds < results[name]:
+        results[name] = seconds
+  evaluator.close()
+  for name, case in cases:
+    print('%-32s %12.3f us' % (name,1e6*results[name]))
+  report = {'format': SUITE_FORMAT, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(), 'mpmath': mpmath.__version__,
+            'machine': platform.machine(), 'results': results}
+  if None != output:
+    with open(output,'w') as stream:
+      json.dump(report,stream,indent=1,sort_keys=True)
+      stream.write('\n')
+  return report
+
+##
+# Compare results of suite() with a baseline and flag those more than
+# REGRESSION slower
+# @param baseline Name of a JSON file from suite()
+# @param current Name of a JSON file from suite(), or None to run it now
+# @return The number of regressions
+##
+def compare(baseline,current=None,threshold=REGRESSION):
+  import json
+  with open(baseline) as stream:
+    old = json.load(stream)
+  if None == current:
+    new = suite()
+  else:
+    with open(current) as stream:
+      new = json.load(stream)
+  if old.get('format') != SUITE_FORMAT or new.get('format') != SUITE_FORMAT:
+    raise ValueError('results are not in format %d' % SUITE_FORMAT)
+  for key in ('python','mpmath','machine'):
+    if old.get(key) != new.get(key):
+      print('note: %s %s in the baseline, %s now' % (key,old.get(key),new.get(key)))
+  regressions = 0
+  print('%-32s %12s %12s %8s' % ('','baseline/us','now/us','ratio'))
+  for name in sorted(set(old['results']) | set(new['results'])):
+    if name not in old['results'] or name not in new['results']:
+      print('%-32s %s' % (name,'only in the baseline' if name in old['results'] else 'new'))
+      continue
+    before = old['results'][name]
+    after = new['results'][name]
+    ratio = after/before if before > 0 else math.inf
+    flag = ''
+    if ratio > 1+threshold:
+      flag = '  REGRESSION'
+      regressions += 1
+    print('%-32s %12.3f %12.3f %8.2f%s' % (name,1e6*before,1e6*after,ratio,flag))
+  print('%d regressions of more than %d%%' % (regressions,round(100*threshold)))
+  return regressions
+
+if __name__ == '__main__':
+  command = sys.argv[1] if len(sys.argv) > 1 else 'scaling'
+  if 'scaling' == command:
+    scaling()
+  elif 'compiled' == command:
+    compiled()
+  elif 'tokenizer' == command:
+    tokenizer()
+  elif 'fast' == command:
+    fast()
+  elif 'format' == command:
+    formatter(int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
+  elif 'cache' == command:
+    cache()
+  elif 'vector' == command:
+    vector()
+  elif 'responsive' == command:
+    responsive()
+  elif 'sessions' == command:
+    sessions()
+  elif 'precisions' == command:
+    precisions()
+  elif 'ladder' == command:
+    ladder()
+  elif 'exact' == command:
+    exact()
+  elif 'guard' == command:
+    guard()
+  elif 'allocations' == command:
+    allocations()
+  elif 'instrumentation' == command:
+    instrumentation()
+  elif 'wire' == command:
+    wire()
+  elif 'incremental' == command:
+    incremental()
+  elif 'speculation' == command:
+    speculation()
+  elif 'suite' == command:
+    suite(sys.argv[2] if len(sys.argv) > 2 else None)
+  elif 'compare' == command and len(sys.argv) > 2:
+    sys.exit(1 if compare(sys.argv[2],sys.argv[3] if len(sys.argv) > 3 else None) > 0 else 0)
+  elif 'cores' == command:
+    cores(maxWorkers=int(sys.argv[2]) if len(sys.argv) > 2 else None)
+  else:
+    print('usage: benchmark.py [scaling | compiled | tokenizer | fast | vector | cache | format [count] | responsive | sessions | precisions | ladder | exact | guard | allocations | instrumentation | wire | incremental | speculation | suite [output.json] | compare baseline.json [current.json] | cores [workers]]')
+    sys.exit(2)
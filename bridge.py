@@ -0,0 +1,117 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Messages between the page and the Python of a frontend. The page sends
+# each key press that needs Python as a JSON object with a request number
+# and the time it was sent, through a QWebChannel in pjscicalc2.py, a
+# script message handler in pjscicalc.py or, failing these, the title.
+# Python answers each with one call of receiveFromPython() in the page,
+# which makes all the changes to the display at once.
+#
+#   message = bridge.decode(text)
+#   reply = bridge.Reply(message)
+#   reply.output('3')
+#   reply.finish()
+#   runScript(reply.script())
+#
+# A finished reply asks the page to tell Python, with a message of kind
+# SHOWN, when the display was next painted, so that a frontend can measure
+# the time from key press to display; Latencies summarises these times.
+#
+# After each key that changes the expression, the page also sends it, as
+# = would, in a message of kind TYPED, so that a frontend can work it out
+# before = is pressed (see background.Speculator) and answer with a
+# preview.
+
+import json
+import statistics
+
+## Kind of a message that carries a key press
+PRESS = 'press'
+## Kind of a message that tells when the answer to a key press was shown
+SHOWN = 'shown'
+## Kind of a message that carries the expression being typed, as = would
+# send it, after each key that changes it
+TYPED = 'typed'
+## Fields of a message and their values when the page leaves them out
+FIELDS = {'kind': PRESS, 'id': None, 'text': '', 'sent': None, 'shown': None, 'transport': 'title'}
+
+##
+# Read a message from the page
+# @param text The JSON string the page sent
+# @return A dictionary with the keys of FIELDS, or None for a string that is
+# not a message, such as the first title of the page
+##
+def decode(text):
+  if not text.startswith('{'):
+    return None
+  try:
+    message = json.loads(text)
+  except ValueError:
+    return None
+  if not isinstance(message,dict):
+    return None
+  return {key: message.get(key,value) for key, value in FIELDS.items()}
+
+class Reply:
+  "Changes to the display in answer to one message, sent as one script"
+  def __init__(self,message,measure=False):
+    """Initialise Reply to a message from decode(); if measure is set, the
+    page reports when a finished reply was shown"""
+    self.fields = {'id': message['id']}
+    self.measure = measure
+  def output(self,html):
+    "Show html in the output panel"
+    self.fields['output'] = html
+  def label(self,html):
+    "Show html in the label of angle mode and memory"
+    self.fields['label'] = html
+  def preview(self,html):
+    "Show html greyed in the output panel as the value of what is being typed"
+    self.fields['preview'] = html
+  def overlay(self,html):
+    "Show html in the debug overlay"
+    self.fields['overlay'] = html
+  def finish(self):
+    "Mark the reply as the last to its message"
+    self.fields['done'] = True
+    if self.measure:
+      self.fields['measure'] = True
+  def empty(self):
+    "Whether the reply changes nothing"
+    return 1 == len(self.fields)
+  def script(self):
+    "The script that makes the changes in the page"
+    return 'receiveFromPython(%s);' % json.dumps(self.fields)
+
+class Latencies:
+  "Times from key press to display reported by the page"
+  def __init__(self):
+    "Initialise Latencies"
+    self.milliseconds = []
+  def add(self,message):
+    "Add the time of a SHOWN message; return it in milliseconds"
+    milliseconds = message['shown'] - message['sent']
+    self.milliseconds.append(milliseconds)
+    return milliseconds
+  def summary(self):
+    "A line with the count, median, 95th percentile and most of the times"
+    if 0 == len(self.milliseconds):
+      return 'no key presses measured'
+    times = sorted(self.milliseconds)
+    return 'key press to display: %d measured, median %.1f ms, p95 %.1f ms, max %.1f ms' % (
+      len(times),statistics.median(times),times[min(len(times)-1,int(0.95*len(times)))],times[-1])
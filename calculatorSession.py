@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The state of one calculator, with its own angle mode, memory, answer and
+# history, for running calculators from Python.
+#
+#   session = calculatorSession.CalculatorSession()
+#   value, output = session.evaluate('#1;+;#2;')
+
+import collections
+import threading
+import PObject
+import incrementalExpression
+import wireFormat
+
+## Number of results a CalculatorSession remembers
+HISTORY_SIZE = 100
+
+class CalculatorSession:
+  "State of one calculator: angle mode, memory, answer and history"
+  def __init__(self,cache=None,historySize=HISTORY_SIZE,precision=PObject.DECIMAL_PRECISION):
+    """Initialise CalculatorSession in degrees, optionally sharing a ResultCache,
+    with arithmetic at a precision as for PObject.context()"""
+    self.lock = threading.RLock()
+    self.scale = PObject.DEGREE_SCALE
+    self.precision = precision
+    self.memory = PObject.context(precision).zero
+    self.answer = self.memory
+    self.entries = collections.deque(maxlen=historySize)
+    self.cache = cache
+    self.incremental = incrementalExpression.IncrementalExpression()
+  def setScale(self,scale):
+    "Use PObject.RADIAN_SCALE or PObject.DEGREE_SCALE for angles"
+    with self.lock:
+      self.scale = scale
+  def setPrecision(self,precision):
+    "Use decimal digits or an mpmath.MPContext for later arithmetic"
+    with self.lock:
+      self.precision = precision
+  def clearMemory(self):
+    "Set the memory to 0 as MCL does"
+    with self.lock:
+      self.memory = PObject.context(self.precision).zero
+  def snapshot(self):
+    "The scale, answer and memory that an expression entered now would use"
+    with self.lock:
+      return self.scale, self.answer, self.memory
+  def commit(self,objectString,value,output):
+    """Record the result of an expression evaluated with snapshot() values: a
+    good result becomes the answer and a leading STO, M+ or M- changes the
+    memory. A value of None, as for a timeout, is an error. Return whether
+    the memory changed."""
+    store = wireFormat.storeToken(objectString)
+    with self.lock:
+      self.entries.append((objectString,value,output))
+      if None == value or output in PObject.ERROR_OUTPUTS:
+        return False
+      self.answer = value
+      if isinstance(store,PObject.Sto):
+        self.memory = value
+      elif isinstance(store,PObject.Mplus):
+        self.memory = PObject.context(self.precision).convert(self.memory) + value
+      elif isinstance(store,PObject.Mminus):
+        self.memory = PObject.context(self.precision).convert(self.memory) - value
+      else:
+        return False
+      return True
+  def evaluate(self,objectString):
+    """Evaluate a string from the calculator title and record its result.
+    Calls on one session are taken one at a time; different sessions run
+    independently. Return the value and formatted string."""
+    with self.lock:
+      scale, answer, memory = self.snapshot()
+      if None != self.cache:
+        value, output = self.cache.evaluate(objectString,scale,answer,memory,self.precision)
+      else:
+        # reuse the parse and values of the start shared with the last string
+        self.incremental.update(objectString)
+        value, output = self.incremental(answer,memory,scale,self.precision)
+      self.commit(objectString,value,output)
+      return value, output
+  def history(self):
+    "The latest expressions with their values and formatted strings, oldest first"
+    with self.lock:
+      return list(self.entries)
+  def label(self):
+    "HTML for the display-extra label: whether memory is in use and the angle mode"
+    with self.lock:
+      if 0 == self.memory:
+        text = '&emsp;'
+      else:
+        text = 'M'
+      text += '&nbsp;'
+      if PObject.RADIAN_SCALE == self.scale:
+        text += 'radians'
+      else:
+        text += 'degrees'
+      return text
@@ -0,0 +1,303 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Keep the evaluations that take longer than a threshold. Each is saved in
+# a directory with its tokens, angle mode, ANS, RCL, precision, time and
+# output, and with a profile of that evaluation. Only the latest CAPACITY
+# cases are kept: case n is written to slot n % CAPACITY.
+#
+#   flight.install('slow',threshold=0.2)
+#   ./flight.py list slow
+#   ./flight.py replay slow [case ...]
+#   ./flight.py profile slow case
+#
+# The profile is sampled while the evaluation runs: a thread of its own
+# reads the stack of each thread in an evaluation every INTERVAL seconds.
+# The evaluation is not run again, so the profile covers the slow call
+# itself, with cold caches, and costs no second evaluation. It is saved in
+# the format of cProfile, so pstats reads it; its call counts are numbers
+# of samples. A fast evaluation costs two readings of the clock and, with
+# profiles on, registering with the sampler.
+
+import os
+import sys
+import json
+import time
+import marshal
+import pstats
+import argparse
+import threading
+import PObject
+
+## Seconds an evaluation may take before it is kept
+THRESHOLD = 0.2
+## Most cases kept in a directory
+CAPACITY = 100
+## Slow-down of a replayed case over its recorded time that replay flags
+REGRESSION = 0.25
+## Seconds between samples of the stacks of running evaluations
+INTERVAL = 0.001
+
+class Sampler:
+  "Sample the stacks of threads while they evaluate, from a thread of its own"
+  def __init__(self,interval=INTERVAL):
+    "Initialise Sampler to take a sample every interval seconds"
+    self.interval = interval
+    self.lock = threading.Lock()
+    self.pid = None
+  def begin(self):
+    """Start sampling the calling thread below the frame of the caller.
+    Return what end() needs, or None if the thread is already sampled."""
+    with self.lock:
+      if os.getpid() != self.pid:
+        # the first call, or the first in a forked child, where the
+        # sampling thread did not survive the fork
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        self.running = {}
+        threading.Thread(target=self.run,name='flight sampler',daemon=True).start()
+      condition = self.condition
+    ident = threading.get_ident()
+    with condition:
+      if ident in self.running:
+        return None
+      # the samples of each stack and the seconds they stand for
+      samples = {'base': sys._getframe(1), 'last': time.perf_counter(), 'stacks': {}}
+      self.running[ident] = samples
+      condition.notify()
+    return samples
+  def end(self,samples):
+    "Stop sampling the calling thread; return the samples and seconds of each stack"
+    with self.condition:
+      del self.running[threading.get_ident()]
+    return samples['stacks']
+  def run(self):
+    "Take samples until the process ends"
+    condition = self.condition
+    while True:
+      with condition:
+        while 0 == len(self.running):
+          condition.wait()
+        now = time.perf_counter()
+        frames = sys._current_frames()
+        for ident, samples in self.running.items():
+          frame = frames.get(ident)
+          stack = []
+          while None != frame and frame is not samples['base']:
+            code = frame.f_code
+            stack.append((code.co_filename,code.co_firstlineno,code.co_name))
+            frame = frame.f_back
+          stack = tuple(reversed(stack))
+          count, seconds = samples['stacks'].get(stack,(0,0.0))
+          samples['stacks'][stack] = (count+1,seconds+now-samples['last'])
+          samples['last'] = now
+      time.sleep(self.interval)
+
+##
+# Turn sampled stacks into the statistics that cProfile saves, so pstats
+# and the tools that read .prof files can show them. Calls are counted
+# as samples.
+# @param stacks Maps each stack of (file, line, function), outermost
+# first, to its number of samples and the seconds they stand for
+# @return A dictionary for marshal.dump()
+##
+def profileStats(stacks):
+  stats = {}
+  callers = {}
+  def add(table,key,count,seconds,inside):
+    old = table.get(key,(0,0,0.0,0.0))
+    table[key] = (old[0]+count,old[1]+count,old[2]+inside,old[3]+seconds)
+  for stack, (count, seconds) in stacks.items():
+    seen = set()
+    for i, function in enumerate(stack):
+      inside = seconds if i == len(stack)-1 else 0.0
+      # recursion counts once towards the cumulative time
+      add(stats,function,count,0.0 if function in seen else seconds,inside)
+      seen.add(function)
+      if i > 0:
+        add(callers.setdefault(function,{}),stack[i-1],count,seconds,inside)
+  return {function: (cc,nc,tt,ct,callers.get(function,{}))
+          for function, (cc,nc,tt,ct) in stats.items()}
+
+class FlightRecorder:
+  "Keep slow evaluations and their profiles in a bounded set of files"
+  def __init__(self,directory,threshold=THRESHOLD,capacity=CAPACITY,profile=True):
+    """Initialise FlightRecorder to keep in directory the latest capacity
+    evaluations over threshold seconds, with a profile of each if profile
+    is set"""
+    self.directory = directory
+    self.threshold = threshold
+    self.capacity = capacity
+    self.profile = profile
+    self.sampler = Sampler()
+    self.lock = threading.Lock()
+    os.makedirs(directory,exist_ok=True)
+    cases = readCases(directory)
+    self.number = 1 + max((case['case'] for case in cases),default=0)
+  def observe(self,call,describe):
+    "Run call() and keep it if it is slow, with a profile sampled as it ran; return its result"
+    samples = self.sampler.begin() if self.profile else None
+    start = time.perf_counter()
+    try:
+      result = call()
+    finally:
+      seconds = time.perf_counter() - start
+      stacks = None if None == samples else self.sampler.end(samples)
+    if seconds >= self.threshold:
+      try:
+        self.capture(describe(),seconds,result,stacks)
+      except OSError as error:
+        sys.stderr.write('flight recorder: %s\n' % error)
+    return result
+  def capture(self,case,seconds,result,stacks=None):
+    "Write a case and the profile from its sampled stacks, if any, to the next slot"
+    with self.lock:
+      number = self.number
+      self.number += 1
+    base = os.path.join(self.directory,'case-%04d' % (number % self.capacity))
+    case.update({'case': number, 'seconds': seconds, 'output': result[1], 'created': time.time()})
+    if None != stacks:
+      with open(base+'.prof.tmp','wb') as stream:
+        marshal.dump(profileStats(stacks),stream)
+      os.replace(base+'.prof.tmp',base+'.prof')
+    elif os.path.exists(base+'.prof'):
+      os.remove(base+'.prof')
+    with open(base+'.json.tmp','w') as stream:
+      json.dump(case,stream,indent=1,sort_keys=True)
+    os.replace(base+'.json.tmp',base+'.json')
+
+##
+# Keep slow evaluations in this process from now on
+# @param directory Where to keep them
+# @return The FlightRecorder, which is also PObject.flightRecorder
+##
+def install(directory,threshold=THRESHOLD,capacity=CAPACITY,profile=True):
+  PObject.flightRecorder = FlightRecorder(directory,threshold,capacity,profile)
+  return PObject.flightRecorder
+
+##
+# Stop keeping slow evaluations
+##
+def uninstall():
+  PObject.flightRecorder = None
+
+##
+# Read the cases in a directory
+# @return A list of dictionaries, oldest first; each has the name of its
+# profile, or None, under 'profile'
+##
+def readCases(directory):
+  cases = []
+  for name in os.listdir(directory):
+    if not (name.startswith('case-') and name.endswith('.json')):
+      continue
+    path = os.path.join(directory,name)
+    try:
+      with open(path) as stream:
+        case = json.load(stream)
+    except (OSError,ValueError):
+      continue
+    profile = path[:-len('.json')]+'.prof'
+    case['profile'] = profile if os.path.exists(profile) else None
+    cases.append(case)
+  cases.sort(key=lambda case: case['case'])
+  return cases
+
+##
+# Evaluate a case as it was recorded
+# @return The value and formatted string
+##
+def evaluateCase(case):
+  current = PObject.context(case['precision'])
+  answer = None if None == case['answer'] else current.mpf(case['answer'])
+  memory = None if None == case['memory'] else current.mpf(case['memory'])
+  scale = PObject.RADIAN_SCALE if case['radians'] else PObject.DEGREE_SCALE
+  return PObject.compile(case['tokens']).result(answer,memory,scale,case['precision'])
+
+##
+# Print the cases in a directory
+##
+def listCases(directory):
+  cases = readCases(directory)
+  print('%6s %10s %6s %-8s %-24s %s' % ('case','seconds','digits','angles','output','tokens'))
+  for case in cases:
+    print('%6d %10.3f %6d %-8s %-24s %s' % (case['case'],case['seconds'],case['precision'],
+                                            'radians' if case['radians'] else 'degrees',
+                                            case['output'],case['tokens']))
+  return 0
+
+##
+# Evaluate cases again and compare their output and time with the record
+# @param numbers Numbers of the cases, or empty for all
+# @return The number of cases whose output changed or that are more than
+# REGRESSION slower
+##
+def replay(directory,numbers=(),repeat=3,threshold=REGRESSION):
+  failures = 0
+  for case in readCases(directory):
+    if 0 != len(numbers) and case['case'] not in numbers:
+      continue
+    best = None
+    for i in range(repeat):
+      start = time.perf_counter()
+      value, output = evaluateCase(case)
+      seconds = time.perf_counter() - start
+      best = seconds if None == best else min(best,seconds)
+    flag = ''
+    if output != case['output']:
+      flag = '  OUTPUT WAS '+case['output']
+      failures += 1
+    elif best > case['seconds']*(1+threshold):
+      flag = '  SLOWER'
+      failures += 1
+    print('%6d %10.3f %10.3f %-24s %s%s' % (case['case'],case['seconds'],best,output,case['tokens'],flag))
+  return failures
+
+##
+# Print the profile of a case
+##
+def showProfile(directory,number,lines=25):
+  for case in readCases(directory):
+    if number == case['case']:
+      if None == case['profile']:
+        sys.stderr.write('case %d has no profile\n' % number)
+        return 1
+      print('case %d: %s (calls are samples)' % (number,case['tokens']))
+      pstats.Stats(case['profile']).sort_stats('cumulative').print_stats(lines)
+      return 0
+  sys.stderr.write('no case %d\n' % number)
+  return 1
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='List, replay and profile slow evaluations that were kept.')
+  parser.add_argument('command',choices=('list','replay','profile'))
+  parser.add_argument('directory')
+  parser.add_argument('cases',nargs='*',type=int,help='case numbers (default: all; one for profile)')
+  parser.add_argument('-r','--repeat',type=int,default=3,help='evaluations of each case in replay (default: 3)')
+  args = parser.parse_args(argv)
+  if not os.path.isdir(args.directory):
+    parser.error('no directory %s' % args.directory)
+  if 'list' == args.command:
+    return listCases(args.directory)
+  if 'replay' == args.command:
+    return 1 if replay(args.directory,args.cases,max(args.repeat,1)) > 0 else 0
+  if 1 != len(args.cases):
+    parser.error('profile needs one case number')
+  return showProfile(args.directory,args.cases[0])
+
+if __name__ == '__main__':
+  sys.exit(main())
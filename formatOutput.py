@@ -119,21 +119,308 @@ def preformat(double, characters):
 
 
 ##
-# Format a float
+# The absolute value of a number. An mpf is not rounded, since it may
+# belong to an mpmath context with more precision than the global one.
+##
+def absolute(double):
+    if hasattr(double, '_mpf_'):
+        return double.context.make_mpf(mpmath.libmp.mpf_abs(double._mpf_))
+    return mpmath.fabs(double)
+
+
+##
+# Format a float by calling mpmath.nstr() until the result fits. This is
+# the reference for format(), which gives the same result faster.
 # @param double The float
 # @param chacters The maximum number of characters
 ##
-def format(double, characters):
-    d_abs = mpmath.fabs(double)
+def format_nstr(double, characters):
+    d_abs = absolute(double)
     if d_abs == double:
         sign = 1
     else:
         sign = -1
     result = preformat(d_abs, characters)
-    ## May have to replace - sign
+    return put_sign(result, sign)
+
+
+##
+# Replace the - of an exponent by &minus; and add a sign
+##
+def put_sign(result, sign):
     result_split = result.split('-')
     if len(result_split) > 1:
         result = result_split[0] + '&minus;' + result_split[1]
     if -1 == sign:
         result = '&minus;' + result
     return result
+
+
+## Number of digits that mpmath.nstr() works out beyond those it shows:
+# mpmath 1.4 rounds ties to even using ten, older versions use three.
+if hasattr(mpmath.libmp.libmpf, 'round_digits'):
+    NSTR_GUARD = 10
+else:
+    NSTR_GUARD = 3
+
+
+##
+# Whether to round up a string of significant digits to n digits
+# @param digits The digits of an exact decimal, without leading zeros
+# @param n The number of digits wanted
+# @return True to round up, False to round down or None if the digits
+# lie exactly halfway
+##
+def round_decimal(digits, n):
+    if len(digits) <= n:
+        return False
+    if '5' == digits[n] and '' == digits[n + 1:].rstrip('0'):
+        return None
+    return digits[n] >= '5'
+
+
+##
+# Whether mpmath.nstr() rounds up to n digits a number whose digits are
+# given truncated toward zero by mpmath.libmp.to_digits_exp(). nstr()
+# works out its own NSTR_GUARD extra digits, which can be one unit in the
+# last place away from these. That only matters next to a tie, so the
+# result is None there.
+# @param digits The digits, at least n + NSTR_GUARD of them
+# @param n The number of digits wanted
+# @return As round_decimal()
+##
+def round_floor(digits, n):
+    guard = digits[n + 1:n + NSTR_GUARD]
+    if '5' == digits[n] and '' == guard[:-1].strip('0') and guard[-1:] in '01':
+        return None
+    if '4' == digits[n] and '' == guard.strip('9'):
+        return None
+    return digits[n] >= '5'
+
+
+##
+# Shape of digits rounded to n digits
+# @param direction round_decimal() or round_floor()
+# @return The number of significant digits left once trailing zeros are
+# dropped and the exponent, or None if direction is uncertain
+##
+def rounded_shape(digits, exponent, n, direction):
+    up = direction(digits, n)
+    if up is None:
+        return None
+    if up:
+        kept = digits[:n].rstrip('9')
+        if '' == kept:
+            return 1, exponent + 1
+        return len(kept), exponent
+    return len(digits[:n].rstrip('0')), exponent
+
+
+##
+# Lay out digits as mpmath.nstr() would
+# @param digits The significant digits of a positive number
+# @param exponent The power of ten of the first digit
+# @param n The number of significant digits as in nstr()
+# @param min_fixed As in nstr(); None for the default
+# @param max_fixed As in nstr(); None for the default
+# @param direction round_decimal() or round_floor(), which must not be
+# uncertain for n
+##
+def digits_nstr(digits, exponent, n, min_fixed, max_fixed, direction):
+    if min_fixed is None:
+        min_fixed = min(-(n // 3), -5)
+    if max_fixed is None:
+        max_fixed = n
+    if direction(digits, n):
+        rounded = str(int(digits[:n]) + 1)
+        if len(rounded) > n:
+            rounded = rounded[:n]
+            exponent += 1
+        digits = rounded
+    else:
+        digits = digits[:n] + '0' * (n - len(digits))
+    if min_fixed < exponent < max_fixed:
+        if exponent < 0:
+            digits = '0' * (-exponent) + digits
+            split = 1
+        else:
+            split = exponent + 1
+            if split > n:
+                digits += '0' * (split - n)
+        exponent = 0
+    else:
+        split = 1
+    string = (digits[:split] + '.' + digits[split:]).rstrip('0')
+    if '.' == string[-1]:
+        string += '0'
+    if 0 == exponent:
+        return string
+    return string + 'e' + ('%+d' % exponent)
+
+
+##
+# Like shrink_sci() for digits. The length of each layout is worked out
+# from the shape of the rounded digits and only the one that fits is
+# made into a string.
+# @param nstr Function of digits, min_fixed and max_fixed like
+# mpmath.nstr(), used where direction is uncertain; it may return None
+# @return The string, 'Error' or None if nstr gave None
+##
+def shrink_sci_digits(digits, exponent, c, direction, nstr):
+    l = c
+    while l >= 1:
+        shape = rounded_shape(digits, exponent, l, direction)
+        if shape is None:
+            sci = nstr(l, 0, 0)
+            if sci is None or len(sci) <= c:
+                return sci
+        else:
+            m, e = shape
+            length = 2 + max(m - 1, 1)
+            if 0 != e:
+                length += 1 + len('%+d' % e)
+            if length <= c:
+                return digits_nstr(digits, exponent, l, 0, 0, direction)
+        l -= 1
+    if rounded_shape(digits, exponent, 1, direction) is None:
+        sci = nstr(1, 0, 0)
+        if sci is None:
+            return None
+    else:
+        sci = digits_nstr(digits, exponent, 1, 0, 0, direction)
+    sci = sci.split('e')
+    sci = strip_point_zero(sci[0]) + 'e' + sci[1]
+    if len(sci) <= c:
+        return sci
+    return 'Error'
+
+
+##
+# Like shrink_dec() for digits, working out lengths as shrink_sci_digits()
+# does
+# @return The string, 'Error' or None if nstr gave None
+##
+def shrink_dec_digits(digits, exponent, c, direction, nstr):
+    l = c
+    while True:
+        shape = None
+        if l >= 1:
+            shape = rounded_shape(digits, exponent, l, direction)
+        if shape is None:
+            dec = nstr(l, None, None)
+            if dec is None:
+                return None
+            if 'e' in dec:
+                return 'Error'
+            if len(dec) <= c:
+                return dec
+            dec = strip_point_zero(dec)
+            if len(dec) <= c:
+                return dec
+        else:
+            m, e = shape
+            if not min(-(l // 3), -5) < e < l:
+                return 'Error'
+            if e < 0:
+                length = 1 - e + m
+            else:
+                length = e + 2 + max(m - e - 1, 1)
+            if length <= c:
+                return digits_nstr(digits, exponent, l, None, None, direction)
+            if e >= 0 and m <= e + 1 and length - 2 <= c:
+                return strip_point_zero(digits_nstr(digits, exponent, l, None, None, direction))
+        l -= 1
+
+
+##
+# Like preformat() for digits
+# @param small Whether the number is less than 1
+# @return The string or None if nstr gave None
+##
+def preformat_digits(digits, exponent, small, characters, direction, nstr):
+    if not small:
+        result = shrink_dec_digits(digits, exponent, characters, direction, nstr)
+        if 'Error' == result:
+            return shrink_sci_digits(digits, exponent, characters, direction, nstr)
+        return result
+    dec = shrink_dec_digits(digits, exponent, characters, direction, nstr)
+    if dec is None:
+        return None
+    sci = shrink_sci_digits(digits, exponent, characters, direction, nstr)
+    if sci is None:
+        return None
+    if 'Error' == dec:
+        return sci
+    elif 'Error' == sci:
+        return dec
+    elif get_sf(sci) > get_sf(dec):
+        return sci
+    else:
+        return dec
+
+
+##
+# Format a float
+# The digits are worked out once, to as many places as any layout can
+# show, and the layout that format_nstr() would choose is found from them;
+# mpmath.nstr() is only called where its own rounding could differ.
+# @param double The float
+# @param chacters The maximum number of characters
+##
+def format(double, characters):
+    if hasattr(double, '_mpf_') and double._mpf_[1]:
+        s = double._mpf_
+        sign = -1 if s[0] else 1
+        s = (0,) + s[1:]
+        d_abs = None
+    else:
+        d_abs = absolute(double)
+        if d_abs == double:
+            sign = 1
+        else:
+            sign = -1
+        s = d_abs._mpf_
+    if not s[1] or abs(s[2] + s[3]) > 3000:
+        # zero, infinity, nan or so large that to_digits_exp() rounds
+        if d_abs is None:
+            d_abs = mpmath.mp.make_mpf(s)
+        return put_sign(preformat(d_abs, characters), sign)
+    digits, exponent = mpmath.libmp.to_digits_exp(s, characters + NSTR_GUARD)[1:]
+    def nstr(n, min_fixed, max_fixed):
+        return mpmath.libmp.to_str(s, n, min_fixed=min_fixed, max_fixed=max_fixed)
+    # the number is less than 1 if and only if its binary exponent is not positive
+    result = preformat_digits(digits, exponent, s[2] + s[3] <= 0, characters, round_floor, nstr)
+    return put_sign(result, sign)
+
+
+##
+# Format a decimal literal as format() formats the number it stands for,
+# without mpmath. This is for results that are known to a few digits,
+# such as floats.
+# @param literal A nonzero finite number such as '-1.25e-3'
+# @param characters The maximum number of characters
+# @return The formatted string or None if format() might round the
+# number differently
+##
+def format_decimal(literal, characters):
+    sign = 1
+    if '-' == literal[0]:
+        sign = -1
+        literal = literal[1:]
+    mantissa, exponent = (literal.split('e') + ['0'])[:2]
+    exponent = int(exponent)
+    point = mantissa.find('.')
+    if -1 == point:
+        point = len(mantissa)
+    digits = mantissa.replace('.', '')
+    stripped = digits.lstrip('0')
+    if '' == stripped:
+        return None
+    exponent += point - 1 - (len(digits) - len(stripped))
+    digits = stripped.rstrip('0')
+    def nstr(n, min_fixed, max_fixed):
+        return None
+    result = preformat_digits(digits, exponent, exponent < 0, characters, round_decimal, nstr)
+    if result is None:
+        return None
+    return put_sign(result, sign)
@@ -0,0 +1,438 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The latest expression of a session kept parsed token by token, so that
+# the next one is only parsed again from the first token where they
+# differ and only the part of the calculation that depends on the tokens
+# after that is run again.
+#
+#   expression = incrementalExpression.IncrementalExpression()
+#   expression.update('#1;+;#2;')
+#   value, output = expression(answer,memory,PObject.DEGREE_SCALE)
+
+import bisect
+import time
+import PObject
+import formatOutput
+import wireFormat
+
+##
+# Length of the longest common start of two strings
+##
+def commonLength(a,b):
+  if b.startswith(a):
+    return len(a)
+  if a.startswith(b):
+    return len(b)
+  low = 0
+  high = min(len(a),len(b))
+  while low < high:
+    middle = (low+high+1)//2
+    if a[:middle] == b[:middle]:
+      low = middle
+    else:
+      high = middle-1
+  return low
+
+class Instruction:
+  """Instruction of a program from IncrementalExpression, linked to the one
+  before it, with the value stack that running the program to it left"""
+  __slots__ = ('code','obj','previous','answer','memory','key','stack')
+  def __init__(self,code,obj,previous):
+    "Initialise Instruction"
+    self.code = code
+    self.obj = obj
+    self.previous = previous
+    # whether the values up to here depend on ANS or RCL
+    self.answer = PObject.ANSWER == code or (None != previous and previous.answer)
+    self.memory = PObject.MEMORY == code or (None != previous and previous.memory)
+    self.key = None
+    self.stack = None
+
+##
+# Add an instruction for an operator to an incremental program
+# @return The new last instruction
+##
+def appendInstruction(program,obj):
+  if isinstance(obj,PObject.TrigFunction):
+    return Instruction(PObject.TRIG,obj,program)
+  elif isinstance(obj,PObject.RFunction):
+    return Instruction(PObject.UNARY,obj,program)
+  return Instruction(PObject.BINARY,obj,program)
+
+##
+# PObject.pushOperator() for an incremental program and an operator stack of
+# linked pairs
+# @return The program and the operator stack
+##
+def pushInstruction(program,operators,precedence,obj):
+  while None != operators:
+    p = operators[0][0]
+    if None == p or p < precedence:
+      break
+    program = appendInstruction(program,operators[0][1])
+    operators = operators[1]
+  return program, ((precedence,obj),operators)
+
+##
+# Run one instruction of an incremental program as PObject.execute() would
+# run it in the program from PObject.planExact(): an exact literal is only converted from
+# its text when the operator that takes it turns out not to be exact.
+# @param stack Linked triples of value, whether it may be exact and the
+# Literal it came from, or a PError
+# @return The stack after the instruction or a PError
+##
+def executeInstruction(instruction,stack,scale,answer,memory,current,recorder=None):
+  code = instruction.code
+  obj = instruction.obj
+  if PObject.PUSH == code:
+    x = obj.exact
+    if x is None:
+      return ((current.value(obj),False,None),stack)
+    return ((x,True,obj),stack)
+  elif PObject.ANSWER == code or PObject.MEMORY == code:
+    if PObject.ANSWER == code:
+      value = obj.value if answer is None else answer
+    else:
+      value = obj.value if memory is None else memory
+    x = PObject.exactValue(value)
+    return ((value if value is None else current.convert(value) if x is None else x,True,None),stack)
+  elif PObject.UNARY == code:
+    (x, exact, literal), stack = stack
+    exact = exact and type(obj).xfn is not PObject.PObject.xfn
+    if None != recorder:
+      obj = recorder.timed(obj)
+    if not exact and None != literal:
+      x = current.value(literal)
+    if type(x) in PObject.EXACT_TYPES:
+      d = obj.xfn(x)
+      if d is None:
+        d = obj.vfn(current.rational(x),current)
+    else:
+      d = obj.vfn(x,current)
+  elif PObject.TRIG == code:
+    (x, exact, literal), stack = stack
+    exact = False
+    if None != recorder:
+      obj = recorder.timed(obj)
+    if None != literal:
+      x = current.value(literal)
+    elif type(x) in PObject.EXACT_TYPES:
+      x = current.rational(x)
+    d = obj.vfn(x,scale,current)
+  else:
+    (r, rexact, rliteral), ((l, lexact, lliteral), stack) = stack
+    exact = lexact and rexact and type(obj).xfn is not PObject.PObject.xfn
+    if None != recorder:
+      obj = recorder.timed(obj)
+    if not exact:
+      if None != lliteral:
+        l = current.value(lliteral)
+      if None != rliteral:
+        r = current.value(rliteral)
+    if type(l) in PObject.EXACT_TYPES:
+      if type(r) in PObject.EXACT_TYPES:
+        d = obj.xfn(l,r)
+        if d is None:
+          d = obj.vfn(current.rational(l),current.rational(r),current)
+      else:
+        d = obj.vfn(current.rational(l),r,current)
+    elif type(r) in PObject.EXACT_TYPES:
+      d = obj.vfn(l,current.rational(r),current)
+    else:
+      d = obj.vfn(l,r,current)
+  if isinstance(d,PObject.PError):
+    return d
+  return ((d,exact,None),stack)
+
+## Parse state of IncrementalExpression before any token: the last
+# instruction, the operator stack as linked pairs, the numerals waiting to
+# be converted, exponent, negative, expectValue and tight as in
+# PObject.parse(), the open groups as linked pairs of the index of the (
+# and whether the group has anything in it, whether a ) had no ( and the
+# error, if any
+INITIAL_PARSE = (None,None,'',False,False,True,False,None,False,None)
+
+class IncrementalExpression:
+  """The latest expression of a session, kept parsed so that the next one
+  is only parsed from the first token where they differ"""
+  def __init__(self):
+    """Initialise IncrementalExpression with no tokens. The parse state after
+    each token is kept, and each instruction keeps the values that running
+    the program up to it left, so a token typed or deleted at the end costs
+    about one token of work and a closed group is not worked out again."""
+    self.tokens = ''
+    self.store = None
+    self.compact = False
+    self.body = ''    # the string after any store token
+    self.ends = []    # where each token ends in body
+    self.states = [INITIAL_PARSE] # before each token and after the last
+  def objects(self,key):
+    "The PObjects of a token of the format of the current string"
+    if self.compact:
+      return wireFormat.decodeCompact(wireFormat.WIRE_HEADER+key,None,None)
+    return PObject.convertStringToPObjectList(key,None,None)
+  def update(self,objectString):
+    """Parse a string from the calculator title, reusing the parse of the
+    tokens it shares at the start with the previous one"""
+    recorder = PObject.metrics
+    if None == recorder:
+      self.reparse(objectString)
+      return
+    # tokens are converted as they are parsed, so this is one stage
+    start = time.perf_counter()
+    self.reparse(objectString)
+    recorder.evaluation(len(self.ends))
+    recorder.stage('parse',start)
+  def reparse(self,objectString):
+    "Parse like update() without metrics"
+    compact = objectString.startswith(wireFormat.WIRE_PREFIX)
+    self.tokens = objectString
+    self.store = None
+    if compact and not objectString.startswith(wireFormat.WIRE_HEADER):
+      # another version, which is a TokenError
+      self.body = None
+      del self.ends[:]
+      del self.states[1:]
+      self.states.append(INITIAL_PARSE[:-1]+(PObject.convertStringToPObjectList(objectString,None,None)[0],))
+      return
+    if compact:
+      offset = len(wireFormat.WIRE_HEADER)
+      if wireFormat.WIRE_TOKENS.get(objectString[offset:offset+1]) in PObject.STORE_TOKENS:
+        self.store = wireFormat.decodeCompact(objectString[:offset+1],None,None)[0]
+        offset += 1
+    else:
+      offset = objectString.find(';')+1
+      if objectString[:offset-1] in PObject.STORE_TOKENS:
+        self.store = PObject.convertStringToPObjectList(objectString[:offset],None,None)[0]
+      else:
+        offset = 0
+    body = objectString[offset:]
+    if compact != self.compact or None == self.body:
+      common = 0
+    else:
+      common = commonLength(self.body,body)
+    self.compact = compact
+    self.body = body
+    # a number in the compact format may go on past common
+    same = (bisect.bisect_left if compact else bisect.bisect_right)(self.ends,common)
+    del self.ends[same:]
+    del self.states[same+1:]
+    state = self.states[same]
+    start = self.ends[-1] if 0 != same else 0
+    if compact:
+      pieces = ((m.group(),m.end()) for m in wireFormat.WIRE_PIECES.finditer(body,start))
+    else:
+      pieces = self.split(body,start)
+    for key, end in pieces:
+      index = len(self.ends)
+      for obj in self.objects(key):
+        state = self.feed(state,index,obj)
+      self.ends.append(end)
+      self.states.append(state)
+  def split(self,body,start):
+    "The tokens of a string of the textual format from start, with where each ends"
+    for key in body[start:].split(';'):
+      start += len(key)+1
+      if '' != key:
+        yield key, start
+  def feed(self,state,index,obj):
+    """The parse state after one more PObject, from the index-th token. This
+    takes tokens as PObject.parse() does, except that an empty group is undone when
+    it closes rather than found first, since the tokens after it are not
+    known yet."""
+    (program, operators, numeral, exponent, negative, expectValue, tight,
+     groups, broken, error) = state
+    if isinstance(obj,PObject.LParen):
+      groups = ((index,False),groups)
+    elif isinstance(obj,PObject.RParen):
+      if None == groups:
+        # the parentheses do not match
+        return (program,operators,numeral,exponent,negative,expectValue,tight,groups,True,error)
+      (start, full), groups = groups
+      if not full:
+        # parse() skips empty groups
+        return self.states[start]
+      if None != groups and not groups[0][1]:
+        groups = ((groups[0][0],True),groups[1])
+    elif None != groups and not groups[0][1]:
+      groups = ((groups[0][0],True),groups[1])
+    if broken or None != error:
+      return (program,operators,numeral,exponent,negative,expectValue,tight,groups,broken,error)
+    if exponent:
+      if isinstance(obj,PObject.Add) or isinstance(obj,PObject.Subtract):
+        if isinstance(obj,PObject.Subtract):
+          negative = not negative
+        return (program,operators,numeral,exponent,negative,expectValue,tight,groups,broken,error)
+      exponent = False
+      if negative:
+        numeral += PObject.minusNumeral.name
+    if isinstance(obj,PObject.Numeral):
+      return (program,operators,numeral+obj.name,exponent,negative,expectValue,tight,groups,broken,error)
+    if isinstance(obj,PObject.E):
+      return (program,operators,numeral+PObject.eNumeral.name,True,False,expectValue,tight,groups,broken,error)
+    if '' != numeral:
+      if not expectValue:
+        program, operators = pushInstruction(program,operators,PObject.PRODUCT_PRECEDENCE,PObject.productObject)
+      try:
+        program = Instruction(PObject.PUSH,PObject.Literal(numeral),program)
+      except Exception:
+        # a number such as 1.2.3
+        return (program,operators,numeral,exponent,negative,expectValue,tight,groups,broken,PObject.parError)
+      numeral = ''
+      expectValue = False
+      tight = False
+    if isinstance(obj,PObject.AFunction) and expectValue:
+      obj = PObject.uplusObject if isinstance(obj,PObject.Add) else PObject.uminusObject
+    if isinstance(obj,PObject.Container) or isinstance(obj,PObject.LParen) or isinstance(obj,PObject.RFunction):
+      if not expectValue:
+        program, operators = pushInstruction(program,operators,PObject.PRODUCT_PRECEDENCE,PObject.productObject)
+        tight = False
+      if isinstance(obj,PObject.Ans):
+        program = Instruction(PObject.ANSWER,obj,program)
+        expectValue = tight = False
+      elif isinstance(obj,PObject.Rcl):
+        program = Instruction(PObject.MEMORY,obj,program)
+        expectValue = tight = False
+      elif isinstance(obj,PObject.Container):
+        program = Instruction(PObject.PUSH,obj,program)
+        expectValue = tight = False
+      elif isinstance(obj,PObject.LParen):
+        operators = ((None,obj),operators)
+        expectValue = True
+        tight = False
+      elif tight:
+        operators = ((PObject.TIGHT_R_PRECEDENCE,obj),operators)
+        expectValue = True
+      else:
+        operators = ((PObject.R_PRECEDENCE,obj),operators)
+        expectValue = True
+      return (program,operators,numeral,exponent,negative,expectValue,tight,groups,broken,error)
+    if isinstance(obj,PObject.PError):
+      error = obj
+    elif expectValue:
+      error = PObject.parError
+    elif isinstance(obj,PObject.LFunction):
+      program = Instruction(PObject.UNARY,obj,program)
+    elif isinstance(obj,PObject.RParen):
+      while not isinstance(operators[0][1],PObject.LParen):
+        program = appendInstruction(program,operators[0][1])
+        operators = operators[1]
+      operators = operators[1]
+    elif isinstance(obj,PObject.DFunction):
+      program, operators = pushInstruction(program,operators,PObject.D_PRECEDENCE,obj)
+      expectValue = True
+      tight = True
+      return (program,operators,numeral,exponent,negative,expectValue,tight,groups,broken,error)
+    elif isinstance(obj,PObject.MFunction):
+      program, operators = pushInstruction(program,operators,PObject.M_PRECEDENCE,obj)
+      expectValue = True
+    elif isinstance(obj,PObject.AFunction):
+      program, operators = pushInstruction(program,operators,PObject.A_PRECEDENCE,obj)
+      expectValue = True
+    else:
+      error = PObject.parError
+    return (program,operators,numeral,exponent,negative,expectValue,False,groups,broken,error)
+  def program(self):
+    """The last instruction of the program of the current string, after the
+    operators that are still waiting, or a PError as from PObject.parse()"""
+    (program, operators, numeral, exponent, negative, expectValue, tight,
+     groups, broken, error) = self.states[-1]
+    if broken or None != groups:
+      return PObject.parError
+    if None != error:
+      return error
+    if exponent:
+      return PObject.parError
+    if '' != numeral:
+      if not expectValue:
+        program, operators = pushInstruction(program,operators,PObject.PRODUCT_PRECEDENCE,PObject.productObject)
+      try:
+        program = Instruction(PObject.PUSH,PObject.Literal(numeral),program)
+      except Exception:
+        return PObject.parError
+      expectValue = False
+    if expectValue:
+      return PObject.parError
+    while None != operators:
+      program = appendInstruction(program,operators[0][1])
+      operators = operators[1]
+    return program
+  def complete(self):
+    "Whether the current string parses, so that it may have a value"
+    return not isinstance(self.program(),PObject.PError)
+  def value(self,answer,memory,scale,precision=PObject.DECIMAL_PRECISION):
+    "Evaluate like PObject.Expression.value(), running only instructions not run before with these values"
+    d = self.outcome(answer,memory,scale,precision)
+    return 'Error' if isinstance(d,PObject.PError) else d
+  def outcome(self,answer,memory,scale,precision=PObject.DECIMAL_PRECISION):
+    "Evaluate like value() but give the PError that stopped the evaluation rather than 'Error'"
+    program = self.program()
+    if isinstance(program,PObject.PError):
+      return program
+    current = PObject.context(precision)
+    pending = []
+    instruction = program
+    while None != instruction:
+      key = (scale,current,answer if instruction.answer else None,memory if instruction.memory else None)
+      if key == instruction.key:
+        break
+      pending.append((instruction,key))
+      instruction = instruction.previous
+    stack = None if None == instruction else instruction.stack
+    recorder = PObject.metrics
+    if None != recorder:
+      start = time.perf_counter()
+    try:
+      for instruction, key in reversed(pending):
+        if not isinstance(stack,PObject.PError):
+          stack = executeInstruction(instruction,stack,scale,answer,memory,current,recorder)
+        instruction.key = key
+        instruction.stack = stack
+    except:
+      return PObject.evaluationError
+    finally:
+      if None != recorder:
+        recorder.stage('execute',start)
+    if isinstance(stack,PObject.PError):
+      return stack
+    d = stack[0][0]
+    if type(d) in PObject.EXACT_TYPES:
+      d = current.rational(d)
+    return d
+  def __call__(self,answer,memory,scale,precision=PObject.DECIMAL_PRECISION):
+    "Evaluate to a double and its formatted string like PObject.Expression.__call__()"
+    flight = PObject.flightRecorder
+    if None == flight:
+      return self.result(answer,memory,scale,precision)
+    return flight.observe(lambda: self.result(answer,memory,scale,precision),
+                          lambda: PObject.describeEvaluation(self.tokens,scale,answer,memory,precision))
+  def result(self,answer,memory,scale,precision=PObject.DECIMAL_PRECISION):
+    "Evaluate like __call__() without the flight recorder"
+    value = self.outcome(answer,memory,scale,precision)
+    if isinstance(value,PObject.PError):
+      return PObject.failure(value)
+    recorder = PObject.metrics
+    if None != recorder:
+      start = time.perf_counter()
+    try:
+      return value,formatOutput.format(value,PObject.DIGITS)
+    except:
+      return 'Error','Error'
+    finally:
+      if None != recorder:
+        recorder.stage('format',start)
@@ -16,12 +16,16 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import sys
 import wx
 import wx.html2
 import os 
 import PObject
-import re
-import mpmath
+import calculatorSession
+import resultCache
+import background
+import bridge
+import tracing
 
 import calculator
 
@@ -46,21 +50,86 @@ fname = os.path.join(dir_path,'calculator.html')
 html_string = calculator.calculator(fname)
 
 # Global variables
-RADIAN_SCALE = 1.0
-DEGREE_SCALE = mpmath.pi/180.0
-scale = DEGREE_SCALE
-
-memory = mpmath.mpf(0)
-answer = mpmath.mpf(0)
+# Seconds a computation may take before it is stopped; None for no limit
+TIMEOUT = 60
+# Milliseconds before the display shows that a computation is running
+BUSY_DELAY = 100
+# Pressing = again or recalling an expression reuses its result
+results = resultCache.ResultCache()
+# Angle mode, memory, answer and history of the calculator
+session = calculatorSession.CalculatorSession()
+# With --debug, show how long each stage and operator of the latest
+# calculation took
+DEBUG = '--debug' in sys.argv[1:]
+# With --trace FILE, record each round trip between the page and Python in
+# FILE as Chrome trace events (see tracing.py)
+TRACE = sys.argv[sys.argv.index('--trace')+1] if '--trace' in sys.argv[1:-1] else None
+tracer = None
+# With --record DIRECTORY, keep calculations slower than flight.THRESHOLD
+# seconds in DIRECTORY with a profile of each (see flight.py)
+RECORD = sys.argv[sys.argv.index('--record')+1] if '--record' in sys.argv[1:-1] else None
+# With --latency, print how long key presses took to show their answer
+# when the calculator closes
+LATENCY = '--latency' in sys.argv[1:]
+latencies = bridge.Latencies()
+# With --title-ipc, the page sends messages through the title as older
+# versions did rather than through a script message handler
+TITLE_IPC = '--title-ipc' in sys.argv[1:]
+# Metrics of the latest calculation, shown with its result
+metricsOverlay = None
+# With --preview, show greyed in the output panel the value of the
+# expression being typed once it has been worked out
+PREVIEW = '--preview' in sys.argv[1:]
+# Works out the expression being typed during pauses, so that = can show
+# it at once
+speculator = None
+# The latest message with the expression being typed
+typedMessage = None
 
 def update(e):
+  # the title or a script message from the page
+  message = bridge.decode(e.GetString())
+  if None == message:
+    return
+  if bridge.SHOWN == message['kind']:
+    shown(message)
+    return
+  if bridge.TYPED == message['kind']:
+    typed(message)
+    return
+  if None == tracer:
+    handle(e,message)
+    return
+  received = tracer.clock()
+  tracer.complete('message',tracer.fromWall(message['sent']),received,
+                  title=message['text'],transport=message['transport'])
+  with tracer.span('update',title=message['text']):
+    handle(e,message)
+
+def shown(message):
+  milliseconds = latencies.add(message)
+  if None != tracer:
+    tracer.complete('key press to display',tracer.fromWall(message['sent']),tracer.fromWall(message['shown']),
+                    milliseconds=milliseconds)
+
+def runScript(script):
+  if None == tracer:
+    browser.browser.RunScript(script)
+    return
+  # RunScript() returns once the page has run the script
+  with tracer.span('RunScript','script',script=script):
+    browser.browser.RunScript(script)
+
+def send(reply):
+  if not reply.empty():
+    runScript(reply.script())
+
+def handle(e,message):
+  st = message['text']
   print('update')
-  global scale
-  global memory
-  global answer
   #print("M",memory)
-  st = e.GetString()
   print(st)
+  reply = bridge.Reply(message,LATENCY or None != tracer)
   if '?' == st:
     #print('Copyleft')
     dlg = wx.MessageDialog(browser, '''
@@ -81,105 +150,99 @@ def update(e):
     ''', caption='Copyright notice', style=wx.OK)
     dlg.ShowModal()
     dlg.Destroy()
-    script = 'document.title = "!";'
-    browser.browser.RunScript(script)  
-  elif '!' == st:
-    pass # explicit do nothing
+    reply.finish()
+  elif 'cancel' == st:
+    evaluator.cancel()
+    speculator.cancel()
+    reply.output(background.CANCELLED)
+    reply.finish()
   elif 'MCL;' == st:
-    memory = mpmath.mpf(0)
-    script  = 'var label = document.getElementById("display-extra");\n'
-    script += 'var str = "";\n'
-    script += 'str += "&emsp;";\n'
-    script += 'str += "&nbsp;";\n'
-    if RADIAN_SCALE == scale:
-      script += 'str += "radians";\n'
-    else:
-      script += 'str += "degrees";\n'
-    script += "label.innerHTML = str;\n"
-    browser.browser.RunScript(script)  
+    session.clearMemory()
+    reply.label(session.label())
+    reply.finish()
   elif 'd' == st or 'r' == st:
     if 'd' == st:
-      scale = DEGREE_SCALE
+      session.setScale(PObject.DEGREE_SCALE)
     elif 'r' == st:
-      scale = RADIAN_SCALE
-    script  = 'var label = document.getElementById("display-extra");\n'
-    script += 'var str = "";\n'
-    #print('M',memory,type(memory))
-    if memory == 0:
-      script += 'str += "&emsp;";\n'
-    else:
-      script += 'str += "M";\n'
-    script += 'str += "&nbsp;";\n'
-    if RADIAN_SCALE == scale:
-      script += 'str += "radians";\n'
-    else:
-      script += 'str += "degrees";\n'
-    script += "label.innerHTML = str;\n"
-    browser.browser.RunScript(script)  
+      session.setScale(PObject.RADIAN_SCALE)
+    reply.label(session.label())
+    reply.finish()
+  elif speculator.claim(st,session.snapshot(),lambda value,output: finish(message,value,output)):
+    # worked out, or being worked out, while the user paused; this
+    # supersedes any earlier request as submit() does
+    evaluator.cancel()
+    if None != tracer:
+      tracer.instant('speculated',title=st)
+    wx.CallLater(BUSY_DELAY,showComputing,message,speculator.pending)
+  else:
+    number = evaluator.submit(st,*session.snapshot(),
+                              lambda number,value,output: finish(message,value,output))
+    wx.CallLater(BUSY_DELAY,showComputing,message,lambda: evaluator.pending(number))
+  send(reply)
+
+def showComputing(message,pending):
+  if pending():
+    reply = bridge.Reply(message)
+    reply.output(background.COMPUTING)
+    send(reply)
+
+def finish(message,value,output):
+  if None != tracer:
+    with tracer.span('finish',output=output):
+      show(message,value,output)
   else:
-    plist = PObject.convertStringToPObjectList(st,memory,answer)
-    if isinstance(plist[0],PObject.Sto):
-      #print("l",len(plist))
-      plist = plist[1:len(plist)]
-      store = 1 # 1 STO, 2 M+ 3 M- 4 MCL
-      #print('store set to',store)
-    elif isinstance(plist[0],PObject.Mplus):
-      #print("l",len(plist))
-      plist = plist[1:len(plist)]
-      store = 2 # 1 STO, 2 M+ 3 M- 4 MCL
-      #print('store set to',store)
-    elif isinstance(plist[0],PObject.Mminus):
-      #print("l",len(plist))
-      plist = plist[1:len(plist)]
-      store = 3 # 1 STO, 2 M+ 3 M- 4 MCL
-    elif isinstance(plist[0],PObject.Mcl):
-      # Not used
-      #print("l",len(plist))
-      plist = plist[1:len(plist)]
-      store = 4 # 1 STO, 2 M+ 3 M- 4 MCL
-    else:
-      store = 0
-      #print('store set to',store)
-    value,output = PObject.evaluate(plist,scale)
-    #print('@ ',plist,value,output)
-    if output != 'Error':
-      error = False
-      answer = value
-      #print("A",answer)
-    else:
-      error = True
-    browser.browser.RunScript('document.getElementById("output-panel").innerHTML="'+output+'";')
-    script = 'document.title = "!";' # in case expression started with ANS;
-    browser.browser.RunScript(script) 
-    ## may have to store result
-    #print('store =',store,error)
-    if store > 0 and not error:
-      if 1 == store:
-        memory = value # we calculate answer as soon as STO is pressed.
-      elif 2 == store:
-        memory += value # we calculate answer as soon as M+ is pressed.
-      else: # assume 3 == store: 
-        memory -= value # we calculate answer as soon as M– is pressed.
-      script  = 'var label = document.getElementById("display-extra");\n'
-      script += 'var str = "";\n'
-      #print('M',memory,type(memory))
-      if memory == 0:
-        script += 'str += "&emsp;";\n'
-      else:
-        script += 'str += "M";\n'
-      script += 'str += "&nbsp;";\n'
-      if RADIAN_SCALE == scale:
-        script += 'str += "radians";\n'
-      else:
-        script += 'str += "degrees";\n'
-      script += "label.innerHTML = str;\n"
-      browser.browser.RunScript(script)
+    show(message,value,output)
+
+def show(message,value,output):
+  global metricsOverlay
+  reply = bridge.Reply(message,LATENCY or None != tracer)
+  reply.output(output)
+  # STO, M+ and M- store the result as soon as it is calculated
+  if session.commit(message['text'],value,output):
+    reply.label(session.label())
+  if None != metricsOverlay:
+    reply.overlay(metricsOverlay)
+    metricsOverlay = None
+  reply.finish()
+  send(reply)
+
+def typed(message):
+  global typedMessage
+  typedMessage = message
+  speculator.typed(message['text'])
+
+def showPreview(output):
+  # the speculator only shows results for the latest expression typed
+  reply = bridge.Reply(typedMessage)
+  reply.preview(output)
+  send(reply)
+
+def showMetrics(snapshot):
+  # the evaluator delivers the metrics just before the result
+  global metricsOverlay
+  metricsOverlay = background.overlay(snapshot)
   
 if __name__ == '__main__': 
   app = wx.App() 
   browser = MyBrowser(None, -1,title='Scientific calculator') 
   browser.Bind(wx.html2.EVT_WEBVIEW_TITLE_CHANGED, update)
+  # wxPython 4.2 and later can pass messages from the page directly; the
+  # page uses the title otherwise
+  if not TITLE_IPC and hasattr(wx.html2,'EVT_WEBVIEW_SCRIPT_MESSAGE_RECEIVED'):
+    if browser.browser.AddScriptMessageHandler('wx_msg'):
+      browser.Bind(wx.html2.EVT_WEBVIEW_SCRIPT_MESSAGE_RECEIVED, update)
   browser.browser.SetPage(html_string,"")
+  if None != TRACE:
+    tracer = tracing.Tracer(TRACE)
+  evaluator = background.Evaluator(wx.CallAfter,TIMEOUT,results,showMetrics if DEBUG else None,tracer,RECORD)
+  speculator = background.Speculator(background.Evaluator(wx.CallAfter,TIMEOUT,results),
+                                     wx.CallLater,session.snapshot,showPreview if PREVIEW else None)
   browser.Show() 
-  app.MainLoop() 
+  app.MainLoop()
+  evaluator.close() 
+  speculator.evaluator.close()
+  if None != tracer:
+    tracer.close()
+  if LATENCY:
+    sys.stderr.write(latencies.summary()+'\n')
 
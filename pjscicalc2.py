@@ -19,13 +19,17 @@
 import sys 
 import os 
 import PObject
-import re
-import mpmath
+import calculatorSession
+import resultCache
+import background
+import bridge
+import tracing
 
 import calculator
 
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtWebEngineWidgets import *
+from PyQt5.QtWebChannel import QWebChannel
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtWidgets import QWidget
 from PyQt5.QtWidgets import QVBoxLayout
@@ -42,8 +46,47 @@ class WebPage(QWebEngineView):
         self.titleChanged.connect(self._on_title_change)
 
     def _on_title_change(self):
-        update(self)
-        pass
+        # only used when the page has no QWebChannel
+        receive(self.title())
+
+class Bridge(QtCore.QObject):
+    # The page calls send() through a QWebChannel
+    def __init__(self):
+        QtCore.QObject.__init__(self)
+
+    @QtCore.pyqtSlot(str)
+    def send(self,text):
+        receive(text)
+
+def installBridge(view,receiver):
+    # qwebchannel.js has to be in the page before its own scripts run
+    source = QtCore.QFile(':/qtwebchannel/qwebchannel.js')
+    if not source.open(QtCore.QIODevice.ReadOnly):
+        return None
+    script = QWebEngineScript()
+    script.setName('qwebchannel.js')
+    script.setSourceCode(bytes(source.readAll()).decode('utf-8'))
+    script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+    script.setWorldId(QWebEngineScript.MainWorld)
+    view.page().scripts().insert(script)
+    channel = QWebChannel(view.page())
+    channel.registerObject('bridge',receiver)
+    view.page().setWebChannel(channel)
+    return channel
+
+class Deliverer(QtCore.QObject):
+    # Carries a function and its arguments to the thread of the window
+    call = QtCore.pyqtSignal(object)
+
+    def __init__(self):
+        QtCore.QObject.__init__(self)
+        self.call.connect(self._on_call)
+
+    def deliver(self,function,*args):
+        self.call.emit((function,args))
+
+    def _on_call(self,call):
+        call[0](*call[1])
 
 # html string to display in WebView widget
 dir_path = os.path.dirname(os.path.realpath(__file__))
@@ -51,21 +94,86 @@ fname = os.path.join(dir_path,'calculator.html')
 html_string = calculator.calculator(fname)
 
 # Global variables
-RADIAN_SCALE = 1.0
-DEGREE_SCALE = mpmath.pi/180.0
-scale = DEGREE_SCALE
+# Seconds a computation may take before it is stopped; None for no limit
+TIMEOUT = 60
+# Milliseconds before the display shows that a computation is running
+BUSY_DELAY = 100
+# Pressing = again or recalling an expression reuses its result
+results = resultCache.ResultCache()
+# Angle mode, memory, answer and history of the calculator
+session = calculatorSession.CalculatorSession()
+# With --debug, show how long each stage and operator of the latest
+# calculation took
+DEBUG = '--debug' in sys.argv[1:]
+# With --trace FILE, record each round trip between the page and Python in
+# FILE as Chrome trace events (see tracing.py)
+TRACE = sys.argv[sys.argv.index('--trace')+1] if '--trace' in sys.argv[1:-1] else None
+tracer = None
+# With --record DIRECTORY, keep calculations slower than flight.THRESHOLD
+# seconds in DIRECTORY with a profile of each (see flight.py)
+RECORD = sys.argv[sys.argv.index('--record')+1] if '--record' in sys.argv[1:-1] else None
+# With --latency, print how long key presses took to show their answer
+# when the calculator closes
+LATENCY = '--latency' in sys.argv[1:]
+latencies = bridge.Latencies()
+# With --title-ipc, the page sends messages through the title as older
+# versions did rather than through a QWebChannel
+TITLE_IPC = '--title-ipc' in sys.argv[1:]
+# Metrics of the latest calculation, shown with its result
+metricsOverlay = None
+# With --preview, show greyed in the output panel the value of the
+# expression being typed once it has been worked out
+PREVIEW = '--preview' in sys.argv[1:]
+# Works out the expression being typed during pauses, so that = can show
+# it at once
+speculator = None
+# The latest message with the expression being typed
+typedMessage = None
+
+def receive(text):
+  message = bridge.decode(text)
+  if None == message:
+    return
+  if bridge.SHOWN == message['kind']:
+    shown(message)
+    return
+  if bridge.TYPED == message['kind']:
+    typed(message)
+    return
+  if None == tracer:
+    handle(browser,message)
+    return
+  received = tracer.clock()
+  tracer.complete('message',tracer.fromWall(message['sent']),received,
+                  title=message['text'],transport=message['transport'])
+  with tracer.span('update',title=message['text']):
+    handle(browser,message)
+
+def shown(message):
+  milliseconds = latencies.add(message)
+  if None != tracer:
+    tracer.complete('key press to display',tracer.fromWall(message['sent']),tracer.fromWall(message['shown']),
+                    milliseconds=milliseconds)
 
-memory = mpmath.mpf(0)
-answer = mpmath.mpf(0)
+def runScript(script):
+  if None == tracer:
+    browser.page().runJavaScript(script)
+    return
+  # the callback comes once the page has run the script
+  start = tracer.clock()
+  browser.page().runJavaScript(script,lambda result: tracer.complete('runJavaScript',start,tracer.clock(),'script',
+                                                                     script=script))
 
-def update(e):
+def send(reply):
+  if not reply.empty():
+    runScript(reply.script())
+
+def handle(e,message):
   #print('update')
-  global scale
-  global memory
-  global answer
   #print("M",memory)
-  st = e.title()
   #print(st)
+  st = message['text']
+  reply = bridge.Reply(message,LATENCY or None != tracer)
   if '?' == st:
     #print('Copyleft')
     dlg = QMessageBox()
@@ -92,8 +200,7 @@ def update(e):
     dlg.setWindowTitle('Copyright notice')
     dlg.setStandardButtons(QMessageBox.Ok)
     dlg.exec_()
-    script = 'document.title = "!";'
-    browser.page().runJavaScript(script)  
+    reply.finish()
   elif 'fullscreen' == st:
     screen = e.app.primaryScreen()
     size = e.parent.size()
@@ -111,104 +218,77 @@ def update(e):
         h = int(rect.width()/2)
         w = h*2
         e.parent.resize(w,h)
-    script = 'document.title = "!";'
-    browser.page().runJavaScript(script)  
-  elif '!' == st:
-    pass # explicit do nothing
+    reply.finish()
+  elif 'cancel' == st:
+    evaluator.cancel()
+    speculator.cancel()
+    reply.output(background.CANCELLED)
+    reply.finish()
   elif 'MCL;' == st:
-    memory = mpmath.mpf(0)
-    script  = 'var label = document.getElementById("display-extra");\n'
-    script += 'var str = "";\n'
-    script += 'str += "&emsp;";\n'
-    script += 'str += "&nbsp;";\n'
-    if RADIAN_SCALE == scale:
-      script += 'str += "radians";\n'
-    else:
-      script += 'str += "degrees";\n'
-    script += "label.innerHTML = str;\n"
-    browser.page().runJavaScript(script)  
+    session.clearMemory()
+    reply.label(session.label())
+    reply.finish()
   elif 'd' == st or 'r' == st:
     if 'd' == st:
-      scale = DEGREE_SCALE
+      session.setScale(PObject.DEGREE_SCALE)
     elif 'r' == st:
-      scale = RADIAN_SCALE
-    script  = 'var label = document.getElementById("display-extra");\n'
-    script += 'var str = "";\n'
-    #print('M',memory,type(memory))
-    if memory == 0:
-      script += 'str += "&emsp;";\n'
-    else:
-      script += 'str += "M";\n'
-    script += 'str += "&nbsp;";\n'
-    if RADIAN_SCALE == scale:
-      script += 'str += "radians";\n'
-    else:
-      script += 'str += "degrees";\n'
-    script += "label.innerHTML = str;\n"
-    browser.page().runJavaScript(script)  
+      session.setScale(PObject.RADIAN_SCALE)
+    reply.label(session.label())
+    reply.finish()
+  elif speculator.claim(st,session.snapshot(),lambda value,output: finish(message,value,output)):
+    # worked out, or being worked out, while the user paused; this
+    # supersedes any earlier request as submit() does
+    evaluator.cancel()
+    if None != tracer:
+      tracer.instant('speculated',title=st)
+    QtCore.QTimer.singleShot(BUSY_DELAY,lambda: showComputing(message,speculator.pending))
   else:
-    plist = []
-    if 'about:blank' != st:
-       plist = PObject.convertStringToPObjectList(st,memory,answer)
-    else:
-       return
-    if 0 != len(plist):
-        if isinstance(plist[0],PObject.Sto):
-            #print("l",len(plist))
-            plist = plist[1:len(plist)]
-            store = 1 # 1 STO, 2 M+ 3 M- 4 MCL
-            #print('store set to',store)
-        elif isinstance(plist[0],PObject.Mplus):
-            #print("l",len(plist))
-            plist = plist[1:len(plist)]
-            store = 2 # 1 STO, 2 M+ 3 M- 4 MCL
-            #print('store set to',store)
-        elif isinstance(plist[0],PObject.Mminus):
-            #print("l",len(plist))
-            plist = plist[1:len(plist)]
-            store = 3 # 1 STO, 2 M+ 3 M- 4 MCL
-        elif isinstance(plist[0],PObject.Mcl):
-            # Not used
-            #print("l",len(plist))
-            plist = plist[1:len(plist)]
-            store = 4 # 1 STO, 2 M+ 3 M- 4 MCL
-        else:
-            store = 0
-      #print('store set to',store)
-    value,output = PObject.evaluate(plist,scale)
-    #print('@ ',plist,value,output)
-    if output != 'Error':
-      error = False
-      answer = value
-      #print("A",answer)
-    else:
-      error = True
-    browser.page().runJavaScript('document.getElementById("output-panel").innerHTML="'+output+'";')
-    script = 'document.title = "!";' # in case expression started with ANS;
-    browser.page().runJavaScript(script) 
-    ## may have to store result
-    #print('store =',store,error)
-    if store > 0 and not error:
-      if 1 == store:
-        memory = value # we calculate answer as soon as STO is pressed.
-      elif 2 == store:
-        memory += value # we calculate answer as soon as M+ is pressed.
-      else: # assume 3 == store: 
-        memory -= value # we calculate answer as soon as M– is pressed.
-      script  = 'var label = document.getElementById("display-extra");\n'
-      script += 'var str = "";\n'
-      #print('M',memory,type(memory))
-      if memory == 0:
-        script += 'str += "&emsp;";\n'
-      else:
-        script += 'str += "M";\n'
-      script += 'str += "&nbsp;";\n'
-      if RADIAN_SCALE == scale:
-        script += 'str += "radians";\n'
-      else:
-        script += 'str += "degrees";\n'
-      script += "label.innerHTML = str;\n"
-      browser.page().runJavaScript(script)
+    number = evaluator.submit(st,*session.snapshot(),
+                              lambda number,value,output: finish(message,value,output))
+    QtCore.QTimer.singleShot(BUSY_DELAY,lambda: showComputing(message,lambda: evaluator.pending(number)))
+  send(reply)
+
+def showComputing(message,pending):
+  if pending():
+    reply = bridge.Reply(message)
+    reply.output(background.COMPUTING)
+    send(reply)
+
+def finish(message,value,output):
+  if None != tracer:
+    with tracer.span('finish',output=output):
+      show(message,value,output)
+  else:
+    show(message,value,output)
+
+def show(message,value,output):
+  global metricsOverlay
+  reply = bridge.Reply(message,LATENCY or None != tracer)
+  reply.output(output)
+  # STO, M+ and M- store the result as soon as it is calculated
+  if session.commit(message['text'],value,output):
+    reply.label(session.label())
+  if None != metricsOverlay:
+    reply.overlay(metricsOverlay)
+    metricsOverlay = None
+  reply.finish()
+  send(reply)
+
+def typed(message):
+  global typedMessage
+  typedMessage = message
+  speculator.typed(message['text'])
+
+def showPreview(output):
+  # the speculator only shows results for the latest expression typed
+  reply = bridge.Reply(typedMessage)
+  reply.preview(output)
+  send(reply)
+
+def showMetrics(snapshot):
+  # the evaluator delivers the metrics just before the result
+  global metricsOverlay
+  metricsOverlay = background.overlay(snapshot)
   
 if __name__ == "__main__":
     app = QApplication([])
@@ -216,6 +296,9 @@ if __name__ == "__main__":
     win = QWidget()
     win.setWindowTitle('Scientific calculator')
     browser = WebPage(app,win)
+    receiver = Bridge()
+    if not TITLE_IPC:
+      channel = installBridge(browser,receiver)
     
     # And give it a layout
     layout = QVBoxLayout()
@@ -226,5 +309,18 @@ if __name__ == "__main__":
     browser.setHtml(html_string)
     layout.setContentsMargins(0,0,0,0)
     layout.addWidget(browser)
+    deliverer = Deliverer()
+    if None != TRACE:
+      tracer = tracing.Tracer(TRACE)
+    evaluator = background.Evaluator(deliverer.deliver,TIMEOUT,results,showMetrics if DEBUG else None,tracer,RECORD)
+    speculator = background.Speculator(background.Evaluator(deliverer.deliver,TIMEOUT,results),
+                                       QtCore.QTimer.singleShot,session.snapshot,showPreview if PREVIEW else None)
     win.show()
-    sys.exit(app.exec_())  # only need one app, one running event loop
+    status = app.exec_()  # only need one app, one running event loop
+    evaluator.close()
+    speculator.evaluator.close()
+    if None != tracer:
+      tracer.close()
+    if LATENCY:
+      sys.stderr.write(latencies.summary()+'\n')
+    sys.exit(status)
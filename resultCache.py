@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# A bounded cache of the results of strings from the calculator title,
+# which threads and sessions may share.
+#
+#   cache = resultCache.ResultCache(size=1024)
+#   value, output = cache.evaluate('#1;+;#2;',PObject.DEGREE_SCALE,None,None)
+
+import collections
+import threading
+import time
+import PObject
+import wireFormat
+
+##
+# The tokens of an expression without any store token, and the values
+# that its result depends on: two strings with the same key have the same
+# value
+# @param objectString A string from the calculator title
+# @return A tuple
+##
+def resultKey(objectString,scale,answer,memory,precision=PObject.DECIMAL_PRECISION):
+  tokens = tuple(wireFormat.splitTokens(objectString))
+  if 0 != len(tokens) and tokens[0] in PObject.STORE_TOKENS:
+    tokens = tokens[1:]
+  return (tokens,scale,
+          answer if 'ANS' in tokens else None,
+          memory if 'RCL' in tokens else None,
+          PObject.context(precision).mp.prec)
+
+class ResultCache:
+  "Bounded least-recently-used cache of results of strings from the calculator title"
+  def __init__(self,size=256,ttl=None):
+    "Initialise ResultCache with at most size entries, each kept ttl seconds"
+    self.size = size
+    self.ttl = ttl
+    self.lock = threading.Lock()
+    self.entries = collections.OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.expirations = 0
+  def key(self,objectString,scale,answer,memory,precision=PObject.DECIMAL_PRECISION):
+    "The tokens of the expression and the values that its result depends on"
+    return resultKey(objectString,scale,answer,memory,precision)
+  def lookup(self,key):
+    "The value and formatted string stored for a key or None"
+    now = time.monotonic()
+    with self.lock:
+      entry = self.entries.get(key)
+      if None != entry:
+        if None != self.ttl and now - entry[2] > self.ttl:
+          del self.entries[key]
+          self.expirations += 1
+        else:
+          self.entries.move_to_end(key)
+          self.hits += 1
+          return entry[0], entry[1]
+      self.misses += 1
+    return None
+  def store(self,key,value,output):
+    "Remember the value and formatted string of a key"
+    with self.lock:
+      self.entries[key] = (value,output,time.monotonic())
+      self.entries.move_to_end(key)
+      while len(self.entries) > self.size:
+        self.entries.popitem(last=False)
+        self.evictions += 1
+  def evaluate(self,objectString,scale,answer,memory,precision=PObject.DECIMAL_PRECISION):
+    "Evaluate to a double and its formatted string like PObject.evaluate()"
+    key = self.key(objectString,scale,answer,memory,precision)
+    result = self.lookup(key)
+    if None != result:
+      return result
+    value, output = PObject.compile(objectString)(answer,memory,scale,precision)
+    self.store(key,value,output)
+    return value, output
+  def stats(self):
+    "Counts of hits, misses, evictions and expirations, and the number of entries"
+    with self.lock:
+      return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+              'expirations': self.expirations, 'entries': len(self.entries)}
+  def clear(self):
+    "Remove all entries; the counts are kept"
+    with self.lock:
+      self.entries.clear()
@@ -0,0 +1,631 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Serve the calculator to other programs over JSON-RPC 2.0, on a Unix
+# socket (one JSON message per line) and on a localhost HTTP port (POST a
+# JSON message; connections are kept alive and requests may be
+# pipelined). Evaluations run in a pool of worker processes, so the event
+# loop never waits for mpmath.
+#
+#   ./server.py serve --socket /tmp/pjscicalc.sock --port 8765
+#   ./server.py load --port 8765 --connections 8 --pipeline 4
+#
+#   {"jsonrpc": "2.0", "id": 1, "method": "evaluate", "params": {"expression": "2*sin(30)"}}
+#
+# Methods: evaluate(expression, radians, answer, memory, precision),
+# format(value, digits), session.create(precision), session.evaluate(session,
+# expression), session.setScale(session, radians), session.clearMemory(session),
+# session.state(session), session.history(session), session.close(session).
+# Expressions are in the format of the calculator title or plain infix as
+# for batch.py; values are strings of decimal digits.
+#
+# A request over its time limit gets an error at once, but a worker process
+# cannot be interrupted, so it finishes the evaluation before taking
+# another; PObject.MAX_EXPONENT stops the usual runaway cases early.
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+import itertools
+import concurrent.futures
+import mpmath
+import PObject
+import calculatorSession
+import formatOutput
+import background
+import batch
+
+## Host of the HTTP port; the service is only for this machine
+HOST = '127.0.0.1'
+## Most requests read from one connection and not yet answered; reading
+# stops until the oldest is answered
+MAX_PIPELINE = 64
+## Most evaluations waiting for or running in the worker processes;
+# further ones wait in the event loop
+MAX_PENDING = 256
+## Longest message in bytes
+MAX_MESSAGE = 1 << 20
+## Most sessions at once
+MAX_SESSIONS = 1000
+## Largest precision of a session; a session keeps its numbers in the
+# event loop, where making a context takes about 0.05 s at this precision
+MAX_SESSION_PRECISION = 10000
+## Largest precision of an evaluate or format request; the timeout only
+# abandons a worker, which goes on until it finishes
+MAX_PRECISION = 10000
+## Seconds an evaluation may take before its request fails; None for no limit
+TIMEOUT = 60
+
+## JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+TIMEOUT_ERROR = -32000
+SESSION_ERROR = -32001
+
+class RPCError(Exception):
+  "An error to return as the error of a JSON-RPC response"
+  def __init__(self,code,message):
+    "Initialise RPCError"
+    Exception.__init__(self,message)
+    self.code = code
+    self.message = message
+
+class ProtocolError(Exception):
+  "A message that cannot be read; the connection is answered and closed"
+  def __init__(self,response):
+    "Initialise ProtocolError with the bytes to send before closing"
+    Exception.__init__(self)
+    self.response = response
+
+##
+# Check that a value from a request is a number, without making a context
+##
+def checkValue(value,name):
+  if None == value or isinstance(value,(int,float)) and not isinstance(value,bool):
+    return
+  if isinstance(value,str):
+    try:
+      mpmath.mpf(value)
+      return
+    except ValueError:
+      pass
+  raise RPCError(INVALID_PARAMS,'%s must be a number' % name)
+
+##
+# A value for a worker process as a number of a context: 0 for None, a
+# packed value from a session or a number from a request
+##
+def readValue(current,value):
+  if None == value:
+    return current.zero
+  if isinstance(value,tuple):
+    return current.convert(background.unpack(value))
+  return current.mpf(str(value))
+
+##
+# Evaluate an expression. This runs in a worker process, which is also
+# where the context of a large precision is made.
+# @param session Whether to return the value packed for a session rather
+# than as a string
+# @return The value, or None for an error, and the formatted string
+##
+def evaluateJob(tokens,scale,answer,memory,precision,session=False):
+  current = PObject.context(precision)
+  value, output = PObject.compile(tokens)(readValue(current,answer),readValue(current,memory),
+                                          background.unpack(scale),precision)
+  if output in PObject.ERROR_OUTPUTS:
+    return None, output
+  return background.pack(value) if session else str(value), output
+
+##
+# Format a value for the display. This runs in a worker process.
+##
+def formatJob(value,digits,precision):
+  return formatOutput.format(readValue(PObject.context(precision),value),digits)
+
+##
+# Nothing, to start the worker processes
+##
+def warmJob():
+  return PObject.DIGITS
+
+class Session:
+  "A CalculatorSession of the service and the lock that orders the calls on it"
+  def __init__(self,precision):
+    "Initialise Session"
+    self.calculator = calculatorSession.CalculatorSession(None,calculatorSession.HISTORY_SIZE,precision)
+    self.lock = asyncio.Lock()
+  def state(self):
+    "The angle mode, answer and memory as plain values"
+    scale, answer, memory = self.calculator.snapshot()
+    return {'radians': PObject.RADIAN_SCALE == scale, 'answer': str(answer), 'memory': str(memory),
+            'label': self.calculator.label()}
+
+class Server:
+  "JSON-RPC methods of the calculator and the connections that call them"
+  def __init__(self,executor,timeout=TIMEOUT,maxPipeline=MAX_PIPELINE,maxPending=MAX_PENDING):
+    "Initialise Server with an executor for evaluations"
+    self.executor = executor
+    self.timeout = timeout
+    self.maxPipeline = maxPipeline
+    self.pending = asyncio.Semaphore(maxPending)
+    self.sessions = {}
+    self.numbers = itertools.count(1)
+    self.requests = 0
+    self.methods = {
+      'evaluate': self.evaluate,
+      'format': self.format,
+      'session.create': self.createSession,
+      'session.evaluate': self.evaluateSession,
+      'session.setScale': self.setScale,
+      'session.clearMemory': self.clearMemory,
+      'session.state': self.sessionState,
+      'session.history': self.history,
+      'session.close': self.closeSession,
+    }
+  async def run(self,function,*args):
+    "Run a function in the executor, waiting while too many are pending"
+    async with self.pending:
+      future = asyncio.get_running_loop().run_in_executor(self.executor,function,*args)
+      try:
+        return await asyncio.wait_for(future,self.timeout)
+      except asyncio.TimeoutError:
+        raise RPCError(TIMEOUT_ERROR,background.TIMEOUT)
+  def precision(self,precision,largest=None):
+    "The precision from a request, which is only checked here"
+    if None == precision:
+      return PObject.DECIMAL_PRECISION
+    if not isinstance(precision,int) or isinstance(precision,bool) or precision < 1:
+      raise RPCError(INVALID_PARAMS,'precision must be a positive integer')
+    if None != largest and precision > largest:
+      raise RPCError(INVALID_PARAMS,'precision must be at most %d' % largest)
+    return precision
+  @contextlib.asynccontextmanager
+  async def session(self,session):
+    """Hold the Session of an identifier for the body of an async with
+    statement. A session takes its calls one at a time, in the order they
+    came."""
+    entry = self.sessions.get(session) if isinstance(session,str) else None
+    if None != entry:
+      async with entry.lock:
+        # it may have been closed while waiting
+        if entry is self.sessions.get(session):
+          yield entry
+          return
+    raise RPCError(SESSION_ERROR,'no session %s' % session)
+  async def evaluate(self,expression,radians=False,answer=None,memory=None,precision=None,syntax='auto'):
+    "Evaluate an expression; ANS and RCL are 0 unless given"
+    precision = self.precision(precision,MAX_PRECISION)
+    if not isinstance(expression,str) or syntax not in ('auto','tokens','infix'):
+      raise RPCError(INVALID_PARAMS,'expression must be a string and syntax auto, tokens or infix')
+    checkValue(answer,'answer')
+    checkValue(memory,'memory')
+    value, output = await self.run(evaluateJob,batch.toTokens(expression,syntax),
+                                   background.pack(PObject.RADIAN_SCALE if radians else PObject.DEGREE_SCALE),
+                                   answer,memory,precision)
+    return {'value': value, 'output': output}
+  async def format(self,value,digits=PObject.DIGITS,precision=None):
+    "Format a value as the display would"
+    precision = self.precision(precision,MAX_PRECISION)
+    if not isinstance(digits,int) or isinstance(digits,bool) or digits < 1:
+      raise RPCError(INVALID_PARAMS,'digits must be a positive integer')
+    if None == value:
+      raise RPCError(INVALID_PARAMS,'value must be a number')
+    checkValue(value,'value')
+    return await self.run(formatJob,str(value),digits,precision)
+  async def createSession(self,precision=None):
+    "Start a session in degrees with ANS and memory 0"
+    # the state of a session is kept here, so its context is made here
+    precision = self.precision(precision,MAX_SESSION_PRECISION)
+    if len(self.sessions) >= MAX_SESSIONS:
+      raise RPCError(SESSION_ERROR,'too many sessions')
+    session = 's%d' % next(self.numbers)
+    self.sessions[session] = Session(precision)
+    return session
+  async def evaluateSession(self,session,expression,syntax='auto'):
+    "Evaluate an expression in a session as its calculator would"
+    if not isinstance(expression,str) or syntax not in ('auto','tokens','infix'):
+      raise RPCError(INVALID_PARAMS,'expression must be a string and syntax auto, tokens or infix')
+    tokens = batch.toTokens(expression,syntax)
+    async with self.session(session) as entry:
+      calculator = entry.calculator
+      scale, answer, memory = calculator.snapshot()
+      value, output = await self.run(evaluateJob,tokens,background.pack(scale),background.pack(answer),
+                                     background.pack(memory),calculator.precision,True)
+      value = None if None == value else PObject.context(calculator.precision).convert(background.unpack(value))
+      calculator.commit(tokens,value,output)
+      result = entry.state()
+    result.update({'value': None if None == value else str(value), 'output': output})
+    return result
+  async def setScale(self,session,radians):
+    "Use radians or degrees in a session"
+    async with self.session(session) as entry:
+      entry.calculator.setScale(PObject.RADIAN_SCALE if radians else PObject.DEGREE_SCALE)
+      return entry.state()
+  async def clearMemory(self,session):
+    "Set the memory of a session to 0"
+    async with self.session(session) as entry:
+      entry.calculator.clearMemory()
+      return entry.state()
+  async def sessionState(self,session):
+    "The angle mode, answer, memory and display label of a session"
+    async with self.session(session) as entry:
+      return entry.state()
+  async def history(self,session):
+    "The latest expressions of a session with their values and outputs"
+    async with self.session(session) as entry:
+      return [{'expression': tokens, 'value': None if None == value else str(value), 'output': output}
+              for tokens, value, output in entry.calculator.history()]
+  async def closeSession(self,session):
+    "End a session once the calls already made on it are done"
+    async with self.session(session):
+      self.sessions.pop(session,None)
+      return True
+  async def call(self,request):
+    "The response to one JSON-RPC request, or None for a notification"
+    if not isinstance(request,dict) or '2.0' != request.get('jsonrpc') or not isinstance(request.get('method'),str):
+      return errorResponse(None,INVALID_REQUEST,'Invalid Request')
+    number = request.get('id')
+    notification = 'id' not in request
+    try:
+      method = self.methods.get(request['method'])
+      if None == method:
+        raise RPCError(METHOD_NOT_FOUND,'Method not found')
+      params = request.get('params',{})
+      if isinstance(params,dict):
+        args, kwds = (), params
+      elif isinstance(params,list):
+        args, kwds = params, {}
+      else:
+        raise RPCError(INVALID_PARAMS,'params must be an object or array')
+      try:
+        bound = method(*args,**kwds)
+      except TypeError as error:
+        raise RPCError(INVALID_PARAMS,str(error))
+      result = await bound
+    except RPCError as error:
+      return None if notification else errorResponse(number,error.code,error.message)
+    except Exception as error:
+      return None if notification else errorResponse(number,INTERNAL_ERROR,'%s: %s' % (type(error).__name__,error))
+    if notification:
+      return None
+    return {'jsonrpc': '2.0', 'id': number, 'result': result}
+  async def handle(self,body):
+    "The JSON of the response to a message, or None if there is none"
+    self.requests += 1
+    try:
+      message = json.loads(body)
+    except ValueError:
+      return encode(errorResponse(None,PARSE_ERROR,'Parse error'))
+    if isinstance(message,list):
+      if 0 == len(message):
+        return encode(errorResponse(None,INVALID_REQUEST,'Invalid Request'))
+      responses = await asyncio.gather(*(self.call(request) for request in message))
+      responses = [response for response in responses if None != response]
+      return encode(responses) if 0 != len(responses) else None
+    response = await self.call(message)
+    return None if None == response else encode(response)
+  async def serve(self,reader,writer,protocol):
+    """Answer the messages of one connection in the order they came. Up to
+    maxPipeline are worked on at once; reading waits while that many are
+    unanswered, so a client that does not read its answers is slowed."""
+    unanswered = asyncio.Queue(self.maxPipeline)
+    async def answer():
+      while True:
+        item = await unanswered.get()
+        if None == item:
+          return
+        task, keep = item
+        try:
+          response = await task if isinstance(task,asyncio.Future) else task
+        except Exception as error:
+          response = encode(errorResponse(None,INTERNAL_ERROR,str(error)))
+        data = protocol.frame(response,keep)
+        if None != data:
+          writer.write(data)
+          await writer.drain()
+    answering = asyncio.ensure_future(answer())
+    async def enqueue(item):
+      # a client that has gone stops answer() with the queue full
+      putting = asyncio.ensure_future(unanswered.put(item))
+      await asyncio.wait((putting,answering),return_when=asyncio.FIRST_COMPLETED)
+      if putting.done():
+        return True
+      putting.cancel()
+      if None != item and isinstance(item[0],asyncio.Future):
+        item[0].cancel()
+      return False
+    try:
+      while not answering.done():
+        try:
+          message = await protocol.read(reader)
+        except ProtocolError as error:
+          await enqueue((error.response,False))
+          break
+        if None == message:
+          break
+        body, keep = message
+        if not await enqueue((asyncio.ensure_future(self.handle(body)),keep)):
+          break
+        if not keep:
+          break
+    except (ConnectionError,asyncio.IncompleteReadError):
+      pass
+    finally:
+      if await enqueue(None):
+        try:
+          await answering
+        except (ConnectionError,OSError):
+          pass
+      elif not answering.cancelled():
+        # the error that ended answer(), which the client cannot be told
+        answering.exception()
+      # what answer() did not reach will not be answered
+      while not unanswered.empty():
+        item = unanswered.get_nowait()
+        if None != item and isinstance(item[0],asyncio.Future):
+          item[0].cancel()
+      writer.close()
+
+##
+# A JSON-RPC error response
+##
+def errorResponse(number,code,message):
+  return {'jsonrpc': '2.0', 'id': number, 'error': {'code': code, 'message': message}}
+
+##
+# A response as bytes of JSON
+##
+def encode(response):
+  return json.dumps(response,separators=(',',':')).encode()
+
+class LineProtocol:
+  "One JSON message per line, as on the Unix socket"
+  async def read(self,reader):
+    "The next message and True to keep the connection, or None at the end"
+    while True:
+      try:
+        line = await reader.readuntil(b'\n')
+      except asyncio.IncompleteReadError as error:
+        line = error.partial
+        if 0 == len(line.strip()):
+          return None
+      except asyncio.LimitOverrunError:
+        raise ProtocolError(encode(errorResponse(None,INVALID_REQUEST,'Message too long'))+b'\n')
+      if 0 != len(line.strip()):
+        return line, True
+  def frame(self,response,keep):
+    "The bytes to send for a response; a notification has none"
+    if None == response:
+      return None
+    if isinstance(response,bytes) and response.endswith(b'\n'):
+      return response
+    return response+b'\n'
+
+## Reasons of HTTP status codes that the service sends
+HTTP_REASONS = {200: 'OK', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+##
+# An HTTP response
+##
+def httpResponse(status,body=b'',keep=True):
+  head = 'HTTP/1.1 %d %s\r\nContent-Length: %d\r\n' % (status,HTTP_REASONS[status],len(body))
+  if 0 != len(body):
+    head += 'Content-Type: application/json\r\n'
+  if not keep:
+    head += 'Connection: close\r\n'
+  return head.encode('latin-1')+b'\r\n'+body
+
+class HTTPProtocol:
+  "JSON-RPC messages POSTed to / over HTTP/1.1 with keep-alive"
+  async def read(self,reader):
+    "The next message and whether to keep the connection, or None at the end"
+    try:
+      head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as error:
+      if 0 == len(error.partial.strip()):
+        return None
+      raise ProtocolError(httpResponse(400,keep=False))
+    except asyncio.LimitOverrunError:
+      raise ProtocolError(httpResponse(413,keep=False))
+    lines = head.decode('latin-1').split('\r\n')
+    request = lines[0].split()
+    if 3 != len(request) or not request[2].startswith('HTTP/1.'):
+      raise ProtocolError(httpResponse(400,keep=False))
+    headers = {}
+    for line in lines[1:]:
+      if ':' in line:
+        name, value = line.split(':',1)
+        headers[name.strip().lower()] = value.strip()
+    connection = headers.get('connection','').lower()
+    keep = 'close' != connection if 'HTTP/1.1' == request[2] else 'keep-alive' == connection
+    if 'POST' != request[0]:
+      raise ProtocolError(httpResponse(405,keep=False))
+    if '/' != request[1]:
+      raise ProtocolError(httpResponse(404,keep=False))
+    try:
+      length = int(headers.get('content-length','0'))
+    except ValueError:
+      raise ProtocolError(httpResponse(400,keep=False))
+    if length < 0 or length > MAX_MESSAGE:
+      raise ProtocolError(httpResponse(413,keep=False))
+    body = await reader.readexactly(length)
+    return body, keep
+  def frame(self,response,keep):
+    "The bytes to send for a response"
+    if isinstance(response,bytes) and response.startswith(b'HTTP/'):
+      return response
+    if None == response:
+      return httpResponse(204,keep=keep)
+    return httpResponse(200,response,keep)
+
+##
+# Run the service until interrupted
+# @param socket Path of the Unix socket or None
+# @param port Localhost port for HTTP or None
+# @param workers Number of worker processes; None for one per core
+##
+async def serveForever(socket=None,port=None,workers=None,timeout=TIMEOUT,maxPipeline=MAX_PIPELINE,
+                       maxPending=MAX_PENDING):
+  with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+    server = Server(executor,timeout,maxPipeline,maxPending)
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(executor,warmJob) for i in range(workers or os.cpu_count())))
+    listeners = []
+    if None != socket:
+      if os.path.exists(socket):
+        os.remove(socket)
+      listeners.append(await asyncio.start_unix_server(
+        lambda reader, writer: server.serve(reader,writer,LineProtocol()),socket,limit=MAX_MESSAGE))
+      sys.stderr.write('listening on %s\n' % socket)
+    if None != port:
+      listeners.append(await asyncio.start_server(
+        lambda reader, writer: server.serve(reader,writer,HTTPProtocol()),HOST,port,limit=MAX_MESSAGE))
+      sys.stderr.write('listening on http://%s:%d/\n' % (HOST,port))
+    try:
+      await asyncio.gather(*(listener.serve_forever() for listener in listeners))
+    finally:
+      for listener in listeners:
+        listener.close()
+      if None != socket and os.path.exists(socket):
+        os.remove(socket)
+
+## Expressions that load() sends unless given others
+LOAD_EXPRESSIONS = ['1+2', '12*34', '7/8', '2^10', 'sqrt(2)', 'sin(30)', 'cos(60)+tan(45)', '52C5', '30!',
+                    '1/3+1/6', 'ln(10)*exp(2)', '(1+2)*(3+4)/5', '1.5E3-2.5E2', 'atan(0.75)']
+
+##
+# Send requests from several connections, each with up to pipeline
+# requests in flight, and report the latency and throughput
+# @param socket Path of the Unix socket, or None to use HTTP
+# @param port Localhost port for HTTP
+# @return A dictionary of the results
+##
+async def load(socket=None,port=None,connections=8,requests=2000,pipeline=4,expressions=LOAD_EXPRESSIONS):
+  latencies = []
+  errors = [0]
+  counter = itertools.count()
+  def message(number):
+    return encode({'jsonrpc': '2.0', 'id': number, 'method': 'evaluate',
+                   'params': {'expression': expressions[number % len(expressions)]}})
+  async def client():
+    if None != socket:
+      reader, writer = await asyncio.open_unix_connection(socket,limit=MAX_MESSAGE)
+    else:
+      reader, writer = await asyncio.open_connection(HOST,port,limit=MAX_MESSAGE)
+    sent = []
+    async def send():
+      number = next(counter)
+      if number >= requests:
+        return False
+      body = message(number)
+      if None == socket:
+        body = ('POST / HTTP/1.1\r\nHost: %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n'
+                % (HOST,len(body))).encode('latin-1')+body
+      else:
+        body += b'\n'
+      sent.append(time.perf_counter())
+      writer.write(body)
+      return True
+    for i in range(pipeline):
+      if not await send():
+        break
+    await writer.drain()
+    while 0 != len(sent):
+      if None != socket:
+        line = await reader.readuntil(b'\n')
+      else:
+        head = await reader.readuntil(b'\r\n\r\n')
+        length = 0
+        for line in head.decode('latin-1').split('\r\n'):
+          if line.lower().startswith('content-length:'):
+            length = int(line.split(':',1)[1])
+        line = await reader.readexactly(length)
+      latencies.append(time.perf_counter()-sent.pop(0))
+      response = json.loads(line)
+      if 'error' in response:
+        errors[0] += 1
+      if await send():
+        await writer.drain()
+    writer.close()
+  start = time.perf_counter()
+  await asyncio.gather(*(client() for i in range(connections)))
+  seconds = time.perf_counter() - start
+  latencies.sort()
+  def percentile(p):
+    return latencies[min(len(latencies)-1,int(p*len(latencies)))]
+  return {'requests': len(latencies), 'errors': errors[0], 'seconds': seconds,
+          'rps': len(latencies)/seconds, 'p50': percentile(0.5), 'p99': percentile(0.99),
+          'max': latencies[-1]}
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Serve the calculator over JSON-RPC, or put load on the service.')
+  commands = parser.add_subparsers(dest='command',required=True)
+  serve = commands.add_parser('serve',help='run the service')
+  serve.add_argument('--socket',help='path of a Unix socket to listen on')
+  serve.add_argument('--port',type=int,help='localhost port to listen on for HTTP')
+  serve.add_argument('-w','--workers',type=int,help='worker processes (default: one per core)')
+  serve.add_argument('--timeout',type=float,default=TIMEOUT,
+                     help='seconds an evaluation may take (default: %d; 0 for no limit)' % TIMEOUT)
+  serve.add_argument('--max-pipeline',type=int,default=MAX_PIPELINE,
+                     help='unanswered requests per connection before reading stops (default: %d)' % MAX_PIPELINE)
+  serve.add_argument('--max-pending',type=int,default=MAX_PENDING,
+                     help='evaluations queued for the workers at once (default: %d)' % MAX_PENDING)
+  generate = commands.add_parser('load',help='send requests to a running service and report latency')
+  generate.add_argument('--socket',help='path of the Unix socket of the service')
+  generate.add_argument('--port',type=int,help='localhost HTTP port of the service')
+  generate.add_argument('-c','--connections',type=int,default=8)
+  generate.add_argument('-n','--requests',type=int,default=2000)
+  generate.add_argument('-p','--pipeline',type=int,default=4,help='requests in flight per connection (default: 4)')
+  generate.add_argument('--expressions',help='file of expressions, one per line (default: a built-in set)')
+  args = parser.parse_args(argv)
+  if (None == args.socket) == (None == args.port) and 'load' == args.command:
+    parser.error('load needs one of --socket and --port')
+  if None == args.socket and None == args.port:
+    parser.error('serve needs --socket, --port or both')
+  if None != args.socket and not hasattr(asyncio,'start_unix_server'):
+    parser.error('Unix sockets are not available here')
+  if 'serve' == args.command:
+    if args.max_pipeline < 1 or args.max_pending < 1:
+      parser.error('--max-pipeline and --max-pending must be at least 1')
+    try:
+      asyncio.run(serveForever(args.socket,args.port,args.workers,args.timeout if args.timeout > 0 else None,
+                               args.max_pipeline,args.max_pending))
+    except KeyboardInterrupt:
+      pass
+    return 0
+  if args.connections < 1 or args.requests < 1 or args.pipeline < 1:
+    parser.error('--connections, --requests and --pipeline must be at least 1')
+  expressions = LOAD_EXPRESSIONS
+  if None != args.expressions:
+    expressions = [expression for number, expression in batch.readExpressions([args.expressions])]
+  report = asyncio.run(load(args.socket,args.port,args.connections,args.requests,args.pipeline,expressions))
+  print('%d requests, %d errors in %.3f s: %.0f requests/s, p50 %.2f ms, p99 %.2f ms, max %.2f ms'
+        % (report['requests'],report['errors'],report['seconds'],report['rps'],1e3*report['p50'],
+           1e3*report['p99'],1e3*report['max']))
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check that background.Evaluator delivers, supersedes, cancels and times
+# out requests, and that = with background.Speculator gives the answer it
+# would give without it.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import time
+import queue
+import threading
+import mpmath
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PObject
+import wireFormat
+import background
+import benchmark
+
+## sin(1E99999) and sin(1E999999), which take seconds
+SLOW = 'sin;#1;E;#9;#9;#9;#9;#9;'
+SLOWER = 'sin;#1;E;#9;#9;#9;#9;#9;#9;'
+
+##
+# Run the calls that arrive on calls, as the event loop of the window
+# does, until until() or for at most seconds
+##
+def pump(calls,seconds,until=lambda: False):
+  end = time.perf_counter()+seconds
+  while not until():
+    left = end-time.perf_counter()
+    if left <= 0:
+      return
+    try:
+      function, args = calls.get(timeout=left)
+    except queue.Empty:
+      return
+    function(*args)
+
+def test_evaluator():
+  answer = mpmath.mpf(0)
+  memory = mpmath.mpf(0)
+  calls = queue.Queue()
+  delivered = {}
+  evaluator = background.Evaluator(lambda function,*args: calls.put((function,args)),timeout=1)
+  def done(number,value,output):
+    delivered[number] = output
+  def submit(st):
+    evaluator.submit(st,PObject.DEGREE_SCALE,answer,memory,done)
+  try:
+    submit('#1;+;#1;')          # 1: delivered
+    pump(calls,10,lambda: 1 in delivered)
+    submit(SLOW)                # 2: superseded by 3
+    submit('#2;+;#2;')          # 3: delivered
+    pump(calls,10,lambda: 3 in delivered)
+    submit(SLOW)                # 4: cancelled, as by 5
+    evaluator.cancel()
+    submit(SLOWER)              # 6: times out
+    pump(calls,10,lambda: 6 in delivered)
+  finally:
+    evaluator.close()
+  assert {1: '2.0', 3: '4.0', 6: background.TIMEOUT} == delivered
+
+def test_speculation():
+  strings = [PObject.convertInfixToString(x) for x in benchmark.SUITE_KEYPAD[:8]+benchmark.SUITE_TRIG[:4]]
+  snapshot = (PObject.DEGREE_SCALE,mpmath.mpf(7),mpmath.mpf(3))
+  calls = queue.Queue()
+  deliver = lambda function,*args: calls.put((function,args))
+  def later(milliseconds,function):
+    timer = threading.Timer(milliseconds/1000,calls.put,((function,()),))
+    timer.daemon = True
+    timer.start()
+  evaluator = background.Evaluator(deliver,60)
+  speculator = background.Speculator(background.Evaluator(deliver,60),later,lambda: snapshot,delay=20)
+  def press(st):
+    answers = []
+    done = lambda value,output: answers.append(output)
+    if not speculator.claim(st,snapshot,done):
+      evaluator.submit(st,*snapshot,lambda number,value,output: done(value,output))
+    pump(calls,60,lambda: 0 != len(answers))
+    return answers[0]
+  def typeKeys(st,wait):
+    tokens = [token+';' for token in st.split(';')[:-1]]
+    for k in range(1,len(tokens)+1):
+      speculator.typed(wireFormat.encodeCompact(''.join(tokens[:k])))
+      pump(calls,0.005)
+    pump(calls,wait)
+  wrong = []
+  try:
+    # = before, during and after the speculation
+    for wait in (None,0.005,0.2):
+      for st in strings:
+        if None == wait:
+          speculator.cancel()
+        else:
+          typeKeys(st,wait)
+        output = press(wireFormat.encodeCompact(st))
+        if output != PObject.compile(st)(snapshot[1],snapshot[2],snapshot[0])[1]:
+          wrong.append((st,wait,output))
+  finally:
+    evaluator.close()
+    speculator.evaluator.close()
+  assert [] == wrong
+  assert speculator.hits > 0
@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check that threads sharing a ResultCache get the results they would get
+# without it.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import random
+import threading
+import mpmath
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PObject
+import resultCache
+import benchmark
+
+def test_shared_between_threads():
+  rng = random.Random(8)
+  corpus = [';'.join(benchmark.randomExpression(rng,1))+';' for i in range(200)]
+  answer = mpmath.mpf(2)
+  memory = mpmath.mpf('0.5')
+  expected = dict((st,PObject.compile(st)(answer,memory,PObject.DEGREE_SCALE)[1]) for st in corpus)
+  # smaller than the corpus, so entries are also evicted
+  shared = resultCache.ResultCache(len(corpus)//2)
+  wrong = []
+  def worker(seed):
+    order = corpus*5
+    random.Random(seed).shuffle(order)
+    for st in order:
+      if shared.evaluate(st,PObject.DEGREE_SCALE,answer,memory)[1] != expected[st]:
+        wrong.append(st)
+  workers = [threading.Thread(target=worker,args=(i,)) for i in range(4)]
+  for w in workers:
+    w.start()
+  for w in workers:
+    w.join()
+  assert [] == wrong
+  assert shared.stats()['hits'] > 0
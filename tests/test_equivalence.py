@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check evaluate() and evaluateCascade() against the outputs in
+# equivalence.json, which were written once from evaluateCascade() for
+# randomCases(2000,1) and benchmark.EXPRESSIONS with RCL 2 and ANS 0.5,
+# each from a token list of its own. The outputs are frozen, so a change
+# to either evaluator shows up here rather than changing the reference
+# with it. Random cases of other seeds check the two against each other.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import json
+import random
+import mpmath
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PObject
+import benchmark
+
+# evaluateCascade() works at the global precision, as in benchmark.py
+mpmath.mp.dps = PObject.DECIMAL_PRECISION
+
+RADIAN_SCALE = 1.0
+DEGREE_SCALE = mpmath.pi/180.0
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),'equivalence.json')) as stream:
+  CASES = json.load(stream)
+
+def evaluateCase(case,evaluator):
+  # memory (RCL) 2, answer (ANS) 0.5
+  plist = PObject.convertStringToPObjectList(case['tokens'],mpmath.mpf(2),mpmath.mpf('0.5'))
+  return evaluator(plist,RADIAN_SCALE if case['radians'] else DEGREE_SCALE)[1]
+
+##
+# Random expressions, half of them well formed and half random tokens,
+# each with a random angle mode
+# @return A list of cases as in equivalence.json without outputs
+##
+def randomCases(count,seed):
+  rng = random.Random(seed)
+  cases = []
+  for i in range(count):
+    if 0 == i % 2:
+      tokens = ';'.join(benchmark.randomExpression(rng))+';'
+    else:
+      tokens = ';'.join(benchmark.randomTokens(rng))+';'
+    cases.append({'tokens': tokens, 'radians': RADIAN_SCALE == rng.choice([RADIAN_SCALE,DEGREE_SCALE])})
+  return cases
+
+def test_corpus():
+  expected = randomCases(2000,1)+[{'tokens': tokens} for tokens in benchmark.EXPRESSIONS]
+  assert [case['tokens'] for case in expected] == [case['tokens'] for case in CASES]
+
+@pytest.mark.parametrize('evaluator',[PObject.evaluate,PObject.evaluateCascade],ids=['evaluate','cascade'])
+def test_frozen_outputs(evaluator):
+  differ = [(case['tokens'],case['output'],output) for case in CASES
+            for output in (evaluateCase(case,evaluator),) if output != case['output']]
+  assert [] == differ
+
+def test_dfunction_before_rfunction():
+  # the baseline cascade gave Error for these because of ++j and --j
+  for tokens, output in (('#2;^;-;#3;','0.125'),('#2;^;sqrt;#4;','4.0')):
+    assert output == evaluateCase({'tokens': tokens, 'radians': False},PObject.evaluate)
+
+def plainError(output):
+  # evaluateCascade() only shows an overflow by name at the top level
+  return 'Error' if output in PObject.ERROR_OUTPUTS else output
+
+@pytest.mark.parametrize('seed',[2,3])
+def test_random_agreement(seed):
+  differ = [(case['tokens'],new,old) for case in randomCases(2000,seed)
+            for new, old in ((evaluateCase(case,PObject.evaluate),evaluateCase(case,PObject.evaluateCascade)),)
+            if plainError(new) != plainError(old)]
+  assert [] == differ
@@ -0,0 +1,38 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check the exact arithmetic of execute(): whole numbers and fractions are
+# rounded once, at the end, so their outputs are those at 1000 digits.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PObject
+import formatOutput
+import benchmark
+
+def output(program,**options):
+  return formatOutput.format(PObject.execute(program,PObject.DEGREE_SCALE,**options).value,PObject.DIGITS)
+
+@pytest.mark.parametrize('infix',benchmark.EXACT)
+def test_rounded_once(infix):
+  program = PObject.compile(PObject.convertInfixToString(infix)).program
+  assert output(program,precision=1000) == output(program)
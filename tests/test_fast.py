@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check that the float fast path never shows a digit that the mpmath
+# path does not.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import random
+import mpmath
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PObject
+import benchmark
+
+##
+# Whether a fast path result is the reference result rounded to between
+# FLOAT_MIN_DIGITS and FLOAT_DIGITS significant digits
+##
+def digitsAgree(output,reference):
+  if output == reference:
+    return True
+  if output in PObject.ERROR_OUTPUTS or reference in PObject.ERROR_OUTPUTS:
+    return False
+  a = mpmath.mpf(output.replace('&minus;','-'))
+  b = mpmath.mpf(reference.replace('&minus;','-'))
+  for digits in range(PObject.FLOAT_MIN_DIGITS,PObject.FLOAT_DIGITS+1):
+    if mpmath.mpf(mpmath.nstr(b,digits)) == a:
+      return True
+  return False
+
+def test_random_expressions():
+  rng = random.Random(6)
+  answer = mpmath.mpf(2)
+  memory = mpmath.mpf('0.5')
+  paths = {}
+  wrong = []
+  for i in range(2000):
+    expression = PObject.compile(';'.join(benchmark.randomExpression(rng,1))+';')
+    value, output, path = expression.fast(answer,memory,PObject.DEGREE_SCALE)
+    paths[path] = paths.get(path,0) + 1
+    reference = expression(answer,memory,PObject.DEGREE_SCALE)[1]
+    if 'float' == path and not digitsAgree(output,reference):
+      wrong.append((expression.tokens,output,reference))
+  assert [] == wrong
+  # most of these need no mpmath
+  assert paths['float'] > 0.9*2000
+
+def test_small_results_at_low_precision():
+  # at 15 digits mpmath sets sin(1E-20) to 0, so the float path must not show it
+  expression = PObject.compile(PObject.convertInfixToString('sin(1E-20)'))
+  for digits in (15,30,50):
+    output = expression.fast(None,None,PObject.RADIAN_SCALE,digits)[1]
+    assert output == expression(None,None,PObject.RADIAN_SCALE,digits)[1]
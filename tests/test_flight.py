@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check that the flight recorder profiles a slow call as it runs, once.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import time
+import pstats
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import flight
+
+def spin(seconds):
+  end = time.perf_counter() + seconds
+  while time.perf_counter() < end:
+    pass
+  return 'value','output'
+
+def test_profile_of_the_slow_call(tmp_path):
+  recorder = flight.FlightRecorder(str(tmp_path),threshold=0.1)
+  calls = []
+  def call():
+    calls.append(None)
+    return spin(0.3)
+  assert ('value','output') == recorder.observe(call,lambda: {'tokens': '#1;'})
+  assert 1 == len(calls)
+  recorder.observe(lambda: spin(0.01),lambda: {'tokens': '#2;'})
+  cases = flight.readCases(str(tmp_path))
+  assert ['#1;'] == [case['tokens'] for case in cases]
+  stats = pstats.Stats(cases[0]['profile']).stats
+  spun = [ct for (path, line, name), (cc, nc, tt, ct, callers) in stats.items() if 'spin' == name]
+  assert 1 == len(spun) and spun[0] > 0.9*cases[0]['seconds']
@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check formatOutput.format() against formatOutput.format_nstr(), the
+# nstr retry loops it replaced, on random numbers and widths.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import random
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import formatOutput
+import benchmark
+
+def formatted(function,d,c):
+  try:
+    return function(d,c)
+  except Exception as e:
+    return type(e).__name__
+
+@pytest.mark.parametrize('seed',[9,10])
+def test_random_values(seed):
+  rng = random.Random(seed)
+  cases = [(benchmark.randomValue(rng),rng.choice([24,24,24,rng.randint(3,30)])) for i in range(20000)]
+  differ = [(d,c,new,old) for d, c in cases
+            for new, old in ((formatted(formatOutput.format,d,c),formatted(formatOutput.format_nstr,d,c)),)
+            if new != old]
+  assert [] == differ[:10]
@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check that results past PObject.MAX_EXPONENT are refused at once and
+# shown as an overflow rather than as Error.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import math
+import time
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PObject
+import calculatorSession
+import incrementalExpression
+import benchmark
+
+## 1000000!, whose decimal exponent is 5565708
+FACTORIAL = '#1;#0;#0;#0;#0;#0;#0;!;'
+
+def incremental(tokens,answer,memory,scale):
+  expression = incrementalExpression.IncrementalExpression()
+  expression.update(tokens)
+  return expression(answer,memory,scale)
+
+@pytest.mark.parametrize('evaluator',[
+  lambda tokens: PObject.evaluate(PObject.convertStringToPObjectList(tokens,None,None),PObject.DEGREE_SCALE),
+  lambda tokens: PObject.compile(tokens)(None,None,PObject.DEGREE_SCALE),
+  lambda tokens: PObject.compile(tokens).fast(None,None,PObject.DEGREE_SCALE)[:2],
+  lambda tokens: incremental(tokens,None,None,PObject.DEGREE_SCALE)],
+  ids=['evaluate','compile','fast','incremental'])
+def test_factorial_refused(evaluator):
+  start = time.perf_counter()
+  assert ('Error',PObject.overflowError.name) == evaluator(FACTORIAL)
+  assert time.perf_counter() - start < 0.1
+
+@pytest.mark.parametrize('tokens',['#1;#0;#0;#0;#0;#0;!;','tenX;#9;#9;#9;#9;#9;',
+                                   '#2;^;#3;#0;#0;#0;#0;#0;','exp;#2;#0;#0;#0;#0;#0;'])
+def test_below_limit(tokens):
+  output = PObject.evaluate(PObject.convertStringToPObjectList(tokens,None,None),PObject.DEGREE_SCALE)[1]
+  assert output not in PObject.ERROR_OUTPUTS
+
+def test_session_keeps_answer():
+  session = calculatorSession.CalculatorSession()
+  session.evaluate('#2;')
+  assert PObject.overflowError.name == session.evaluate(FACTORIAL)[1]
+  assert '2.0' == session.evaluate('ANS;')[1]
+
+@pytest.mark.parametrize('infix',benchmark.EXPLOSIVE)
+def test_explosive_refused(infix):
+  expression = PObject.compile(PObject.convertInfixToString(infix))
+  start = time.perf_counter()
+  assert PObject.overflowError.name == expression(None,None,PObject.DEGREE_SCALE)[1]
+  assert time.perf_counter() - start < 0.1
+
+@pytest.mark.parametrize('infix',benchmark.LARGE)
+def test_large_unchanged(infix,monkeypatch):
+  expression = PObject.compile(PObject.convertInfixToString(infix))
+  guarded = expression(None,None,PObject.DEGREE_SCALE)[1]
+  monkeypatch.setattr(PObject,'MAX_EXPONENT',math.inf)
+  assert expression(None,None,PObject.DEGREE_SCALE)[1] == guarded
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check that IncrementalExpression gives the results of compile() while
+# long expressions are typed a token at a time and deleted again.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import random
+import mpmath
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PObject
+import incrementalExpression
+import benchmark
+
+@pytest.mark.parametrize('size',[50,200])
+def test_type_and_delete(size):
+  rng = random.Random(6+size)
+  memory = mpmath.mpf(3)
+  answer = mpmath.mpf(7)
+  tokens = benchmark.longExpression(rng,size).split(';')[:-1]
+  typing = [''.join(token+';' for token in tokens[:k]) for k in range(1,len(tokens)+1)]
+  expression = incrementalExpression.IncrementalExpression()
+  mismatches = []
+  for st in typing + typing[::-1][1:]:
+    expression.update(st)
+    if expression(answer,memory,PObject.DEGREE_SCALE)[1] != PObject.compile(st)(answer,memory,PObject.DEGREE_SCALE)[1]:
+      mismatches.append(st)
+  assert [] == mismatches
+
+def test_values_change():
+  # the kept values are for the ANS, RCL and angle mode they were made with
+  expression = incrementalExpression.IncrementalExpression()
+  expression.update('sin;ANS;+;RCL;')
+  for answer, memory, scale in ((30,1,PObject.DEGREE_SCALE),(30,2,PObject.DEGREE_SCALE),(0,2,PObject.RADIAN_SCALE)):
+    answer = mpmath.mpf(answer)
+    memory = mpmath.mpf(memory)
+    assert (expression(answer,memory,scale)[1]
+            == PObject.compile('sin;ANS;+;RCL;')(answer,memory,scale)[1])
@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check that Expression.adaptive() gives the outputs of evaluation at
+# 1000 digits, including for expressions that lose digits to
+# cancellation at the usual precision.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import random
+import mpmath
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PObject
+import benchmark
+
+ANSWER = mpmath.mpf(2)
+MEMORY = mpmath.mpf('0.5')
+
+def adaptiveWrong(strings):
+  wrong = []
+  for st in strings:
+    expression = PObject.compile(st)
+    reference = expression(ANSWER,MEMORY,PObject.DEGREE_SCALE,1000)[1]
+    value, output, precision = expression.adaptive(ANSWER,MEMORY,PObject.DEGREE_SCALE)
+    if output != reference:
+      wrong.append((st,output,precision,reference))
+  return wrong
+
+def test_random_expressions():
+  rng = random.Random(13)
+  assert [] == adaptiveWrong([';'.join(benchmark.randomExpression(rng,2))+';' for i in range(300)])
+
+@pytest.mark.parametrize('infix',benchmark.HEAVY+benchmark.CANCELLING)
+def test_heavy_and_cancelling(infix):
+  assert [] == adaptiveWrong([PObject.convertInfixToString(infix)])
+
+def test_cancellation_needs_the_ladder():
+  st = PObject.convertInfixToString('sqrt(1E40+1)-1E20')
+  expression = PObject.compile(st)
+  assert expression(ANSWER,MEMORY,PObject.DEGREE_SCALE)[1] != expression(ANSWER,MEMORY,PObject.DEGREE_SCALE,1000)[1]
@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check that calculator sessions run on a pool of threads, and
+# evaluations at several precisions mixed on one, give exactly the
+# results they give one after another.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import random
+import concurrent.futures
+import mpmath
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PObject
+import calculatorSession
+import resultCache
+import benchmark
+
+##
+# Streams of expressions that use ANS and RCL and store with STO, M+ and
+# M-, one for each session
+##
+def sessionStreams(count,length,seed):
+  rng = random.Random(seed)
+  streams = []
+  for n in range(count):
+    stream = []
+    for k in range(length):
+      store = rng.choice(['','','','STO;','M+;','M-;'])
+      stream.append(store+';'.join(benchmark.randomExpression(rng,1))+';')
+    streams.append(stream)
+  return streams
+
+def run(session,stream):
+  for st in stream:
+    session.evaluate(st)
+
+def state(session):
+  return session.answer, session.memory, session.history()
+
+@pytest.mark.parametrize('cache',[False,True],ids=['incremental','shared cache'])
+def test_sessions_on_threads(cache):
+  streams = sessionStreams(8,100,11)
+  expected = []
+  for stream in streams:
+    session = calculatorSession.CalculatorSession()
+    run(session,stream)
+    expected.append(state(session))
+  shared = resultCache.ResultCache() if cache else None
+  calculators = [calculatorSession.CalculatorSession(shared) for stream in streams]
+  # each task is a slice of one session's stream; a session's slices run in order
+  with concurrent.futures.ThreadPoolExecutor(4) as pool:
+    pending = [None]*len(streams)
+    for offset in range(0,100,20):
+      for n in range(len(streams)):
+        if None != pending[n]:
+          pending[n].result()
+        pending[n] = pool.submit(run,calculators[n],streams[n][offset:offset+20])
+    for future in pending:
+      future.result()
+  assert expected == [state(session) for session in calculators]
+
+def test_precisions_on_threads():
+  rng = random.Random(12)
+  corpus = [PObject.compile(';'.join(benchmark.randomExpression(rng,1))+';') for i in range(200)]
+  answer = mpmath.mpf(2)
+  memory = mpmath.mpf('0.5')
+  tasks = [(expression,precision) for expression in corpus for precision in (15,30,50,100)]
+  rng.shuffle(tasks)
+  def evaluate(task):
+    value = task[0].value(answer,memory,PObject.DEGREE_SCALE,task[1])
+    return value if 'Error' == value else value._mpf_
+  expected = [evaluate(task) for task in tasks]
+  with concurrent.futures.ThreadPoolExecutor(4) as pool:
+    assert expected == list(pool.map(evaluate,tasks,chunksize=16))
+  third = PObject.compile('#1;/;#3;')
+  # the global precision is 50 digits, as in benchmark.py
+  error = lambda digits: abs(mpmath.mpf(1)/3 - third.value(None,None,1,digits))
+  assert error(15) > mpmath.mpf(10)**-20 > error(30)
+
+def test_trig_zero_scales_with_precision():
+  # sin(180) is 0 at any precision, sin of 1E-60 radians only at low ones
+  sin180 = PObject.compile(PObject.convertInfixToString('sin(180)'))
+  tiny = PObject.compile(PObject.convertInfixToString('sin(1E-60)'))
+  for digits in (15,30,50,100,200):
+    assert 0 == sin180.value(None,None,PObject.DEGREE_SCALE,digits)
+    assert (0 == tiny.value(None,None,PObject.RADIAN_SCALE,digits)) == (digits <= 60)
@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check vectorized.evaluateArray() against evaluating the same expression
+# once for each value of ANS.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import mpmath
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PObject
+
+numpy = pytest.importorskip('numpy')
+import vectorized
+
+def test_array_of_answers():
+  expression = PObject.compile('sin;ANS;*;sqrt;(;ANS;+;#1;);-;ln;(;ANS;2;+;#1;);/;#3;')
+  answers = numpy.linspace(-10,10,2000)
+  memory = mpmath.mpf(0)
+  values, errors = vectorized.evaluateArray(expression,answers,PObject.DEGREE_SCALE)
+  differ = []
+  for a, value in zip(answers,values):
+    reference = expression.value(mpmath.mpf(a),memory,PObject.DEGREE_SCALE)
+    if 'Error' == reference:
+      if not numpy.isnan(value):
+        differ.append(a)
+    elif not numpy.isclose(value,float(reference),rtol=1e-12,atol=1e-12):
+      differ.append(a)
+  assert [] == differ
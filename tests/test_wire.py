@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Check that expressions sent in the compact wire format give the results
+# of the textual format, over keypad and long expressions.
+#
+#   python -m pytest tests
+
+import os
+import sys
+import random
+import mpmath
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PObject
+import wireFormat
+import benchmark
+
+def test_compact_as_textual():
+  rng = random.Random(4)
+  strings = [';'.join(benchmark.randomExpression(rng))+';' for i in range(2000)]
+  strings += [benchmark.longExpression(rng,size) for size in (100,100,1000)]
+  memory = mpmath.mpf(3)
+  answer = mpmath.mpf(7)
+  mismatches = []
+  for st in strings:
+    wireString = wireFormat.encodeCompact(st)
+    if (PObject.compile(st)(answer,memory,PObject.DEGREE_SCALE)[1]
+        != PObject.compile(wireString)(answer,memory,PObject.DEGREE_SCALE)[1]):
+      mismatches.append((st,wireString))
+  assert [] == mismatches
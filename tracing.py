@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Record what happens in each round trip between the page and Python as
+# Chrome trace events. A file ending in .jsonl gets one event per line as
+# they happen; any other file gets a JSON object with all the events when
+# the tracer is closed, which chrome://tracing and https://ui.perfetto.dev
+# load directly.
+#
+#   tracer = tracing.Tracer('trace.json')
+#   with tracer.span('update',title=st):
+#     ...
+#   tracer.close()
+#
+# Times are time.perf_counter() seconds, which on the platforms the
+# calculator runs on is one clock for all processes, so the spans of the
+# worker process line up with those of the window.
+
+import os
+import json
+import time
+import threading
+import contextlib
+import collections
+
+## Most events a JSON trace keeps; the oldest are dropped first
+EVENT_LIMIT = 1000000
+
+class Tracer:
+  "Spans and events of the frontend and worker in the Chrome trace-event format"
+  def __init__(self,path,limit=EVENT_LIMIT):
+    "Initialise Tracer to write to a file"
+    self.path = path
+    self.lock = threading.Lock()
+    self.pid = os.getpid()
+    self.events = collections.deque(maxlen=limit)
+    self.stream = None
+    if path.endswith('.jsonl'):
+      self.stream = open(path,'w')
+    self.named = set()
+    self.name(self.pid,'frontend')
+  def clock(self):
+    "The time now in the seconds of the trace"
+    return time.perf_counter()
+  def fromWall(self,milliseconds):
+    "A time from Date.now() in the page in the seconds of the trace"
+    return milliseconds/1000 - (time.time() - time.perf_counter())
+  def record(self,event):
+    "Add an event"
+    with self.lock:
+      if None != self.stream:
+        self.stream.write(json.dumps(event)+'\n')
+        self.stream.flush()
+      else:
+        self.events.append(event)
+  def name(self,pid,name):
+    "Name a process in the trace"
+    if pid in self.named:
+      return
+    self.named.add(pid)
+    self.record({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': name}})
+  def complete(self,name,start,end,category='update',pid=None,tid=None,**args):
+    "Record a span from start to end seconds"
+    self.record({'name': name, 'cat': category, 'ph': 'X', 'ts': 1e6*start, 'dur': 1e6*(end-start),
+                 'pid': self.pid if None == pid else pid,
+                 'tid': threading.get_ident() if None == tid else tid, 'args': args})
+  @contextlib.contextmanager
+  def span(self,name,category='update',**args):
+    "Record a span around the body of a with statement"
+    start = self.clock()
+    try:
+      yield
+    finally:
+      self.complete(name,start,self.clock(),category,**args)
+  def instant(self,name,category='update',**args):
+    "Record an event without duration"
+    self.record({'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': 1e6*self.clock(),
+                 'pid': self.pid, 'tid': threading.get_ident(), 'args': args})
+  def begin(self,name,number,category='request',**args):
+    "Start a span that may end on another thread, such as a request"
+    self.record({'name': name, 'cat': category, 'ph': 'b', 'id': number, 'ts': 1e6*self.clock(),
+                 'pid': self.pid, 'tid': threading.get_ident(), 'args': args})
+  def end(self,name,number,category='request',**args):
+    "End a span started by begin()"
+    self.record({'name': name, 'cat': category, 'ph': 'e', 'id': number, 'ts': 1e6*self.clock(),
+                 'pid': self.pid, 'tid': threading.get_ident(), 'args': args})
+  def worker(self,pid,spans):
+    "Record the spans of a PObject.Metrics snapshot from a worker process"
+    self.name(pid,'worker')
+    for name, start, end in spans:
+      self.complete(name,start,end,'evaluate',pid,0)
+  def close(self):
+    "Write the trace"
+    with self.lock:
+      if None != self.stream:
+        self.stream.close()
+        self.stream = None
+        return
+      events = list(self.events)
+    with open(self.path,'w') as stream:
+      json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'},stream)
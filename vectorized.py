@@ -0,0 +1,314 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Evaluate one expression over an array of values of ANS with NumPy.
+# The expression is parsed once and each operator is applied to the whole
+# array at once in float64 arithmetic. Elements where the calculator would
+# show an error are NaN and the error of each is reported.
+#
+#   values, errors = vectorized.evaluateArray('sin;ANS;',numpy.arange(0,360))
+#
+# NumPy is needed; scipy.special is used for factorial, nCr and nPr if it
+# is installed.
+
+import math
+import numpy
+import PObject
+try:
+  import scipy.special
+except ImportError:
+  scipy = None
+
+## Error codes of elements; 0 is no error
+RANGE = 1
+INT = 2
+ERROR = 3
+OVERFLOW = 4
+## Names of error codes as in the PError objects of PObject
+ERROR_NAMES = {RANGE: PObject.rangeError.name, INT: PObject.intError.name,
+               ERROR: 'Error', OVERFLOW: PObject.overflowError.name}
+
+## Unit roundoff of float64
+EPSILON = 2.0**-53
+
+class Errors:
+  "First error of each element of an array evaluation"
+  def __init__(self,shape):
+    "Initialise Errors"
+    self.codes = numpy.zeros(shape,numpy.int8)
+  def mark(self,mask,code):
+    "Give the elements of mask the error code unless they already have one"
+    mask = numpy.broadcast_to(mask,self.codes.shape)
+    self.codes[mask & (0 == self.codes)] = code
+  def report(self):
+    "Map the name of each error that occurred to the indices where it did"
+    report = {}
+    for code in ERROR_NAMES:
+      indices = numpy.flatnonzero(code == self.codes)
+      if 0 != len(indices):
+        report[ERROR_NAMES[code]] = indices
+    return report
+
+##
+# Whether elements are not whole numbers
+##
+def notInteger(x):
+  return x != numpy.rint(x)
+
+##
+# Binomial coefficient of numbers as mpmath.binomial() computes it, for
+# the elements that scipy.special.binom() does not handle
+##
+def scalarBinomial(n,k):
+  try:
+    return float(PObject.context().mp.binomial(n,k))
+  except (ValueError,ZeroDivisionError):
+    return math.nan
+  except OverflowError:
+    return math.inf
+
+binomialUfunc = numpy.frompyfunc(scalarBinomial,2,1)
+
+##
+# Gamma function of a number, infinite for overflow and NaN at a pole
+##
+def scalarGamma(x):
+  try:
+    return math.gamma(x)
+  except OverflowError:
+    return math.inf
+  except ValueError:
+    return math.nan
+
+gammaUfunc = numpy.frompyfunc(scalarGamma,1,1)
+
+##
+# Gamma function of an array
+##
+def gamma(x):
+  if None != scipy:
+    return scipy.special.gamma(x)
+  return gammaUfunc(x).astype(numpy.float64)
+
+##
+# Binomial coefficients of arrays. scipy.special.binom() gives NaN for
+# some negative integers where mpmath.binomial() has a value, so these
+# elements are done one at a time.
+##
+def binomial(n,k):
+  if None == scipy:
+    return numpy.asarray(binomialUfunc(n,k),numpy.float64)
+  d = numpy.asarray(scipy.special.binom(n,k),numpy.float64) + 0.0
+  missing = numpy.isnan(d) & numpy.isfinite(n) & numpy.isfinite(k)
+  if missing.any():
+    d = d.copy()
+    n, k = numpy.broadcast_arrays(n,k)
+    d[missing] = binomialUfunc(n[missing],k[missing]).astype(numpy.float64)
+  return d
+
+##
+# Set to zero results of a trig function that are below the rounding
+# error of its argument, as the mpmath functions set results below 1e-50
+# to zero.
+##
+def snap(d,t):
+  return numpy.where(numpy.fabs(d) < 4*EPSILON*numpy.fabs(t),0.0,d)
+
+##
+# Set tiny results of an inverse trig function to zero
+##
+def snapInverse(d):
+  return numpy.where(numpy.fabs(d) < 1e-50,0.0,d)
+
+def power(l,r,errors):
+  errors.mark((l < 0) & notInteger(r),RANGE)
+  errors.mark((0 == l) & (r < 0),ERROR)
+  return numpy.power(l,r)
+
+def root(l,r,errors):
+  dl = 1/l
+  errors.mark(0 == l,ERROR)
+  errors.mark((r < 0) & (dl != numpy.rint(r)),RANGE)
+  errors.mark((0 == r) & (dl < 0),ERROR)
+  return numpy.power(r,dl)
+
+def combination(l,r,errors):
+  errors.mark(notInteger(l) | notInteger(r),INT)
+  return binomial(l,r)
+
+def permutation(l,r,errors):
+  errors.mark(notInteger(l) | notInteger(r),INT)
+  return binomial(l,l-r)
+
+def divide(l,r,errors):
+  errors.mark(0 == r,ERROR)
+  return l/r
+
+def squareRoot(x,errors):
+  errors.mark(x < 0,RANGE)
+  return numpy.sqrt(x)
+
+def logarithm(f):
+  def fn(x,errors):
+    errors.mark(x <= 0,RANGE)
+    return f(x)
+  return fn
+
+def factorial(x,errors):
+  errors.mark((x < 0) & ~notInteger(x),ERROR)
+  return gamma(x+1)
+
+def inverse(x,errors):
+  errors.mark(0 == x,ERROR)
+  return 1/x
+
+def trig(f):
+  def fn(x,scale,errors):
+    t = x if 1 == scale else numpy.radians(x)
+    return snap(f(t),t)
+  return fn
+
+##
+# tan, with an overflow where the argument is a pole to within rounding
+##
+def tangent(x,scale,errors):
+  t = x if 1 == scale else numpy.radians(x)
+  errors.mark(0 == snap(numpy.cos(t),t),OVERFLOW)
+  return snap(numpy.tan(t),t)
+
+def inverseTrig(f):
+  def fn(x,scale,errors):
+    errors.mark((x > 1) | (x < -1),RANGE)
+    d = f(x)
+    if 1 != scale:
+      d = numpy.degrees(d)
+    return snapInverse(d)
+  return fn
+
+## Array functions of operators with left and right arguments
+BINARY_FUNCTIONS = {
+  PObject.Add: lambda l,r,errors: l+r,
+  PObject.Subtract: lambda l,r,errors: l-r,
+  PObject.E: lambda l,r,errors: l*numpy.power(10.0,r),
+  PObject.Power: power,
+  PObject.Root: root,
+  PObject.Combination: combination,
+  PObject.Permutation: permutation,
+  PObject.Multiply: lambda l,r,errors: l*r,
+  PObject.Divide: divide,
+  PObject.Product: lambda l,r,errors: l*r,
+}
+
+## Array functions of operators with one argument
+UNARY_FUNCTIONS = {
+  PObject.Uplus: lambda x,errors: x,
+  PObject.Uminus: lambda x,errors: -x,
+  PObject.SquareRoot: squareRoot,
+  PObject.CubeRoot: lambda x,errors: numpy.cbrt(x),
+  PObject.Log: logarithm(numpy.log10),
+  PObject.Ln: logarithm(numpy.log),
+  PObject.TenX: lambda x,errors: numpy.power(10.0,x),
+  PObject.Exp: lambda x,errors: numpy.exp(x),
+  PObject.Square: lambda x,errors: x*x,
+  PObject.Cube: lambda x,errors: x*x*x,
+  PObject.Factorial: factorial,
+  PObject.Inverse: inverse,
+}
+
+## Array functions of trig operators, which also take the scale
+TRIG_FUNCTIONS = {
+  PObject.Sin: trig(numpy.sin),
+  PObject.Cos: trig(numpy.cos),
+  PObject.Tan: tangent,
+  PObject.Arcsin: inverseTrig(numpy.arcsin),
+  PObject.Arccos: inverseTrig(numpy.arccos),
+  PObject.Arctan: inverseTrig(numpy.arctan),
+}
+
+##
+# Mark the elements where an operator made a NaN or infinity from ordinary
+# arguments. An infinity is a result too large for a float; the
+# calculator itself would show it.
+##
+def markSpecial(d,arguments,errors):
+  finite = numpy.ones(errors.codes.shape,bool)
+  for argument in arguments:
+    finite = finite & numpy.isfinite(argument)
+  errors.mark(finite & numpy.isnan(d),ERROR)
+  errors.mark(finite & numpy.isinf(d),OVERFLOW)
+
+##
+# Run a program from PObject.parse() over arrays.
+# @param program The program
+# @param scale Whether to use radians or degrees
+# @param answers A float64 array of values of ANS
+# @param memory The value of RCL or None for the value in the program
+# @param errors An Errors object for the shape of answers
+# @return A float64 array of the shape of answers
+##
+def executeArray(program,scale,answers,memory,errors):
+  stack = []
+  for code, obj in program:
+    if PObject.PUSH == code:
+      d = numpy.float64(obj.value)
+      errors.mark(numpy.isinf(d),OVERFLOW)
+      stack.append(d)
+      continue
+    elif PObject.ANSWER == code:
+      stack.append(answers)
+      continue
+    elif PObject.MEMORY == code:
+      stack.append(numpy.float64(obj.value if None == memory else memory))
+      continue
+    elif PObject.UNARY == code:
+      arguments = (stack[-1],)
+      d = UNARY_FUNCTIONS[type(obj)](stack[-1],errors)
+    elif PObject.TRIG == code:
+      arguments = (stack[-1],)
+      d = TRIG_FUNCTIONS[type(obj)](stack[-1],scale,errors)
+    else:
+      r = stack.pop()
+      arguments = (stack[-1],r)
+      d = BINARY_FUNCTIONS[type(obj)](stack[-1],r,errors)
+    markSpecial(d,arguments,errors)
+    stack[-1] = d
+  return numpy.broadcast_to(numpy.asarray(stack[0],numpy.float64),answers.shape).copy()
+
+##
+# Evaluate an expression for every element of an array, with the element
+# as ANS. Elements where the calculator would show an error are NaN.
+# @param expression A PObject.Expression or a string from the calculator
+# title
+# @param answers An array of values of ANS
+# @param scale Whether to use radians or degrees
+# @param memory The value of RCL
+# @return A float64 array of results and a dictionary that maps the name
+# of each error that occurred to an array of the indices where it did
+##
+def evaluateArray(expression,answers,scale=PObject.DEGREE_SCALE,memory=0):
+  if not isinstance(expression,PObject.Expression):
+    expression = PObject.compile(expression)
+  answers = numpy.asarray(answers,numpy.float64)
+  errors = Errors(answers.shape)
+  if isinstance(expression.program,PObject.PError):
+    errors.mark(True,ERROR)
+    values = numpy.full(answers.shape,numpy.nan)
+  else:
+    with numpy.errstate(all='ignore'):
+      values = executeArray(expression.program,scale,answers,memory,errors)
+  values[0 != errors.codes] = numpy.nan
+  return values, errors.report()
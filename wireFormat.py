@@ -0,0 +1,177 @@
+#!/usr/bin/python3
+# pjscicalc: a scientific calculator in python/html/javascript
+# Copyright (C) 2021, 2023 John D Lamb
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The compact format of strings from the calculator title: a version
+# header, then one character for each operator and each number written out
+# whole, so 12.5*sin(30) is ~1~12.5FWH30I.
+#
+#   wireFormat.encodeCompact('#1;#2;+;#3;')   # '~1~12D3'
+#
+# PObject.convertStringToPObjectList() takes either format.
+
+import re
+# PObject imports this module, so its names are only used in functions
+import PObject
+
+## Version of the compact format of strings from the calculator title
+WIRE_VERSION = 1
+## Start of a string in the compact format, before the version
+WIRE_PREFIX = '~'
+## Start of a string in the compact format of this version
+WIRE_HEADER = WIRE_PREFIX+str(WIRE_VERSION)+WIRE_PREFIX
+## Tokens other than numerals in the order of their opcodes in version 1
+WIRE_OPCODES = (
+  'pi', 'ANS', 'RCL', '+', '-', '*', '/', '(', ')', 'E', '^', 'C', 'P', 'root',
+  'u+', 'u-', 'sqrt', 'cbrt', 'log', 'ln', 'tenX', 'exp',
+  'sin', 'cos', 'tan', 'asin', 'acos', 'atan', '2', '3', '!', 'inv',
+  'STO', 'M+', 'M-', 'MCL',
+)
+## Characters of opcodes; none can be part of a number
+WIRE_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdfghijklmnopqrstuvwxyz'
+## Opcode of each token and token of each opcode
+WIRE_CODES = {token: WIRE_ALPHABET[i] for i, token in enumerate(WIRE_OPCODES)}
+WIRE_TOKENS = {code: token for token, code in WIRE_CODES.items()}
+## Numbers and single opcodes of a string in the compact format
+WIRE_PIECES = re.compile('[0-9.e-]+|.',re.DOTALL)
+## Most numbers decodeCompact() keeps the Literals of; PObject.planExact()
+# copies a Literal before changing it, so one can be shared
+WIRE_LITERALS = 4096
+wireLiterals = {}
+
+##
+# Convert a string from the calculator title to the compact format: the
+# header with the version, then one character for each token except that the
+# numerals of each number, with E and the signs of its exponent, are
+# written together as the number, such as 12.5e-3. Empty parentheses
+# inside a number, which PObject.parse() skips, are left out, so each
+# number is the one PObject.parse() would assemble.
+# @param objectString A string of tokens separated by ;
+# @return The compact string, or objectString itself if it has a token
+# that the format does not have
+##
+def encodeCompact(objectString):
+  tokens = [token for token in objectString.split(';') if '' != token]
+  objects = []
+  for token in tokens:
+    obj = PObject.TOKENS.get(token)
+    if None == obj and token not in WIRE_CODES:
+      return objectString
+    objects.append(obj)
+  skip = PObject.findEmptyGroups(objects)
+  if None == skip:
+    skip = ()
+  pieces = [WIRE_HEADER]
+  numeral = ''
+  exponent = False # as in PObject.parse()
+  negative = False
+  signs = [] # opcodes of E and the signs after it
+  for i in range(len(tokens)):
+    if i in skip and '' != numeral:
+      continue
+    token = tokens[i]
+    obj = objects[i]
+    if exponent:
+      if isinstance(obj,PObject.Add) or isinstance(obj,PObject.Subtract):
+        if isinstance(obj,PObject.Subtract):
+          negative = not negative
+        signs.append(WIRE_CODES[token])
+        continue
+      exponent = False
+      if negative:
+        numeral += PObject.minusNumeral.name
+    if isinstance(obj,PObject.Numeral):
+      numeral += obj.name
+      continue
+    if isinstance(obj,PObject.E):
+      numeral += PObject.eNumeral.name
+      exponent = True
+      negative = False
+      signs = [WIRE_CODES[token]]
+      continue
+    if '' != numeral:
+      pieces.append(numeral)
+      numeral = ''
+    pieces.append(WIRE_CODES[token])
+  if exponent:
+    # an exponent without digits, which is an error; keep the tokens
+    numeral = numeral[:-1]
+    if '' != numeral:
+      pieces.append(numeral)
+    pieces += signs
+  elif '' != numeral:
+    pieces.append(numeral)
+  return ''.join(pieces)
+
+##
+# Convert a string in the compact format to a list of PObjects. Each
+# number becomes a Literal, or its Numerals if it is not a valid number so
+# that PObject.parse() reports it as it would the textual format.
+##
+def decodeCompact(objectString,memory,answer):
+  if not objectString.startswith(WIRE_HEADER):
+    # another version
+    return [PObject.TokenError(objectString,0)]
+  pobjects = []
+  append = pobjects.append
+  get = PObject.TOKENS.get
+  position = 0
+  for piece in WIRE_PIECES.findall(objectString,len(WIRE_HEADER)):
+    token = WIRE_TOKENS.get(piece)
+    if None != token:
+      obj = get(token)
+      if None != obj:
+        append(obj)
+      elif 'ANS' == token:
+        append(PObject.Ans(answer if answer is None else PObject.context().convert(answer)))
+      else:
+        append(PObject.Rcl(memory if memory is None else PObject.context().convert(memory)))
+    elif piece[0] in '0123456789.e-':
+      literal = wireLiterals.get(piece)
+      if None == literal:
+        try:
+          literal = PObject.Literal(piece)
+        except Exception:
+          pobjects += [PObject.TOKENS['#'+c] for c in piece]
+          position += 1
+          continue
+        if len(wireLiterals) >= WIRE_LITERALS:
+          wireLiterals.clear()
+        wireLiterals[piece] = literal
+      append(literal)
+    else:
+      append(PObject.TokenError(piece,position))
+    position += 1
+  return pobjects
+
+##
+# The tokens of a string from the calculator title in either format; a
+# number in the compact format is one token such as #12.5
+##
+def splitTokens(objectString):
+  if not objectString.startswith(WIRE_PREFIX):
+    return [token for token in objectString.split(';') if '' != token]
+  return [WIRE_TOKENS.get(piece,'#'+piece if piece[0] in '0123456789.e-' else piece)
+          for piece in WIRE_PIECES.findall(objectString,len(WIRE_HEADER))]
+
+##
+# The STO, M+, M- or MCL PObject at the start of a string from the
+# calculator title, or None
+##
+def storeToken(objectString):
+  if objectString.startswith(WIRE_PREFIX):
+    return PObject.TOKENS.get(WIRE_TOKENS.get(objectString[len(WIRE_HEADER):len(WIRE_HEADER)+1]))
+  return PObject.TOKENS.get(objectString.split(';',1)[0])